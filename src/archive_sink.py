@@ -0,0 +1,93 @@
+import os
+import zipfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict
+
+# 输出位置：输出写入压缩包（与 "原位置"、"自定义位置" 并列）
+ARCHIVE_LOCATION = "压缩包"
+
+# 压缩包格式（CBZ即扩展名不同的ZIP，漫画阅读器可直接打开）
+ARCHIVE_FORMATS = ('cbz', 'zip')
+
+# 压缩方式：PNG/JPG/WEBP本身已压缩，默认直接存储
+ARCHIVE_COMPRESSIONS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED
+}
+
+# 同时保持打开的压缩包数量，超出后关闭最久未写入的（之后需要时以追加模式重新打开）
+MAX_OPEN_ARCHIVES = 32
+
+
+class ArchiveSink:
+    """
+    压缩包写入端
+
+    每个输出目录对应一个压缩包 "{输出目录}.cbz"，输出文件名作为压缩包内的条目名，
+    输出目录本身不会创建。编码后的数据在页面完成时直接写入压缩包，不产生临时文件。
+    可在多个线程中使用；接口与write_file一致，可作为导出流水线的写入端。
+    """
+    def __init__(self, archive_config: Dict = None):
+        """
+        Args:
+            archive_config: {'format': 'cbz' 或 'zip', 'compression': 'stored' 或 'deflated'}
+        """
+        archive_config = archive_config or {}
+        self.format = archive_config.get('format', 'cbz').lower()
+        if self.format not in ARCHIVE_FORMATS:
+            raise ValueError(f"不支持的压缩包格式: {self.format}")
+        compression = archive_config.get('compression', 'stored')
+        if compression not in ARCHIVE_COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.compression = ARCHIVE_COMPRESSIONS[compression]
+        self.lock = threading.Lock()
+        self.archives: 'OrderedDict[str, zipfile.ZipFile]' = OrderedDict()  # 输出目录 -> 打开的压缩包
+        self.created = set()  # 本次已创建的压缩包，重新打开时追加而不是覆盖
+
+    def archive_path(self, output_dir: str) -> str:
+        """输出目录对应的压缩包路径"""
+        return f"{os.path.normpath(output_dir)}.{self.format}"
+
+    def _open(self, output_dir: str) -> zipfile.ZipFile:
+        archive = self.archives.pop(output_dir, None)
+        if archive is None:
+            path = self.archive_path(output_dir)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 本次第一次打开时覆盖旧的压缩包
+            archive = zipfile.ZipFile(path, 'a' if path in self.created else 'w',
+                                      compression=self.compression, allowZip64=True)
+            self.created.add(path)
+            while len(self.archives) >= MAX_OPEN_ARCHIVES:
+                self.archives.popitem(last=False)[1].close()
+        self.archives[output_dir] = archive
+        return archive
+
+    def write(self, output_path: str, data: bytes):
+        """
+        写入一个输出
+
+        Args:
+            output_path: 输出文件路径（所在目录决定压缩包，文件名为条目名）
+            data: 编码后的数据
+        """
+        if data is None:
+            raise ValueError(f"输出已直接写入磁盘，无法加入压缩包: {output_path}")
+        output_dir, name = os.path.split(output_path)
+        info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+        info.compress_type = self.compression
+        with self.lock:
+            self._open(output_dir).writestr(info, data)
+
+    def close(self):
+        """关闭所有压缩包（写入中央目录）"""
+        with self.lock:
+            while self.archives:
+                self.archives.popitem(last=False)[1].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
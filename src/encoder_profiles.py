@@ -0,0 +1,266 @@
+import io
+import os
+import math
+import zlib
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from typing import Dict, List, Optional, Tuple
+
+# 编码预设：在编码速度与文件大小之间取舍
+# PNG的strategy为zlib压缩策略（Pillow不提供逐行滤波器的选择，以压缩策略调节）
+ENCODER_PRESETS = {
+    'fastest': {
+        'png': {'compress_level': 1, 'optimize': False, 'strategy': zlib.Z_RLE},
+        'jpeg': {'quality': 85, 'subsampling': 2, 'optimize': False, 'progressive': False},
+        'webp': {'lossless': False, 'quality': 75, 'method': 0},
+    },
+    'balanced': {
+        'png': {'compress_level': 6, 'optimize': False, 'strategy': zlib.Z_DEFAULT_STRATEGY},
+        'jpeg': {'quality': 95, 'subsampling': 2, 'optimize': False, 'progressive': False},
+        'webp': {'lossless': False, 'quality': 85, 'method': 4},
+    },
+    'smallest': {
+        'png': {'compress_level': 9, 'optimize': True, 'strategy': zlib.Z_DEFAULT_STRATEGY},
+        'jpeg': {'quality': 85, 'subsampling': 2, 'optimize': True, 'progressive': True},
+        'webp': {'lossless': False, 'quality': 80, 'method': 6},
+    },
+}
+
+# 预设的显示名称
+PRESET_NAMES = {
+    'fastest': "最快",
+    'balanced': "均衡",
+    'smallest': "最小",
+}
+
+DEFAULT_PRESET = 'balanced'
+
+# 目标文件大小模式：质量搜索的默认下限、每轮并行尝试的质量数和最多搜索轮数
+MIN_SEARCH_QUALITY = 10
+SEARCH_CANDIDATES = 3
+MAX_SEARCH_ROUNDS = 5
+
+# 质量搜索的线程池（Pillow编码时释放GIL），进程内共享，按需创建
+_search_pool: Optional[ThreadPoolExecutor] = None
+_search_lock = threading.Lock()
+
+# 上一次搜索得到的质量，作为尺寸相近图片的初始猜测：(格式, 颜色模式, 像素数分档, 字节上限) -> 质量
+_quality_guesses: Dict[Tuple, int] = {}
+
+
+def _reset_search_pool():
+    """fork出的子进程（进程池）不继承线程，需要重新创建线程池"""
+    global _search_pool, _search_lock
+    _search_pool = None
+    _search_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_search_pool)
+
+
+def _search_executor() -> ThreadPoolExecutor:
+    global _search_pool
+    with _search_lock:
+        if _search_pool is None:
+            _search_pool = ThreadPoolExecutor(max_workers=SEARCH_CANDIDATES)
+        return _search_pool
+
+
+def _spread(low: int, high: int, count: int) -> List[int]:
+    """在开区间 (low, high) 中均匀取至多count个整数"""
+    points = {low + (high - low) * (i + 1) // (count + 1) for i in range(count)}
+    return sorted(q for q in points if low < q < high)
+
+
+def normalize_format(output_format: str) -> str:
+    """
+    将输出格式统一为编码器名称
+
+    Args:
+        output_format: 'PNG'、'JPG'、'JPEG'、'WEBP'（不区分大小写）
+
+    Returns:
+        'png'、'jpeg' 或 'webp'
+    """
+    fmt = (output_format or 'png').lower()
+    if fmt in ('jpg', 'jpeg'):
+        return 'jpeg'
+    if fmt not in ('png', 'webp'):
+        raise ValueError(f"不支持的输出格式: {output_format}")
+    return fmt
+
+
+def format_extension(output_format: str) -> str:
+    """输出格式对应的文件扩展名（不含点）"""
+    return {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp'}[normalize_format(output_format)]
+
+
+class EncoderProfile:
+    """
+    编码配置
+
+    由预设和覆盖项组成，供PDF渲染、PDF图片分割和图片分割三条输出路径共用。
+    只包含基本类型，可以在进程之间传递，也可以写入导出清单。
+    
+    设置max_bytes时，JPEG/有损WebP输出在内存中搜索不超过该大小的最高质量
+    （不高于配置的质量），每张图片只写入一次；PNG和无损WebP不受影响。
+    """
+    def __init__(self, preset: str = DEFAULT_PRESET, overrides: Dict = None,
+                 max_bytes: int = None, min_quality: int = MIN_SEARCH_QUALITY):
+        """
+        Args:
+            preset: 预设名称 ('fastest'、'balanced'、'smallest')
+            overrides: 覆盖项，如 {'jpeg': {'quality': 90}, 'png': {'compress_level': 3}}
+            max_bytes: 单张图片的字节上限，为None时按配置的质量编码
+            min_quality: 质量搜索的下限，下限仍超出上限时输出下限质量的结果
+        """
+        if preset not in ENCODER_PRESETS:
+            raise ValueError(f"未知的编码预设: {preset}")
+        self.preset = preset
+        self.settings = copy.deepcopy(ENCODER_PRESETS[preset])
+        for fmt, values in (overrides or {}).items():
+            self.settings[normalize_format(fmt)].update(values)
+        self.max_bytes = max_bytes
+        self.min_quality = min_quality
+
+    @classmethod
+    def from_config(cls, config: Dict = None) -> 'EncoderProfile':
+        """
+        从配置字典创建编码配置
+
+        Args:
+            config: {'preset': 预设名称, 'quality': JPEG/WebP有损质量（目标大小模式下为质量上限）,
+                     'max_bytes': 单张图片的字节上限, 'min_quality': 质量搜索下限,
+                     'png': {...}, 'jpeg': {...}, 'webp': {...}}，为None时使用默认预设
+        """
+        config = config or {}
+        overrides = {fmt: dict(config[fmt]) for fmt in ('png', 'jpeg', 'webp') if fmt in config}
+        if config.get('quality') is not None:
+            for fmt in ('jpeg', 'webp'):
+                overrides.setdefault(fmt, {})['quality'] = config['quality']
+        return cls(config.get('preset', DEFAULT_PRESET), overrides,
+                   config.get('max_bytes'), config.get('min_quality', MIN_SEARCH_QUALITY))
+
+    def to_dict(self) -> Dict:
+        """导出为可序列化的字典（用于导出清单比较设置）"""
+        data = {'preset': self.preset, **copy.deepcopy(self.settings)}
+        if self.max_bytes:
+            data['max_bytes'] = self.max_bytes
+            data['min_quality'] = self.min_quality
+        return data
+
+    def save_options(self, output_format: str) -> Dict:
+        """
+        获取Pillow保存参数
+
+        Args:
+            output_format: 输出格式
+
+        Returns:
+            传给Image.save的关键字参数
+        """
+        fmt = normalize_format(output_format)
+        settings = self.settings[fmt]
+        if fmt == 'png':
+            return {
+                'compress_level': settings['compress_level'],
+                'optimize': settings['optimize'],
+                'compress_type': settings['strategy'],
+            }
+        if fmt == 'jpeg':
+            return {
+                'quality': settings['quality'],
+                'subsampling': settings['subsampling'],
+                'optimize': settings['optimize'],
+                'progressive': settings['progressive'],
+            }
+        options = {'lossless': settings['lossless'], 'method': settings['method']}
+        if not settings['lossless']:
+            options['quality'] = settings['quality']
+        return options
+
+    def encode(self, img: Image.Image, output_format: str) -> bytes:
+        """
+        在内存中编码图片
+
+        Args:
+            img: 待编码的图片
+            output_format: 输出格式
+
+        Returns:
+            编码后的字节数据
+        """
+        fmt = normalize_format(output_format)
+        if fmt == 'jpeg' and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif fmt == 'webp' and img.mode not in ("RGB", "RGBA", "L"):
+            img = img.convert("RGBA" if 'A' in img.mode else "RGB")
+        if self.max_bytes and fmt != 'png' and not self.settings[fmt].get('lossless'):
+            return self._encode_within_budget(img, fmt)
+        return self._encode_at(img, fmt)
+
+    def _encode_at(self, img: Image.Image, fmt: str, quality: int = None) -> bytes:
+        options = self.save_options(fmt)
+        if quality is not None:
+            options['quality'] = quality
+        buffer = io.BytesIO()
+        img.save(buffer, fmt.upper(), **options)
+        return buffer.getvalue()
+
+    def _encode_within_budget(self, img: Image.Image, fmt: str) -> bytes:
+        """
+        搜索不超过max_bytes的最高质量
+
+        每轮在线程池中并行编码若干个候选质量，根据结果缩小区间，最多MAX_SEARCH_ROUNDS轮。
+        第一轮包含配置的质量（已满足时直接使用）和尺寸相近图片上次的结果及其上一档，
+        同一批次中的相似页面通常一轮即可确定。
+        """
+        top = self.settings[fmt]['quality']
+        bottom = min(self.min_quality, top)
+        key = (fmt, img.mode, round(math.log2(max(1, img.width * img.height)) * 2), self.max_bytes)
+        guess = _quality_guesses.get(key)
+        
+        fit, best = bottom - 1, None  # 已知满足上限的最高质量及其数据
+        fail, smallest = top + 1, None  # 已知超出上限的最低质量及其数据
+        candidates = [top]
+        if guess is not None and bottom <= guess < top:
+            candidates += [guess, guess + 1]
+        else:
+            candidates += _spread(bottom - 1, top, SEARCH_CANDIDATES - 1)
+        executor = _search_executor()
+        for _ in range(MAX_SEARCH_ROUNDS):
+            candidates = sorted({q for q in candidates if fit < q < fail})
+            if not candidates:
+                break
+            # Image.save会修改图片对象上的编码参数，同时编码的候选各自使用一份副本
+            sources = [img] + [img.copy() for _ in candidates[1:]]
+            encoded = list(executor.map(lambda q, src: (q, self._encode_at(src, fmt, q)), candidates, sources))
+            for quality, data in encoded:
+                if len(data) <= self.max_bytes:
+                    if quality > fit:
+                        fit, best = quality, data
+                elif quality < fail:
+                    fail, smallest = quality, data
+            if fail <= fit:
+                # 文件大小随质量不严格单调时，以满足上限的最高质量为准
+                fail = fit + 1
+            if fail - fit <= 1:
+                break
+            candidates = _spread(fit, fail, SEARCH_CANDIDATES)
+            
+        if best is None:
+            # 最低质量仍超出上限，输出尽量小的结果
+            if fail > bottom:
+                smallest = self._encode_at(img, fmt, bottom)
+            return smallest
+        _quality_guesses[key] = fit
+        return best
+
+    def save(self, img: Image.Image, output_path: str, output_format: str):
+        """编码图片并写入文件"""
+        data = self.encode(img, output_format)
+        with open(output_path, 'wb') as f:
+            f.write(data)
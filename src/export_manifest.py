@@ -0,0 +1,113 @@
+import os
+import json
+import threading
+from typing import Dict, List
+
+# 清单文件名，保存在每个PDF的输出目录中
+MANIFEST_NAME = ".export_manifest.json"
+
+
+class ExportManifest:
+    """
+    PDF导出清单
+
+    记录某个输出目录对应的源文件指纹、渲染设置以及已完成的页面和输出文件。
+    重新运行时，源文件和设置均未变化且输出文件完好的页面可以直接跳过。
+    """
+    # 每完成多少页保存一次清单
+    FLUSH_INTERVAL = 20
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.fingerprint = ""
+        self.settings: Dict = {}
+        self.pages: Dict[str, Dict[str, int]] = {}  # 页码 -> {输出文件名: 文件大小}
+        self.lock = threading.Lock()
+        self.unsaved = 0
+
+    def load(self):
+        """读取已有清单，文件不存在或损坏时视为空清单"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.fingerprint = data.get('fingerprint', "")
+            self.settings = data.get('settings', {})
+            self.pages = data.get('pages', {})
+        except (OSError, ValueError):
+            self.fingerprint = ""
+            self.settings = {}
+            self.pages = {}
+
+    def save(self):
+        """写入清单（先写临时文件再替换，避免中断时损坏）"""
+        with self.lock:
+            data = {
+                'fingerprint': self.fingerprint,
+                'settings': self.settings,
+                'pages': self.pages
+            }
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self.unsaved = 0
+
+    def prepare(self, fingerprint: str, settings: Dict, resume: bool) -> bool:
+        """
+        准备本次导出
+
+        Args:
+            fingerprint: 源文件指纹
+            settings: 影响输出结果的渲染设置
+            resume: 是否续传
+
+        Returns:
+            是否可以沿用已有清单中的页面
+        """
+        if resume:
+            self.load()
+        reusable = resume and self.fingerprint == fingerprint and self.settings == settings
+        if not reusable:
+            self.pages = {}
+        self.fingerprint = fingerprint
+        self.settings = settings
+        return reusable
+
+    def is_page_done(self, page_num: int) -> bool:
+        """页面是否已完成且输出文件完好"""
+        outputs = self.pages.get(str(page_num))
+        if not outputs:
+            return False
+        for name, size in outputs.items():
+            try:
+                if os.path.getsize(os.path.join(self.output_dir, name)) != size:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def pending_pages(self, page_numbers: List[int]) -> List[int]:
+        """过滤出需要重新渲染的页面"""
+        return [page_num for page_num in page_numbers if not self.is_page_done(page_num)]
+
+    def mark_done(self, page_num: int, output_files: List[str]):
+        """
+        记录页面已完成
+
+        Args:
+            page_num: 页码 (从0开始)
+            output_files: 该页的输出文件路径列表
+        """
+        outputs = {}
+        for output_file in output_files:
+            try:
+                outputs[os.path.basename(output_file)] = os.path.getsize(output_file)
+            except OSError:
+                return
+        with self.lock:
+            self.pages[str(page_num)] = outputs
+            self.unsaved += 1
+            should_flush = self.unsaved >= self.FLUSH_INTERVAL
+        if should_flush:
+            self.save()
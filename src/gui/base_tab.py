@@ -2,12 +2,17 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
                                  QTableWidget, QGroupBox, QPushButton, 
                                  QProgressBar, QTextEdit, QSplitter,
                                  QTableWidgetItem, QHeaderView, QFileDialog,
-                                 QMessageBox, QToolBar, QStyle, QRadioButton, QLineEdit, QLabel)
+                                 QMessageBox, QToolBar, QStyle, QRadioButton, QLineEdit, QLabel,
+                                 QComboBox, QGridLayout, QSpinBox)
 from PyQt6.QtCore import Qt, QSize, QDateTime, QMimeData
 from PyQt6.QtGui import QIcon, QDragEnterEvent, QDropEvent
 import os
+from archive_sink import ARCHIVE_LOCATION
 
 class BaseTab(QWidget):
+    # 是否提供 "压缩包" 输出位置（子类按需开启）
+    ARCHIVE_OUTPUT = False
+    
     def __init__(self):
         super().__init__()
         self.file_paths = {}  # 存储文件完整路径
@@ -123,6 +128,30 @@ class BaseTab(QWidget):
         output_layout.addWidget(self.output_original)
         output_layout.addWidget(self.output_custom)
         
+        # 压缩包：每个PDF/文件夹输出为一个ZIP/CBZ，输出路径可选（未指定时为原位置）
+        self.output_archive = None
+        if self.ARCHIVE_OUTPUT:
+            self.output_archive = QRadioButton(ARCHIVE_LOCATION)
+            self.output_archive.setToolTip("输出写入压缩包，不产生大量小文件；未选择输出路径时放在原位置")
+            output_layout.addWidget(self.output_archive)
+            
+            archive_widget = QWidget()
+            archive_layout = QHBoxLayout()
+            archive_layout.setContentsMargins(20, 0, 0, 0)
+            self.archive_format_combo = QComboBox()
+            self.archive_format_combo.addItem("CBZ", 'cbz')
+            self.archive_format_combo.addItem("ZIP", 'zip')
+            self.archive_compression_combo = QComboBox()
+            self.archive_compression_combo.addItem("仅存储", 'stored')
+            self.archive_compression_combo.addItem("压缩", 'deflated')
+            self.archive_compression_combo.setToolTip("PNG/JPG/WEBP本身已压缩，仅存储速度最快")
+            archive_layout.addWidget(self.archive_format_combo)
+            archive_layout.addWidget(self.archive_compression_combo)
+            archive_widget.setLayout(archive_layout)
+            archive_widget.setEnabled(False)
+            self.archive_options = archive_widget
+            output_layout.addWidget(archive_widget)
+        
         # 自定义输出路径
         path_widget = QWidget()
         path_layout = QHBoxLayout()
@@ -159,14 +188,19 @@ class BaseTab(QWidget):
         # 连接信号
         self.output_original.toggled.connect(self.on_output_location_changed)
         self.output_custom.toggled.connect(self.on_output_location_changed)
+        if self.output_archive is not None:
+            self.output_archive.toggled.connect(self.on_output_location_changed)
         
         output_widget.setLayout(output_layout)
         layout.addWidget(output_widget)
         
     def on_output_location_changed(self, checked):
         """输出位置改变时的处理"""
-        self.output_path.setEnabled(self.output_custom.isChecked())
-        self.browse_btn.setEnabled(self.output_custom.isChecked())
+        use_archive = self.output_archive is not None and self.output_archive.isChecked()
+        self.output_path.setEnabled(self.output_custom.isChecked() or use_archive)
+        self.browse_btn.setEnabled(self.output_custom.isChecked() or use_archive)
+        if self.output_archive is not None:
+            self.archive_options.setEnabled(use_archive)
         
     def browse_output_path(self):
         """浏览输出路径"""
@@ -174,12 +208,81 @@ class BaseTab(QWidget):
         if path:
             self.output_path.setText(path)
             
+    def create_stitch_group(self):
+        """创建长图设置（拼接为长图或按固定高度切分），PDF和图片标签页共用"""
+        self.stitch_group = QGroupBox("长图")
+        self.stitch_group.setCheckable(True)
+        self.stitch_group.setChecked(False)
+        self.stitch_group.setToolTip("把输出按顺序拼接为长图（如公众号文章），逐条写入，内存占用与页数无关")
+        stitch_layout = QGridLayout()
+        
+        self.stitch_mode_combo = QComboBox()
+        self.stitch_mode_combo.addItem("拼接长图", 'stitch')
+        self.stitch_mode_combo.addItem("按固定高度切分", 'tile')
+        self.stitch_mode_combo.setToolTip("拼接长图：超过最大高度时从下一页开始新的长图；"
+                                          "按固定高度切分：每张长图高度相同")
+        
+        self.stitch_width_spin = QSpinBox()
+        self.stitch_width_spin.setRange(0, 20000)
+        self.stitch_width_spin.setSpecialValueText("原宽度")
+        self.stitch_width_spin.setSuffix(" px")
+        
+        self.stitch_height_spin = QSpinBox()
+        self.stitch_height_spin.setRange(0, 200000)
+        self.stitch_height_spin.setSingleStep(1000)
+        self.stitch_height_spin.setValue(10000)
+        self.stitch_height_spin.setSpecialValueText("不限制")
+        self.stitch_height_spin.setSuffix(" px")
+        
+        stitch_layout.addWidget(QLabel("方式"), 0, 0)
+        stitch_layout.addWidget(self.stitch_mode_combo, 0, 1)
+        stitch_layout.addWidget(QLabel("宽度"), 1, 0)
+        stitch_layout.addWidget(self.stitch_width_spin, 1, 1)
+        stitch_layout.addWidget(QLabel("最大高度"), 2, 0)
+        stitch_layout.addWidget(self.stitch_height_spin, 2, 1)
+        self.stitch_group.setLayout(stitch_layout)
+        return self.stitch_group
+        
+    def get_stitch_config(self):
+        """获取长图配置，未启用时返回None"""
+        if not self.stitch_group.isChecked():
+            return None
+        return {
+            'mode': self.stitch_mode_combo.currentData(),
+            'width': self.stitch_width_spin.value() or None,
+            'max_height': self.stitch_height_spin.value() or None
+        }
+        
+    def get_output_location(self):
+        """输出位置 ('原位置'、'自定义位置' 或 '压缩包')"""
+        if self.output_archive is not None and self.output_archive.isChecked():
+            return ARCHIVE_LOCATION
+        return "原位置" if self.output_original.isChecked() else "自定义位置"
+        
+    def get_custom_output_path(self):
+        """自定义输出路径，压缩包输出时可选"""
+        if self.get_output_location() == "原位置":
+            return None
+        return self.output_path.text() or None
+        
+    def get_archive_config(self):
+        """获取压缩包配置"""
+        if self.output_archive is None:
+            return None
+        return {
+            'format': self.archive_format_combo.currentData(),
+            'compression': self.archive_compression_combo.currentData()
+        }
+        
     def get_output_config(self):
         """获取输出配置"""
+        use_archive = self.get_output_location() == ARCHIVE_LOCATION
         return {
             'use_original_location': self.output_original.isChecked(),
-            'custom_output_path': self.output_path.text() if self.output_custom.isChecked() else None,
-            'output_name': self.output_name.text()
+            'custom_output_path': self.get_custom_output_path(),
+            'output_name': self.output_name.text(),
+            'use_archive': use_archive,
+            'archive': self.get_archive_config() if use_archive else None
         }
         
     def format_size(self, size):
@@ -1,12 +1,14 @@
 from PyQt6.QtWidgets import (QToolBar, QPushButton, QSpinBox,
                            QLabel, QRadioButton, QFileDialog,
                            QVBoxLayout, QHBoxLayout, QWidget,
-                           QLineEdit, QMessageBox, QListWidget, QListWidgetItem, QTableWidgetItem, QTableWidget, QGroupBox, QCheckBox)
+                           QLineEdit, QMessageBox, QListWidget, QListWidgetItem, QTableWidgetItem, QTableWidget, QGroupBox, QCheckBox,
+                           QComboBox, QGridLayout)
 from PyQt6.QtCore import Qt, pyqtSignal, QThread, QObject, QDateTime
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from image_processor import ImageProcessor
+from encoder_profiles import ENCODER_PRESETS, PRESET_NAMES, DEFAULT_PRESET
 from .base_tab import BaseTab
 
 class ImageWorker(QObject):
@@ -65,6 +67,9 @@ class ImageTab(BaseTab):
     processing_stopped = pyqtSignal()
     processing_finished = pyqtSignal()
     
+    # 支持输出到压缩包
+    ARCHIVE_OUTPUT = True
+    
     def __init__(self):
         super().__init__()
         self.is_processing = False
@@ -141,6 +146,11 @@ class ImageTab(BaseTab):
         mode_layout.addWidget(self.custom_mode)
         mode_layout.addWidget(custom_desc)
         
+        # 分割线检测
+        self.gutter_cb = QCheckBox("自动检测分割线")
+        self.gutter_cb.setToolTip("在中线两侧10%范围内寻找最空白的位置分割（如偏离中间的书脊）")
+        mode_layout.addWidget(self.gutter_cb)
+        
         mode_group.setLayout(mode_layout)
         layout.addWidget(mode_group)
         
@@ -204,6 +214,69 @@ class ImageTab(BaseTab):
         special_group.setLayout(special_layout)
         layout.addWidget(special_group)
         
+        # 输出格式
+        format_group = QGroupBox("输出格式")
+        format_layout = QGridLayout()
+        
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["JPG", "PNG", "WEBP"])
+        
+        self.preset_combo = QComboBox()
+        for preset, name in PRESET_NAMES.items():
+            self.preset_combo.addItem(name, preset)
+        self.preset_combo.setCurrentIndex(list(PRESET_NAMES).index(DEFAULT_PRESET))
+        self.preset_combo.setToolTip("最快：编码速度优先；均衡：默认；最小：文件体积优先")
+        
+        self.quality_spin = QSpinBox()
+        self.quality_spin.setRange(1, 100)
+        self.quality_spin.setValue(95)
+        self.quality_spin.setSuffix("%")
+
+        # 单张图片大小上限：搜索不超过上限的最高质量（0为不限制）
+        self.max_size_spin = QSpinBox()
+        self.max_size_spin.setRange(0, 100 * 1024)
+        self.max_size_spin.setSingleStep(50)
+        self.max_size_spin.setSuffix(" KB")
+        self.max_size_spin.setSpecialValueText("不限制")
+        self.max_size_spin.setToolTip("JPG/WEBP输出不超过该大小，质量设置作为上限")
+        
+        format_layout.addWidget(QLabel("格式"), 0, 0)
+        format_layout.addWidget(self.format_combo, 0, 1)
+        format_layout.addWidget(QLabel("编码预设"), 1, 0)
+        format_layout.addWidget(self.preset_combo, 1, 1)
+        format_layout.addWidget(QLabel("质量"), 2, 0)
+        format_layout.addWidget(self.quality_spin, 2, 1)
+        format_layout.addWidget(QLabel("大小上限"), 3, 0)
+        format_layout.addWidget(self.max_size_spin, 3, 1)
+        
+        # 并行进程数
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip("分割使用的进程数，1表示逐个处理")
+        format_layout.addWidget(QLabel("并行进程"), 4, 0)
+        format_layout.addWidget(self.workers_spin, 4, 1)
+        
+        # 只读取文件头预览分割方案
+        self.dry_run_cb = QCheckBox("仅预览分割方案")
+        self.dry_run_cb.setToolTip("只读取文件头，在日志中列出每个文件的分割方向和输出文件名，不写入任何文件")
+        format_layout.addWidget(self.dry_run_cb, 5, 0, 1, 2)
+
+        # 在压缩域中分割JPEG，不重新编码
+        self.lossless_cb = QCheckBox("JPEG无损分割")
+        self.lossless_cb.setToolTip("JPEG输出为JPG时，分割线吸附到最近的8/16像素边界，用jpegtran"
+                                    "在压缩数据上完成裁剪和旋转，不重新编码；未安装jpegtran或不满足条件时使用普通分割")
+        format_layout.addWidget(self.lossless_cb, 6, 0, 1, 2)
+        
+        format_group.setLayout(format_layout)
+        layout.addWidget(format_group)
+        
+        self.format_combo.currentTextChanged.connect(self.on_format_changed)
+        self.preset_combo.currentIndexChanged.connect(self.on_format_changed)
+        
+        # 长图：每个文件夹的分割结果拼接为长图
+        layout.addWidget(self.create_stitch_group())
+        
         # 输出设置（使用基类的设置）
         output_group = QGroupBox("输出设置")
         output_layout = QVBoxLayout()
@@ -252,6 +325,18 @@ class ImageTab(BaseTab):
         self.width_spin.setEnabled(self.custom_mode.isChecked())
         self.height_spin.setEnabled(self.custom_mode.isChecked())
         
+    def on_format_changed(self, *args):
+        """切换输出格式或编码预设时，同步质量设置"""
+        output_format = self.format_combo.currentText()
+        settings = ENCODER_PRESETS[self.preset_combo.currentData()]
+        self.quality_spin.setEnabled(output_format in ("JPG", "WEBP"))
+        self.max_size_spin.setEnabled(output_format in ("JPG", "WEBP"))
+        self.lossless_cb.setEnabled(output_format == "JPG")
+        if output_format == "WEBP":
+            self.quality_spin.setValue(settings['webp']['quality'])
+        else:
+            self.quality_spin.setValue(settings['jpeg']['quality'])
+        
     def start_processing(self):
         """开始处理图片"""
         if self.file_list.rowCount() == 0:
@@ -276,11 +361,22 @@ class ImageTab(BaseTab):
             'target_width': self.width_spin.value(),
             'target_height': self.height_spin.value(),
             'rotate_bottom': self.rotate_bottom_cb.isChecked(),
-            'special_first': self.special_first_cb.isChecked()
+            'special_first': self.special_first_cb.isChecked(),
+            'lossless_jpeg': self.lossless_cb.isChecked(),
+            'gutter': self.gutter_cb.isChecked()
         }
         
         # 获取输出配置
         output_config = self.get_output_config()
+        output_config['output_format'] = self.format_combo.currentText()
+        output_config['encoder'] = {
+            'preset': self.preset_combo.currentData(),
+            'quality': self.quality_spin.value(),
+            'max_bytes': self.max_size_spin.value() * 1024 or None
+        }
+        output_config['stitch'] = self.get_stitch_config()
+        output_config['workers'] = self.workers_spin.value()
+        output_config['dry_run'] = self.dry_run_cb.isChecked()
         
         try:
             # 配置worker
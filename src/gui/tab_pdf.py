@@ -1,7 +1,7 @@
 from PyQt6.QtWidgets import (QToolBar, QPushButton, QSpinBox,
                                  QComboBox, QLabel, QRadioButton, QFileDialog,
                                  QVBoxLayout, QHBoxLayout, QWidget, QLineEdit, QMessageBox, QGroupBox,
-                                 QTableWidgetItem, QScrollBar, QGridLayout)
+                                 QTableWidgetItem, QScrollBar, QGridLayout, QHeaderView, QCheckBox)
 from PyQt6.QtCore import Qt, pyqtSignal, QObject, QThread, QDateTime
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent
 from PyQt6.QtGui import QIntValidator
@@ -9,6 +9,10 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pdf_processor import PDFProcessor
+from encoder_profiles import ENCODER_PRESETS, PRESET_NAMES, DEFAULT_PRESET
+from memory_governor import DEFAULT_MEMORY_BUDGET
+from render_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+from page_selection import PageSelection
 from .base_tab import BaseTab
 
 class PDFWorker(QObject):
@@ -28,9 +32,13 @@ class PDFWorker(QObject):
         self.output_location = "原位置"
         self.custom_output_path = None
         self.split_config = None
+        self.workers = 1
+        self.resume = False
+        self.render_config = None
         
     def configure(self, files, dpi, output_format, interval, 
-                 output_location, custom_output_path, split_config=None):
+                 output_location, custom_output_path, split_config=None, workers=1,
+                 resume=False, render_config=None):
         """配置处理参数"""
         self.files = files
         self.dpi = dpi
@@ -39,6 +47,9 @@ class PDFWorker(QObject):
         self.output_location = output_location
         self.custom_output_path = custom_output_path
         self.split_config = split_config
+        self.workers = workers
+        self.resume = resume
+        self.render_config = render_config
         
     def process(self):
         """处理PDF文件"""
@@ -58,13 +69,35 @@ class PDFWorker(QObject):
                 custom_output_path=self.custom_output_path,
                 split_config=self.split_config,
                 progress_callback=progress_callback,
-                log_callback=log_callback
+                log_callback=log_callback,
+                workers=self.workers,
+                resume=self.resume,
+                render_config=self.render_config
             )
             self.finished.emit()
             
         except Exception as e:
             self.error.emit(str(e))
 
+class CatalogScanWorker(QObject):
+    """PDF预扫描工作线程，扫描结果写入处理器的文档目录，处理时直接复用"""
+    finished = pyqtSignal()
+    log = pyqtSignal(str)
+
+    def __init__(self, catalog):
+        super().__init__()
+        self.catalog = catalog
+        self.files = []
+        self.workers = 1
+
+    def scan(self):
+        """预扫描PDF文件"""
+        try:
+            self.catalog.scan(self.files, workers=self.workers, log_callback=self.log.emit)
+        except Exception as e:
+            self.log.emit(f"预扫描失败: {str(e)}")
+        self.finished.emit()
+
 class PDFTab(BaseTab):
     # 定义���
     processing_started = pyqtSignal()
@@ -72,6 +105,9 @@ class PDFTab(BaseTab):
     processing_paused = pyqtSignal()
     processing_stopped = pyqtSignal()
     
+    # 支持输出到压缩包
+    ARCHIVE_OUTPUT = True
+    
     def __init__(self):
         super().__init__()
         self.is_processing = False
@@ -79,6 +115,11 @@ class PDFTab(BaseTab):
         self.worker = PDFWorker()
         self.thread = QThread()
         self.worker.moveToThread(self.thread)
+        # 预扫描在单独的线程中进行，添加文件时不阻塞界面
+        self.scan_worker = CatalogScanWorker(self.worker.pdf_processor.catalog)
+        self.scan_thread = QThread()
+        self.scan_worker.moveToThread(self.scan_thread)
+        self.pending_scan = []  # 扫描进行中时新添加的文件，本次扫描结束后再扫描
         self.setup_worker_connections()
         self.setup_ui_connections()
         
@@ -89,6 +130,9 @@ class PDFTab(BaseTab):
         self.worker.progress.connect(self.update_progress)
         self.worker.error.connect(self.handle_error)
         self.worker.log.connect(self.log_message)
+        self.scan_thread.started.connect(self.scan_worker.scan)
+        self.scan_worker.finished.connect(self.handle_scan_finished)
+        self.scan_worker.log.connect(self.log_message)
         
     def setup_ui_connections(self):
         """设置UI控件的信号连接"""
@@ -127,6 +171,17 @@ class PDFTab(BaseTab):
         
         return toolbar
         
+    def setup_file_list(self):
+        """设置文件列表，在基础列之后追加文档目录信息列"""
+        super().setup_file_list()
+        self.file_list.setColumnCount(7)
+        self.file_list.setHorizontalHeaderLabels(
+            ["文件名", "大小", "修改时间", "状态", "页数", "页面尺寸", "加密"]
+        )
+        header = self.file_list.horizontalHeader()
+        for column in range(4, 7):
+            header.setSectionResizeMode(column, QHeaderView.ResizeMode.ResizeToContents)
+        
     def setup_settings_ui(self, layout):
         """设置PDF转换的设置界面"""
         # 设置区域
@@ -152,15 +207,36 @@ class PDFTab(BaseTab):
         # 格式设置
         format_label = QLabel("输出格式:")
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["PNG", "JPG"])
+        self.format_combo.addItems(["PNG", "JPG", "WEBP"])
         
         # JPG质量设置
-        quality_label = QLabel("JPG质量:")
+        quality_label = QLabel("JPG/WEBP质量:")
         self.quality_spin = QSpinBox()
         self.quality_spin.setRange(1, 100)
         self.quality_spin.setValue(95)
         self.quality_spin.setSuffix("%")
         self.quality_spin.setEnabled(False)  # 初始禁用
+
+        # 单张图片大小上限：搜索不超过上限的最高质量（0为不限制）
+        self.max_size_spin = QSpinBox()
+        self.max_size_spin.setRange(0, 100 * 1024)
+        self.max_size_spin.setSingleStep(50)
+        self.max_size_spin.setSuffix(" KB")
+        self.max_size_spin.setSpecialValueText("不限制")
+        self.max_size_spin.setToolTip("JPG/WEBP输出不超过该大小，质量设置作为上限")
+        self.max_size_spin.setEnabled(False)
+        quality_layout = QHBoxLayout()
+        quality_layout.addWidget(self.quality_spin)
+        quality_layout.addWidget(QLabel("大小上限:"))
+        quality_layout.addWidget(self.max_size_spin)
+        
+        # 编码预设
+        preset_label = QLabel("编码预设:")
+        self.preset_combo = QComboBox()
+        for preset, name in PRESET_NAMES.items():
+            self.preset_combo.addItem(name, preset)
+        self.preset_combo.setCurrentIndex(list(PRESET_NAMES).index(DEFAULT_PRESET))
+        self.preset_combo.setToolTip("最快：编码速度优先；均衡：默认；最小：文件体积优先")
         
         # 处理间隔设置
         interval_label = QLabel("处理间隔:")
@@ -179,19 +255,210 @@ class PDFTab(BaseTab):
         # 添加提示文本
         self.interval_combo.setToolTip("输入0-100的数字，0表示处理所有页面")
         
+        # 页面选择：页码范围、抽样和首尾预览
+        self.page_range_edit = QLineEdit()
+        self.page_range_edit.setPlaceholderText("全部，如 1-10,15,-3")
+        self.page_range_edit.setToolTip("页码从1开始，负数从末尾倒数（-1为最后一页），\"5-\" 表示第5页到最后一页")
+        self.page_every_spin = QSpinBox()
+        self.page_every_spin.setRange(1, 1000)
+        self.page_every_spin.setPrefix("每 ")
+        self.page_every_spin.setSuffix(" 页取一页")
+        self.page_first_spin = QSpinBox()
+        self.page_first_spin.setRange(0, 10000)
+        self.page_first_spin.setPrefix("前 ")
+        self.page_first_spin.setSuffix(" 页")
+        self.page_first_spin.setSpecialValueText("前 - 页")
+        self.page_last_spin = QSpinBox()
+        self.page_last_spin.setRange(0, 10000)
+        self.page_last_spin.setPrefix("后 ")
+        self.page_last_spin.setSuffix(" 页")
+        self.page_last_spin.setSpecialValueText("后 - 页")
+        self.page_first_spin.setToolTip("只保留前N页和/或后N页（首尾预览），0表示不限制")
+        self.page_last_spin.setToolTip("只保留前N页和/或后N页（首尾预览），0表示不限制")
+        pages_layout = QHBoxLayout()
+        pages_layout.addWidget(self.page_range_edit)
+        pages_layout.addWidget(self.page_every_spin)
+        pages_layout.addWidget(self.page_first_spin)
+        pages_layout.addWidget(self.page_last_spin)
+        
+        # 并行进程数设置
+        workers_label = QLabel("并行进程:")
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip("渲染使用的进程数，1表示串行处理")
+        
+        # 并行调度
+        self.largest_first_cb = QCheckBox("大文件优先")
+        self.largest_first_cb.setChecked(True)
+        self.largest_first_cb.setToolTip("并行渲染时先提交渲染量大的PDF，缩短整批的处理时间")
+        self.first_pages_cb = QCheckBox("首页优先")
+        self.first_pages_cb.setToolTip("并行渲染时先渲染每个PDF的首页，便于尽早检查输出")
+        schedule_layout = QHBoxLayout()
+        schedule_layout.addWidget(self.workers_spin)
+        schedule_layout.addWidget(self.largest_first_cb)
+        schedule_layout.addWidget(self.first_pages_cb)
+        
+        # 内存预算
+        memory_label = QLabel("内存预算:")
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(256, 65536)
+        self.memory_spin.setSingleStep(256)
+        self.memory_spin.setValue(DEFAULT_MEMORY_BUDGET // (1024 * 1024))
+        self.memory_spin.setSuffix(" MB")
+        self.memory_spin.setToolTip("同时渲染/分割的页面估算内存上限，超出预算的大页面单独处理")
+        
+        # 断点续传
+        self.resume_cb = QCheckBox("断点续传")
+        self.resume_cb.setToolTip("跳过输出目录中已完成且源文件和设置未变化的页面")
+        
+        # 扫描页直接提取原图
+        self.extract_cb = QCheckBox("扫描页直接提取原图")
+        self.extract_cb.setToolTip("整页只有一张JPEG的扫描页直接输出原图（.jpg，原始分辨率），不再重新渲染")
+        
+        # 超大页面分块渲染
+        tiling_label = QLabel("超大页面:")
+        self.tiling_combo = QComboBox()
+        self.tiling_combo.addItem("分块渲染，合并为一张PNG", ('auto', 'stream'))
+        self.tiling_combo.addItem("分块渲染，每块单独保存", ('auto', 'tiles'))
+        self.tiling_combo.addItem("整页渲染", ('off', 'stream'))
+        self.tiling_combo.setToolTip("超过约5000万像素的页面按分块渲染，不分配整页缓冲区；"
+                                     "JPG/WEBP无法流式编码，总是每块单独保存")
+        
+        # 渲染缓存：以不同分割/编码设置重新导出同一PDF时跳过栅格化
+        self.cache_cb = QCheckBox("渲染缓存:")
+        self.cache_cb.setToolTip(f"按页面内容、DPI和颜色模式缓存渲染结果\n缓存目录: {DEFAULT_CACHE_DIR}")
+        self.cache_size_spin = QSpinBox()
+        self.cache_size_spin.setRange(256, 262144)
+        self.cache_size_spin.setSingleStep(256)
+        self.cache_size_spin.setValue(DEFAULT_CACHE_SIZE // (1024 * 1024))
+        self.cache_size_spin.setSuffix(" MB")
+        self.cache_size_spin.setToolTip("缓存容量上限，超出后淘汰最久未使用的页面")
+        
+        # 空白页/重复页检测
+        detect_layout = QHBoxLayout()
+        self.detect_blank_cb = QCheckBox("空白页")
+        self.detect_dup_cb = QCheckBox("重复页")
+        self.detect_action_combo = QComboBox()
+        self.detect_action_combo.addItem("跳过", 'skip')
+        self.detect_action_combo.addItem("链接到首次出现", 'link')
+        self.detect_action_combo.setToolTip("跳过：不输出；链接到首次出现：只渲染一次，其余页面链接（或复制）该输出")
+        detect_layout.addWidget(self.detect_blank_cb)
+        detect_layout.addWidget(self.detect_dup_cb)
+        detect_layout.addWidget(self.detect_action_combo)
+        
+        # 草稿模式：低DPI快速预览，可选随后按最终设置精修
+        draft_layout = QHBoxLayout()
+        self.draft_cb = QCheckBox("草稿预览")
+        self.draft_cb.setToolTip("先以72 DPI、降低抗锯齿并跳过注释快速渲染整批PDF到 \"输出名_draft\" 目录")
+        self.refine_cb = QCheckBox("完成后精修")
+        self.refine_cb.setChecked(True)
+        self.refine_cb.setToolTip("草稿完成后按上面的设置渲染最终结果，复用已打开的文档")
+        draft_layout.addWidget(self.draft_cb)
+        draft_layout.addWidget(self.refine_cb)
+        
+        # 附加输出：同一次解析中额外输出另一种DPI/格式（如预览图）
+        self.extra_output_cb = QCheckBox("附加输出:")
+        self.extra_output_cb.setToolTip("页面只解析一次，同时输出另一种分辨率/格式到单独的目录")
+        extra_output_layout = QHBoxLayout()
+        self.extra_dpi_combo = QComboBox()
+        self.extra_dpi_combo.addItems(["72", "100", "150", "200", "300", "600"])
+        self.extra_dpi_combo.setEditable(True)
+        self.extra_dpi_combo.setCurrentText("72")
+        self.extra_dpi_combo.setValidator(QIntValidator(36, 1200, self))
+        self.extra_format_combo = QComboBox()
+        self.extra_format_combo.addItems(["JPG", "PNG", "WEBP"])
+        extra_output_layout.addWidget(self.extra_dpi_combo)
+        extra_output_layout.addWidget(QLabel("DPI"))
+        extra_output_layout.addWidget(self.extra_format_combo)
+        
+        # 颜色模式
+        colorspace_label = QLabel("颜色模式:")
+        self.colorspace_combo = QComboBox()
+        self.colorspace_combo.addItem("自动", 'auto')
+        self.colorspace_combo.addItem("彩色", 'rgb')
+        self.colorspace_combo.addItem("灰度", 'gray')
+        self.colorspace_combo.setToolTip("自动：黑白/灰度页面以单通道输出，彩色页面保持RGB")
+        
         # 添加到网格布局
         convert_layout.addWidget(dpi_label, 0, 0)
         convert_layout.addWidget(self.dpi_combo, 0, 1)
         convert_layout.addWidget(format_label, 1, 0)
         convert_layout.addWidget(self.format_combo, 1, 1)
         convert_layout.addWidget(quality_label, 2, 0)
-        convert_layout.addWidget(self.quality_spin, 2, 1)
-        convert_layout.addWidget(interval_label, 3, 0)
-        convert_layout.addWidget(self.interval_combo, 3, 1)
+        convert_layout.addLayout(quality_layout, 2, 1)
+        convert_layout.addWidget(preset_label, 3, 0)
+        convert_layout.addWidget(self.preset_combo, 3, 1)
+        convert_layout.addWidget(interval_label, 4, 0)
+        convert_layout.addWidget(self.interval_combo, 4, 1)
+        convert_layout.addWidget(workers_label, 5, 0)
+        convert_layout.addLayout(schedule_layout, 5, 1)
+        convert_layout.addWidget(memory_label, 6, 0)
+        convert_layout.addWidget(self.memory_spin, 6, 1)
+        convert_layout.addWidget(self.resume_cb, 7, 0, 1, 2)
+        convert_layout.addWidget(self.extract_cb, 8, 0, 1, 2)
+        convert_layout.addWidget(colorspace_label, 9, 0)
+        convert_layout.addWidget(self.colorspace_combo, 9, 1)
+        convert_layout.addWidget(tiling_label, 10, 0)
+        convert_layout.addWidget(self.tiling_combo, 10, 1)
+        convert_layout.addWidget(self.extra_output_cb, 11, 0)
+        convert_layout.addLayout(extra_output_layout, 11, 1)
+        convert_layout.addWidget(self.cache_cb, 12, 0)
+        convert_layout.addWidget(self.cache_size_spin, 12, 1)
+        convert_layout.addWidget(QLabel("页面检测:"), 13, 0)
+        convert_layout.addLayout(detect_layout, 13, 1)
+        convert_layout.addWidget(QLabel("草稿模式:"), 14, 0)
+        convert_layout.addLayout(draft_layout, 14, 1)
+        convert_layout.addWidget(QLabel("页面选择:"), 15, 0)
+        convert_layout.addLayout(pages_layout, 15, 1)
         
         convert_group.setLayout(convert_layout)
         settings_layout.addWidget(convert_group)
         
+        # 直接分割设置：渲染结果在内存中分割，不保存整页图片
+        self.split_group = QGroupBox("直接分割")
+        self.split_group.setCheckable(True)
+        self.split_group.setChecked(False)
+        self.split_group.setToolTip("渲染后直接分割，只保存分割后的图片")
+        split_layout = QGridLayout()
+        
+        self.split_mode_combo = QComboBox()
+        self.split_mode_combo.addItems(["通用模式", "自定义模式"])
+        
+        self.split_width_spin = QSpinBox()
+        self.split_width_spin.setRange(100, 10000)
+        self.split_width_spin.setValue(800)
+        self.split_width_spin.setSuffix(" px")
+        self.split_width_spin.setEnabled(False)
+        
+        self.split_height_spin = QSpinBox()
+        self.split_height_spin.setRange(100, 10000)
+        self.split_height_spin.setValue(1200)
+        self.split_height_spin.setSuffix(" px")
+        self.split_height_spin.setEnabled(False)
+        
+        self.split_rotate_cb = QCheckBox("底部图片旋转180°")
+        self.split_first_cb = QCheckBox("首页底部不旋转")
+        self.split_first_cb.setChecked(True)
+        self.split_gutter_cb = QCheckBox("自动检测分割线")
+        self.split_gutter_cb.setToolTip("在中线两侧10%范围内寻找最空白的位置分割（如偏离中间的书脊）")
+        
+        split_layout.addWidget(QLabel("分割模式:"), 0, 0)
+        split_layout.addWidget(self.split_mode_combo, 0, 1)
+        split_layout.addWidget(QLabel("目标宽度:"), 1, 0)
+        split_layout.addWidget(self.split_width_spin, 1, 1)
+        split_layout.addWidget(QLabel("目标高度:"), 2, 0)
+        split_layout.addWidget(self.split_height_spin, 2, 1)
+        split_layout.addWidget(self.split_rotate_cb, 3, 0, 1, 2)
+        split_layout.addWidget(self.split_first_cb, 4, 0, 1, 2)
+        split_layout.addWidget(self.split_gutter_cb, 5, 0, 1, 2)
+        
+        self.split_group.setLayout(split_layout)
+        settings_layout.addWidget(self.split_group)
+        
+        # 长图：每个PDF的输出按顺序拼接为长图
+        settings_layout.addWidget(self.create_stitch_group())
+        
         # 输出设置（使用基类的设置）
         output_group = QGroupBox("输出设置")
         output_layout = QVBoxLayout()
@@ -208,6 +475,8 @@ class PDFTab(BaseTab):
         
         # 连接信号
         self.format_combo.currentTextChanged.connect(self.on_format_changed)
+        self.preset_combo.currentIndexChanged.connect(self.on_preset_changed)
+        self.split_mode_combo.currentTextChanged.connect(self.on_split_mode_changed)
         
     def create_control_buttons(self):
         """创建控制按钮"""
@@ -244,10 +513,13 @@ class PDFTab(BaseTab):
             "PDF文件 (*.pdf)"
         )
         if files:
+            added = []
             for file_path in files:
                 if os.path.exists(file_path):
                     self.add_file_to_list(file_path)
                     self.file_paths[self.file_list.rowCount() - 1] = file_path
+                    added.append(file_path)
+            self.refresh_catalog(added)
                     
     def add_folder(self):
         """添加文件夹"""
@@ -256,17 +528,21 @@ class PDFTab(BaseTab):
             "选择包含PDF文件的文件夹"
         )
         if folder:
+            added = []
             for root, _, files in os.walk(folder):
                 for file in files:
                     if file.lower().endswith('.pdf'):
                         file_path = os.path.join(root, file)
                         self.add_file_to_list(file_path)
                         self.file_paths[self.file_list.rowCount() - 1] = file_path
+                        added.append(file_path)
+            self.refresh_catalog(added)
                         
     def clear_list(self):
         """清空文件列表"""
         self.file_list.setRowCount(0)
         self.file_paths.clear()
+        self.worker.pdf_processor.catalog.clear()
         
     def remove_selected(self):
         """删除选中的文件"""
@@ -298,18 +574,28 @@ class PDFTab(BaseTab):
         try:
             # 构建split_config
             split_config = {
-                'output_name': self.output_name.text() or "pdf_output"  # 使用输出名称或默认值
+                'output_name': self.output_name.text() or "pdf_output",  # 使用输出名称或默认值
+                'fused_split': self.split_group.isChecked(),
+                'mode': self.split_mode_combo.currentText(),
+                'target_width': self.split_width_spin.value(),
+                'target_height': self.split_height_spin.value(),
+                'rotate_bottom': self.split_rotate_cb.isChecked(),
+                'first_page_no_rotate': self.split_first_cb.isChecked(),
+                'gutter': self.split_gutter_cb.isChecked()
             }
             
             # 配置worker
             self.worker.configure(
                 files=files,
                 dpi=int(self.dpi_combo.currentText()),
-                output_format='PNG',
+                output_format=self.format_combo.currentText(),
                 interval=int(self.interval_combo.currentText().split(' ')[0]),
-                output_location="原位置" if self.output_original.isChecked() else "自定义位置",
-                custom_output_path=self.output_path.text() if self.output_custom.isChecked() else None,
-                split_config=split_config  # 添加split_config参数
+                output_location=self.get_output_location(),
+                custom_output_path=self.get_custom_output_path(),
+                split_config=split_config,  # 添加split_config参数
+                workers=self.workers_spin.value(),
+                resume=self.resume_cb.isChecked(),
+                render_config=self.get_render_config()
             )
             
             # 重置状态
@@ -380,6 +666,7 @@ class PDFTab(BaseTab):
         """禁用设置和文件操作"""
         self.dpi_combo.setEnabled(False)
         self.interval_combo.setEnabled(False)
+        self.workers_spin.setEnabled(False)
         self.original_radio.setEnabled(False)
         self.custom_radio.setEnabled(False)
         self.custom_path.setEnabled(False)
@@ -393,6 +680,7 @@ class PDFTab(BaseTab):
         """启用设置和文件操作"""
         self.dpi_combo.setEnabled(True)
         self.interval_combo.setEnabled(True)
+        self.workers_spin.setEnabled(True)
         self.original_radio.setEnabled(True)
         self.custom_radio.setEnabled(True)
         self.custom_path.setEnabled(self.custom_radio.isChecked())
@@ -413,6 +701,7 @@ class PDFTab(BaseTab):
         return {
             'dpi': int(self.dpi_combo.currentText()),
             'interval': int(self.interval_combo.currentText().split(' ')[0]),
+            'workers': self.workers_spin.value(),
             'use_original_location': self.original_radio.isChecked(),
             'output_path': self.custom_path.text() if self.custom_radio.isChecked() else None
         }
@@ -433,6 +722,32 @@ class PDFTab(BaseTab):
         self.remove_btn.setEnabled(not self.is_processing)
         self.dpi_combo.setEnabled(not self.is_processing)
         self.interval_combo.setEnabled(not self.is_processing)
+        self.page_range_edit.setEnabled(not self.is_processing)
+        self.page_every_spin.setEnabled(not self.is_processing)
+        self.page_first_spin.setEnabled(not self.is_processing)
+        self.page_last_spin.setEnabled(not self.is_processing)
+        self.workers_spin.setEnabled(not self.is_processing)
+        self.largest_first_cb.setEnabled(not self.is_processing)
+        self.first_pages_cb.setEnabled(not self.is_processing)
+        self.memory_spin.setEnabled(not self.is_processing)
+        self.split_group.setEnabled(not self.is_processing)
+        self.stitch_group.setEnabled(not self.is_processing)
+        self.resume_cb.setEnabled(not self.is_processing)
+        self.extract_cb.setEnabled(not self.is_processing)
+        self.colorspace_combo.setEnabled(not self.is_processing)
+        self.extra_output_cb.setEnabled(not self.is_processing)
+        self.tiling_combo.setEnabled(not self.is_processing)
+        self.cache_cb.setEnabled(not self.is_processing)
+        self.detect_blank_cb.setEnabled(not self.is_processing)
+        self.detect_dup_cb.setEnabled(not self.is_processing)
+        self.detect_action_combo.setEnabled(not self.is_processing)
+        self.draft_cb.setEnabled(not self.is_processing)
+        self.refine_cb.setEnabled(not self.is_processing)
+        self.cache_size_spin.setEnabled(not self.is_processing)
+        self.extra_dpi_combo.setEnabled(not self.is_processing)
+        self.extra_format_combo.setEnabled(not self.is_processing)
+        self.format_combo.setEnabled(not self.is_processing)
+        self.preset_combo.setEnabled(not self.is_processing)
 
     def update_progress(self, value):
         """更新进度"""
@@ -500,6 +815,46 @@ class PDFTab(BaseTab):
         if 0 <= row < self.file_list.rowCount():
             self.file_list.setItem(row, 3, QTableWidgetItem(status))
             
+    def refresh_catalog(self, file_paths):
+        """在后台预扫描新添加的PDF，完成后将页数、页面尺寸和加密状态填入文件列表"""
+        if not file_paths:
+            return
+        self.pending_scan.extend(file_paths)
+        if not self.scan_thread.isRunning():
+            self.start_scan()
+            
+    def start_scan(self):
+        """开始扫描等待中的文件"""
+        self.scan_worker.files = self.pending_scan
+        self.scan_worker.workers = self.workers_spin.value()
+        self.pending_scan = []
+        self.scan_thread.start()
+        
+    def handle_scan_finished(self):
+        """预扫描完成：填入文件列表，扫描期间又添加了文件时继续扫描"""
+        self.scan_thread.quit()
+        self.scan_thread.wait()
+        self.fill_catalog_columns()
+        if self.pending_scan:
+            self.start_scan()
+            
+    def fill_catalog_columns(self):
+        """将文档目录中已有的元数据填入文件列表"""
+        catalog = self.worker.pdf_processor.catalog
+        # 填充时暂停排序，避免行号在写入过程中变化
+        self.file_list.setSortingEnabled(False)
+        for row, file_path in self.file_paths.items():
+            info = catalog.get(file_path)
+            if info is None or not (0 <= row < self.file_list.rowCount()):
+                continue
+            pages_item = QTableWidgetItem()
+            pages_item.setData(Qt.ItemDataRole.DisplayRole, info.page_count)
+            self.file_list.setItem(row, 4, pages_item)
+            self.file_list.setItem(row, 5, QTableWidgetItem(info.size_label()))
+            encrypted = "需要密码" if info.needs_pass else ("是" if info.is_encrypted else "否")
+            self.file_list.setItem(row, 6, QTableWidgetItem("错误" if info.error else encrypted))
+        self.file_list.setSortingEnabled(True)
+            
     def log_message(self, message):
         """添加日志消息"""
         if hasattr(self, 'log_text'):
@@ -518,16 +873,20 @@ class PDFTab(BaseTab):
     def dropEvent(self, event: QDropEvent):
         """拖拽放下事件"""
         urls = event.mimeData().urls()
+        added = []
         for url in urls:
             file_path = url.toLocalFile()
             if os.path.isfile(file_path) and file_path.lower().endswith('.pdf'):
                 self.add_file_to_list(file_path)
+                added.append(file_path)
             elif os.path.isdir(file_path):
                 for root, _, files in os.walk(file_path):
                     for file in files:
                         if file.lower().endswith('.pdf'):
                             pdf_path = os.path.join(root, file)
                             self.add_file_to_list(pdf_path)
+                            added.append(pdf_path)
+        self.refresh_catalog(added)
                             
     def cleanup(self):
         """清理资源"""
@@ -535,8 +894,13 @@ class PDFTab(BaseTab):
             self.worker.pdf_processor.stop_event.set()
             self.thread.quit()
             self.thread.wait()
+        if self.scan_thread.isRunning():
+            self.scan_thread.quit()
+            self.scan_thread.wait()
         self.worker.deleteLater()
         self.thread.deleteLater()
+        self.scan_worker.deleteLater()
+        self.scan_thread.deleteLater()
         
     def closeEvent(self, event):
         """关闭事件"""
@@ -557,8 +921,70 @@ class PDFTab(BaseTab):
 
     def on_format_changed(self, format_text):
         """处理输出格式变更"""
-        # 当选择JPG格式时启用质量设置
-        self.quality_spin.setEnabled(format_text == "JPG")
+        # 当选择有损格式时启用质量设置
+        self.quality_spin.setEnabled(format_text in ("JPG", "WEBP"))
+        self.max_size_spin.setEnabled(format_text in ("JPG", "WEBP"))
+        self.on_preset_changed()
+        
+    def on_preset_changed(self, index=None):
+        """切换编码预设时，将质量设置同步为预设值"""
+        settings = ENCODER_PRESETS[self.preset_combo.currentData()]
+        if self.format_combo.currentText() == "WEBP":
+            self.quality_spin.setValue(settings['webp']['quality'])
+        else:
+            self.quality_spin.setValue(settings['jpeg']['quality'])
+        
+    def on_split_mode_changed(self, mode_text):
+        """分割模式变更时启用/禁用目标尺寸设置"""
+        is_custom = mode_text == "自定义模式"
+        self.split_width_spin.setEnabled(is_custom)
+        self.split_height_spin.setEnabled(is_custom)
+
+    def get_render_config(self):
+        """获取渲染配置"""
+        tiling_mode, tiling_output = self.tiling_combo.currentData()
+        extra_outputs = []
+        if self.extra_output_cb.isChecked() and self.extra_dpi_combo.currentText().isdigit():
+            extra_outputs.append({
+                'dpi': int(self.extra_dpi_combo.currentText()),
+                'format': self.extra_format_combo.currentText()
+            })
+        return {
+            'extract_images': self.extract_cb.isChecked(),
+            'colorspace': self.colorspace_combo.currentData(),
+            'memory_budget': self.memory_spin.value() * 1024 * 1024,
+            'extra_outputs': extra_outputs,
+            'tiling': {'mode': tiling_mode, 'output': tiling_output},
+            'detect': {
+                'blank': self.detect_blank_cb.isChecked(),
+                'duplicates': self.detect_dup_cb.isChecked(),
+                'action': self.detect_action_combo.currentData()
+            },
+            'draft': {
+                'refine': self.refine_cb.isChecked()
+            } if self.draft_cb.isChecked() else None,
+            'archive': self.get_archive_config(),
+            'stitch': self.get_stitch_config(),
+            'pages': {
+                'ranges': self.page_range_edit.text().strip(),
+                'every': self.page_every_spin.value(),
+                'first': self.page_first_spin.value(),
+                'last': self.page_last_spin.value()
+            },
+            'schedule': {
+                'largest_first': self.largest_first_cb.isChecked(),
+                'first_pages': self.first_pages_cb.isChecked()
+            },
+            'cache': {
+                'dir': DEFAULT_CACHE_DIR,
+                'max_bytes': self.cache_size_spin.value() * 1024 * 1024
+            } if self.cache_cb.isChecked() else None,
+            'encoder': {
+                'preset': self.preset_combo.currentData(),
+                'quality': self.quality_spin.value(),
+                'max_bytes': self.max_size_spin.value() * 1024 or None
+            }
+        }
 
     def get_processing_params(self):
         """获取处理参数"""
@@ -572,7 +998,7 @@ class PDFTab(BaseTab):
         
         # 获取输出格式和质量
         output_format = self.format_combo.currentText()
-        quality = self.quality_spin.value() if output_format == "JPG" else None
+        quality = self.quality_spin.value() if output_format in ("JPG", "WEBP") else None
         
         # 解析处理间隔
         interval_text = self.interval_combo.currentText()
@@ -617,6 +1043,13 @@ class PDFTab(BaseTab):
                 QMessageBox.warning(self, "警告", "请输入有效的处理间隔")
                 return False
             
+            # 验证页面选择
+            try:
+                PageSelection({'ranges': self.page_range_edit.text()})
+            except ValueError as e:
+                QMessageBox.warning(self, "警告", str(e))
+                return False
+            
             return True
             
         except ValueError as e:
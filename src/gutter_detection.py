@@ -0,0 +1,185 @@
+from PIL import Image
+from typing import Dict, List, Optional, Tuple
+
+# 计算投影前，搜索区域沿分割方向缩小到的最大长度（像素）
+PROFILE_SIZE = 512
+
+# 垂直于分割方向缩小到的最大长度（像素）；缩得太小会把细笔画平均成浅灰而漏检
+PROFILE_DEPTH = 512
+
+# JPEG按1/8比例解码为灰度图（DCT缩放，不做完整解码）
+DRAFT_SCALE = 8
+
+# 纸张亮度取搜索区域亮度的该百分位
+PAPER_PERCENTILE = 0.95
+
+# 比纸张暗该灰度值以上的像素算作墨迹
+INK_CONTRAST = 64
+
+# 空白带的墨迹覆盖率上限（0-255对应0-100%），超过时认为没有空白，保持中线
+MAX_INK = 3
+
+# 墨迹覆盖率与最空白的带相差不超过该值（0-255）的位置都视为空白
+INK_TOLERANCE = 1
+
+# 两段空白之间的暗区不超过空白带宽度的该倍数时（书脊阴影），合并为一段
+MAX_SHADOW_BANDS = 3
+
+# Image.reduce支持的模式，其他模式（如P、1）先转为灰度
+_REDUCE_MODES = ("L", "LA", "RGB", "RGBA", "RGBX", "CMYK", "YCbCr", "I", "F")
+
+Box = Tuple[int, int, int, int]
+
+
+class GutterFinder:
+    """
+    分割线（书脊）检测
+
+    扫描的书页跨页中，两页之间的空白往往不在正中间。在缩小的灰度图上计算
+    中线附近每一列（左右分割）或每一行（上下分割）的墨迹覆盖率，选择墨迹最少的
+    带状区域作为分割线。书脊阴影两侧的空白合并为一段，取其中心；有多段空白时
+    取离中线最近的一段。没有几乎无墨迹的空白（如跨页的整幅图画）时保持中线。
+
+    config:
+        search: 搜索范围，中线两侧各占图片长度的比例，默认0.1
+        band: 空白带宽度，占图片长度的比例，默认0.01
+    """
+    def __init__(self, config: Dict = None):
+        """
+        Raises:
+            ValueError: 参数超出范围
+        """
+        config = config or {}
+        self.search = float(config.get('search', 0.1))
+        self.band = float(config.get('band', 0.01))
+        if not 0 < self.search < 0.5 or not 0 < self.band < self.search:
+            raise ValueError("分割线搜索范围应在0到0.5之间，且大于空白带宽度")
+
+    @classmethod
+    def from_config(cls, config) -> Optional['GutterFinder']:
+        """由分割配置中的gutter项创建，为None/False时不检测；为True时使用默认参数"""
+        if not config:
+            return None
+        return cls(config if isinstance(config, dict) else None)
+
+    @staticmethod
+    def sample(img: Image.Image) -> Image.Image:
+        """
+        准备用于检测的图片：JPEG文件按1/8比例直接解码为灰度，其他格式原样返回（检测时解码并缩小，
+        因此split_plan只在规划阶段对JPEG调用，其他格式等执行时用已解码的原图检测）
+
+        JPEG会修改传入的未加载图片的解码方式，调用后img本身即为缩小的图片。
+        """
+        if img.format == 'JPEG':
+            img.draft('L', (img.width // DRAFT_SCALE, img.height // DRAFT_SCALE))
+        return img
+
+    def find(self, img: Image.Image, vertical: bool) -> Optional[float]:
+        """
+        检测分割线位置
+
+        Args:
+            img: 整页图片（可以是缩小的版本）
+            vertical: True为左右分割（竖直分割线），False为上下分割
+
+        Returns:
+            分割线位置占图片长度的比例；没有明显的空白时为None
+        """
+        width, height = img.size
+        length = width if vertical else height
+        reach = int(length * self.search)
+        if reach < 2:
+            return None
+        low, high = length // 2 - reach, length // 2 + reach
+        if vertical:
+            box = (low, 0, high, height)
+            factor = (max(1, (high - low) // PROFILE_SIZE), max(1, height // PROFILE_DEPTH))
+        else:
+            box = (0, low, width, high)
+            factor = (max(1, width // PROFILE_DEPTH), max(1, (high - low) // PROFILE_SIZE))
+
+        if img.mode not in _REDUCE_MODES:
+            img = img.convert("L")
+        region = img.reduce(factor, box) if factor != (1, 1) else img.crop(box)
+        region = region.convert("L")
+
+        # 比纸张暗得多的像素标为墨迹，BOX缩放到一行（一列）即为各列（各行）的墨迹覆盖率
+        histogram = region.histogram()
+        remaining = region.width * region.height * (1 - PAPER_PERCENTILE)
+        paper = 255
+        while paper > 0 and remaining > 0:
+            remaining -= histogram[paper]
+            paper -= 1
+        ink = region.point([255 if value < paper - INK_CONTRAST else 0 for value in range(256)])
+        if vertical:
+            profile = ink.resize((ink.width, 1), Image.Resampling.BOX).tobytes()
+            step = factor[0]
+        else:
+            profile = ink.resize((1, ink.height), Image.Resampling.BOX).tobytes()
+            step = factor[1]
+
+        count = len(profile)
+        band = min(count, max(1, round(self.band * length / step)))
+        sums = [sum(profile[:band])]
+        for i in range(band, count):
+            sums.append(sums[-1] + profile[i] - profile[i - band])
+        best = min(sums)
+        if best > MAX_INK * band:
+            return None
+
+        # 连续的空白带合并为一段 [起点, 终点)，中间只隔着窄暗区的相邻两段再合并
+        threshold = best + INK_TOLERANCE * band
+        runs = []
+        start = None
+        for i, total in enumerate(sums + [threshold + 1]):
+            if total <= threshold:
+                if start is None:
+                    start = i
+            elif start is not None:
+                end = i - 1 + band
+                if runs and start - runs[-1][1] <= MAX_SHADOW_BANDS * band:
+                    runs[-1] = (runs[-1][0], end)
+                else:
+                    runs.append((start, end))
+                start = None
+
+        # 取中心离中线最近的一段
+        middle = count / 2
+        position = min(((run_start + run_end) / 2 for run_start, run_end in runs),
+                       key=lambda center: abs(center - middle))
+        return (low + position * step) / length
+
+    def apply(self, parts: List[Tuple[Box, bool]], width: int, height: int,
+              sample: Image.Image) -> List[Tuple[Box, bool]]:
+        """
+        把两部分分割的分割线移到检测到的位置
+
+        Args:
+            parts: [(裁剪框, 是否旋转180度), ...]，按width x height规划
+            width: 原图宽度
+            height: 原图高度
+            sample: 用于检测的整页图片（可以是缩小的版本，见sample）
+
+        Returns:
+            调整后的parts；不是两部分分割或没有检测到空白时原样返回
+        """
+        if len(parts) != 2:
+            return parts
+        (first, first_rotate), (second, second_rotate) = parts
+        if first[2] == second[0] and (first[1], first[3]) == (second[1], second[3]):
+            ratio = self.find(sample, True)
+            if ratio is None:
+                return parts
+            cut = min(max(round(ratio * width), 1), width - 1)
+            first = (first[0], first[1], cut, first[3])
+            second = (cut, second[1], second[2], second[3])
+        elif first[3] == second[1] and (first[0], first[2]) == (second[0], second[2]):
+            ratio = self.find(sample, False)
+            if ratio is None:
+                return parts
+            cut = min(max(round(ratio * height), 1), height - 1)
+            first = (first[0], first[1], first[2], cut)
+            second = (second[0], cut, second[2], second[3])
+        else:
+            return parts
+        return [(first, first_rotate), (second, second_rotate)]
@@ -1,9 +1,18 @@
-from PIL import Image
 import os
 import threading
-from typing import List, Dict, Optional, Callable
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import List, Dict, Optional, Callable, Tuple
 from queue import Queue
 from utils import natural_sort_key
+from encoder_profiles import EncoderProfile
+from memory_governor import shared_governor
+from archive_sink import ArchiveSink
+from long_image import LongImageWriter
+from split_plan import FileSplitPlan, plan_files, format_plan_report, execute_plan
+from jpeg_lossless import DEFAULT_SNAP_TOLERANCE
+from gutter_detection import GutterFinder
+
 
 class ImageProcessor:
     def __init__(self):
@@ -16,28 +25,60 @@ class ImageProcessor:
         self.stop_event = threading.Event()
         self.pause_event.set()  # 默认不暂停
         self.stop_event.clear()  # 默认不停止
+        # 内存调度器，与PDFProcessor共用
+        self.governor = shared_governor()
 
     def split_images(self, files: List[str], input_root_dir: str, split_config: Dict, output_config: Dict,
                     progress_callback: Optional[Callable] = None,
                     log_callback: Optional[Callable] = None):
-        """分割图片"""
+        """
+        分割图片
+        
+        Args:
+            files: 图片文件列表
+            input_root_dir: 输入根目录
+            split_config: 分割配置，可包含lossless_jpeg（JPEG输出为JPEG时用jpegtran在压缩域中无损分割）
+                          、snap_tolerance（分割线吸附到MCU边界的最大距离，像素）
+                          和gutter（检测中线附近的空白作为分割线，见GutterFinder）
+            output_config: 输出配置，可包含output_format ('JPG'、'PNG'、'WEBP'，默认JPG)
+                           、encoder（编码配置，见EncoderProfile.from_config）
+                           、memory_budget（内存预算，字节）、use_archive（每个文件夹输出为
+                           一个压缩包，位于自定义输出路径或原位置）、archive（压缩包配置，见ArchiveSink）
+                           、stitch（长图配置，每个文件夹的分割结果按顺序拼接为长图，见LongImageWriter）
+                           、workers（并行分割的进程数，默认1即在当前线程逐个处理）
+                           和dry_run（只读取文件头生成分割方案并输出预览报告，不解码、不写入）
+            progress_callback: 进度回调 progress_callback(current, total)
+            log_callback: 日志回调
+        """
         self.paused = False
         self.stopped = False
         self.pause_event.set()
         self.stop_event.clear()
         
         def process_worker():
+            sink = None
+            stitcher = None
+            # 内存预算只在本次处理期间有效
+            budget_token = self.governor.override_budget(output_config.get('memory_budget'))
             try:
-                # 创建主输出目录
-                if output_config['use_original_location']:
+                output_format = output_config.get('output_format', 'JPG')
+                profile = EncoderProfile.from_config(output_config.get('encoder'))
+                
+                if output_config.get('use_archive'):
+                    sink = ArchiveSink(output_config.get('archive'))
+                
+                # 创建主输出目录（压缩包模式未指定路径时放在原位置）
+                if output_config['use_original_location'] or (sink and not output_config.get('custom_output_path')):
                     output_base = os.path.join(input_root_dir, output_config['output_name'])
                 else:
                     output_base = os.path.join(output_config['custom_output_path'], output_config['output_name'])
                 
-                os.makedirs(output_base, exist_ok=True)
-                
-                if log_callback:
-                    log_callback(f"创建输出目录: {output_base}")
+                # 预览分割方案时不创建任何文件
+                dry_run = output_config.get('dry_run', False)
+                if not dry_run:
+                    os.makedirs(output_base, exist_ok=True)
+                    if log_callback:
+                        log_callback(f"创建输出目录: {output_base}")
                 
                 # 按文件夹分组文件
                 folder_files = {}
@@ -47,77 +88,120 @@ class ImageProcessor:
                         folder_files[parent_dir] = []
                     folder_files[parent_dir].append(file_path)
                 
+                # 规划：只读取文件头，每个文件夹按自然排序后只有第一个文件作为首页
+                folder_names = []
+                entries = []
+                for folder_name, folder_files_list in folder_files.items():
+                    folder_output_dir = os.path.join(output_base, folder_name)
+                    ordered = sorted(folder_files_list, key=lambda x: natural_sort_key(os.path.basename(x)))
+                    for index, file_path in enumerate(ordered):
+                        folder_names.append(folder_name)
+                        entries.append((file_path, folder_output_dir, index == 0))
+                plans = plan_files(entries, lambda width, height, is_first_page: self._plan_split(
+                    width, height, split_config, is_first_page), output_format,
+                    lossless_jpeg=split_config.get('lossless_jpeg', False),
+                    snap_tolerance=split_config.get('snap_tolerance', DEFAULT_SNAP_TOLERANCE),
+                    gutter=GutterFinder.from_config(split_config.get('gutter')),
+                    stop_event=self.stop_event, pause_event=self.pause_event)
+                if self.stop_event.is_set():
+                    if log_callback:
+                        log_callback("处理已停止")
+                    return
+                tasks = list(zip(folder_names, plans))
+                
+                if dry_run:
+                    if log_callback:
+                        log_callback("预览分割方案（不写入文件）:")
+                        for line in format_plan_report(plans):
+                            log_callback(line)
+                    if progress_callback:
+                        progress_callback(len(tasks), len(tasks))
+                    if log_callback:
+                        log_callback("处理完成")
+                    return
+                
+                workers = output_config.get('workers', 1)
+                if workers > 1:
+                    self._split_images_parallel(
+                        tasks, output_format, profile, sink, output_config.get('stitch'),
+                        workers, progress_callback, log_callback
+                    )
+                    if log_callback and not self.stop_event.is_set():
+                        log_callback("处理完成")
+                    return
+                
                 # 计算总任务数
-                total_tasks = sum(len(folder_files[folder]) for folder in folder_files)
+                total_tasks = len(tasks)
                 processed_tasks = 0
+                current_folder = None
                 
-                # 处理每个文件夹
-                for folder_name, folder_files_list in folder_files.items():
+                # 按文件夹顺序处理每个文件
+                for folder_name, plan in tasks:
                     if self.stop_event.is_set():
                         if log_callback:
                             log_callback("处理已停止")
                         return
                     
-                    # 创建文件夹输出目录
-                    folder_output_dir = os.path.join(output_base, folder_name)
-                    os.makedirs(folder_output_dir, exist_ok=True)
+                    if folder_name != current_folder:
+                        if stitcher is not None:
+                            self._write_long_images(stitcher, current_folder, sink, log_callback)
+                            stitcher = None
+                        current_folder = folder_name
+                        
+                        # 创建文件夹输出目录（输出到压缩包时为 "{文件夹名}.cbz"）
+                        if sink is None:
+                            os.makedirs(plan.output_dir, exist_ok=True)
+                        
+                        if log_callback:
+                            log_callback(f"处理文件夹: {folder_name}")
+                            if sink is not None:
+                                log_callback(f"输出压缩包: {sink.archive_path(plan.output_dir)}")
+                        
+                        # 长图：分割结果在内存中直接拼接，不重新读取已保存的图片
+                        if output_config.get('stitch'):
+                            stitcher = LongImageWriter(plan.output_dir, output_config['stitch'],
+                                                       profile, sink is not None)
                     
-                    if log_callback:
-                        log_callback(f"处理文件夹: {folder_name}")
+                    self.pause_event.wait()
                     
-                    # 处理文件夹中的每个文件
-                    for index, file_path in enumerate(sorted(folder_files_list, key=lambda x: natural_sort_key(os.path.basename(x)))):
-                        if self.stop_event.is_set():
+                    img_name = os.path.splitext(plan.name)[0]
+                    try:
+                        if log_callback:
+                            log_callback(f"处理图片: {folder_name}/{img_name}")
+                        
+                        # 按文件头估算内存，预算不足时等待
+                        reservation = self.governor.acquire(*plan.estimate_memory(), self.stop_event)
+                        if reservation is None:
                             if log_callback:
                                 log_callback("处理已停止")
                             return
                         
-                        self.pause_event.wait()
+                        # 按分割方案裁剪并保存
+                        with reservation:
+                            outputs, parts = execute_plan(
+                                plan, output_format, profile, sink is not None, stitcher is not None
+                            )
+                            for output_path, data in outputs:
+                                if sink is not None:
+                                    sink.write(output_path, data)
+                            for part in parts:
+                                stitcher.add(part)
                         
-                        try:
-                            img_name = os.path.splitext(os.path.basename(file_path))[0]
-                            
-                            if log_callback:
-                                log_callback(f"处理图片: {folder_name}/{img_name}")
-                            
-                            # 判断是否为首页
-                            is_first_page = index == 0
-                            
-                            with Image.open(file_path) as img:
-                                # 分割图片
-                                if split_config['mode'] == 'custom':
-                                    parts = self._split_image_custom(
-                                        img, 
-                                        split_config['target_width'],
-                                        split_config['target_height'],
-                                        split_config['rotate_bottom'],
-                                        split_config['special_first'],
-                                        is_first_page
-                                    )
-                                else:
-                                    parts = self._split_image_general(
-                                        img,
-                                        split_config['rotate_bottom'],
-                                        split_config['special_first'],
-                                        is_first_page
-                                    )
-                                
-                                # 保存分割后的图片
-                                for i, part in enumerate(parts):
-                                    output_path = os.path.join(folder_output_dir, f"{img_name}_split_{i+1}.jpg")
-                                    part.save(output_path, "JPEG", quality=95)
-                            
-                            if log_callback:
-                                log_callback(f"处理完成：{folder_name}/{img_name}")
-                            
-                            processed_tasks += 1
-                            if progress_callback:
-                                progress_callback(processed_tasks, total_tasks)
-                            
-                        except Exception as e:
-                            if log_callback:
-                                log_callback(f"处理失败：{folder_name}/{img_name} - {str(e)}")
-                            continue
+                        if log_callback:
+                            log_callback(f"处理完成：{folder_name}/{img_name}")
+                        
+                        processed_tasks += 1
+                        if progress_callback:
+                            progress_callback(processed_tasks, total_tasks)
+                        
+                    except Exception as e:
+                        if log_callback:
+                            log_callback(f"处理失败：{folder_name}/{img_name} - {str(e)}")
+                        continue
+                
+                if stitcher is not None:
+                    self._write_long_images(stitcher, current_folder, sink, log_callback)
+                    stitcher = None
                 
                 if log_callback and not self.stop_event.is_set():
                     log_callback("处理完成")
@@ -126,6 +210,12 @@ class ImageProcessor:
                 if log_callback:
                     log_callback(f"处理过程发生错误: {str(e)}")
             finally:
+                # 停止时放弃未完成的长图
+                if stitcher is not None:
+                    stitcher.abort()
+                if sink is not None:
+                    sink.close()
+                self.governor.restore_budget(budget_token)
                 # 重置状态
                 self.paused = False
                 self.stopped = False
@@ -135,13 +225,164 @@ class ImageProcessor:
         self.current_thread = threading.Thread(target=process_worker)
         self.current_thread.start()
     
-    def _split_image_custom(self, img: Image.Image, target_width: int, target_height: int, 
-                           rotate_bottom: bool, special_first: bool, is_first_page: bool) -> List[Image.Image]:
+    def _split_images_parallel(self, tasks: List[Tuple[str, FileSplitPlan]], output_format: str,
+                               profile: EncoderProfile, sink: Optional[ArchiveSink],
+                               stitch_config: Optional[Dict], workers: int,
+                               progress_callback: Optional[Callable] = None,
+                               log_callback: Optional[Callable] = None):
         """
-        根据目标尺寸分割图片
+        使用进程池并行分割图片
+        
+        分割方案已在规划阶段确定（包括每个文件夹的首页），子进程只按方案执行。
+        文件按顺序提交、按顺序取回结果，压缩包条目和长图的拼接顺序与逐个处理相同；
+        同时在途的文件数有上限，并按文件头估算的内存向调度器预约。
         
         Args:
-            img: 原始图片
+            tasks: [(文件夹名, 分割方案), ...]，按处理顺序排列
+            output_format: 输出格式
+            profile: 编码配置
+            sink: 压缩包写入端，为None时子进程直接写入磁盘
+            stitch_config: 长图配置，为None时不拼接
+            workers: 进程数
+            progress_callback: 进度回调 progress_callback(current, total)，按完成的文件数汇总
+            log_callback: 日志回调
+        """
+        if sink is None:
+            for output_dir in dict.fromkeys(plan.output_dir for _, plan in tasks):
+                os.makedirs(output_dir, exist_ok=True)
+        
+        if log_callback:
+            log_callback(f"并行分割: {workers} 个进程, {len(tasks)} 张图片")
+        
+        total_tasks = len(tasks)
+        processed_tasks = 0
+        max_in_flight = workers * 2
+        task_iter = iter(tasks)
+        next_task = next(task_iter, None)
+        pending = deque()  # (future, 任务, 内存预约)，按提交顺序取回结果
+        current_folder = None
+        stitcher = None
+        
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                while next_task is not None or pending:
+                    if self.stop_event.is_set():
+                        for future, _, _ in pending:
+                            future.cancel()
+                        if log_callback:
+                            log_callback("处理已停止")
+                        return
+                    
+                    # 暂停时不再提交新文件，已提交的文件继续完成
+                    while (next_task is not None and len(pending) < max_in_flight
+                           and self.pause_event.is_set()):
+                        _, plan = next_task
+                        nbytes, pixels = plan.estimate_memory()
+                        # 没有在途文件时阻塞等待，否则预算不足时先取回结果
+                        if pending:
+                            reservation = self.governor.try_acquire(nbytes, pixels)
+                        else:
+                            reservation = self.governor.acquire(nbytes, pixels, self.stop_event)
+                        if reservation is None:
+                            break
+                        future = executor.submit(
+                            execute_plan, plan, output_format, profile,
+                            sink is not None, bool(stitch_config)
+                        )
+                        pending.append((future, next_task, reservation))
+                        next_task = next(task_iter, None)
+                    
+                    if not pending:
+                        self.pause_event.wait(0.5)
+                        continue
+                    
+                    future, (folder_name, plan), reservation = pending[0]
+                    if not wait([future], timeout=0.5).done:
+                        continue
+                    pending.popleft()
+                    reservation.release()
+                    
+                    if folder_name != current_folder:
+                        if stitcher is not None:
+                            self._write_long_images(stitcher, current_folder, sink, log_callback)
+                            stitcher = None
+                        current_folder = folder_name
+                        if log_callback:
+                            log_callback(f"处理文件夹: {folder_name}")
+                            if sink is not None:
+                                log_callback(f"输出压缩包: {sink.archive_path(plan.output_dir)}")
+                        if stitch_config:
+                            stitcher = LongImageWriter(plan.output_dir, stitch_config,
+                                                       profile, sink is not None)
+                    
+                    img_name = os.path.splitext(plan.name)[0]
+                    try:
+                        outputs, parts = future.result()
+                        for output_path, data in outputs:
+                            if sink is not None:
+                                sink.write(output_path, data)
+                        for part in parts:
+                            stitcher.add(part)
+                        if log_callback:
+                            log_callback(f"处理完成：{folder_name}/{img_name}")
+                    except Exception as e:
+                        if log_callback:
+                            log_callback(f"处理失败：{folder_name}/{img_name} - {str(e)}")
+                    
+                    # 失败的文件同样计入进度，保证全部完成时进度达到总数
+                    processed_tasks += 1
+                    if progress_callback:
+                        progress_callback(processed_tasks, total_tasks)
+            
+            if stitcher is not None:
+                self._write_long_images(stitcher, current_folder, sink, log_callback)
+                stitcher = None
+        finally:
+            for _, _, reservation in pending:
+                reservation.release()
+            # 停止时放弃未完成的长图
+            if stitcher is not None:
+                stitcher.abort()
+    
+    def _write_long_images(self, stitcher: LongImageWriter, folder_name: str,
+                           sink: Optional[ArchiveSink], log_callback: Optional[Callable] = None):
+        """结束一个文件夹的长图（输出到压缩包时写入压缩包）"""
+        for output_path, payload, _ in stitcher.close():
+            if sink is not None:
+                sink.write(output_path, payload)
+            if log_callback:
+                log_callback(f"长图: {folder_name}/{os.path.basename(output_path)}")
+    
+    @classmethod
+    def _plan_split(cls, width: int, height: int, split_config: Dict,
+                    is_first_page: bool) -> List[Tuple[Tuple[int, int, int, int], bool]]:
+        """按分割配置规划一张图片的分割方案（只需要尺寸，见split_plan.plan_files）"""
+        if split_config['mode'] == 'custom':
+            return cls._plan_split_custom(
+                width, height,
+                split_config['target_width'],
+                split_config['target_height'],
+                split_config['rotate_bottom'],
+                split_config['special_first'],
+                is_first_page
+            )
+        return cls._plan_split_general(
+            width, height,
+            split_config['rotate_bottom'],
+            split_config['special_first'],
+            is_first_page
+        )
+    
+    @staticmethod
+    def _plan_split_custom(width: int, height: int, target_width: int, target_height: int,
+                           rotate_bottom: bool, special_first: bool,
+                           is_first_page: bool) -> List[Tuple[Tuple[int, int, int, int], bool]]:
+        """
+        根据目标尺寸规划分割
+        
+        Args:
+            width: 图片宽度
+            height: 图片高度
             target_width: 目标宽度
             target_height: 目标高度
             rotate_bottom: 是否旋转下半部分（仅在横向分割时生效）
@@ -149,10 +390,8 @@ class ImageProcessor:
             is_first_page: 是否为首页
             
         Returns:
-            分割后的图片列表
+            [(裁剪框, 是否旋转180度), ...]
         """
-        width, height = img.size
-        
         # 判断图片尺寸是否符合目标尺寸（允许10%的误差）
         width_ratio = abs(width / target_width - 1)
         height_ratio = abs(height / target_height - 1)
@@ -161,62 +400,51 @@ class ImageProcessor:
             # 符合目标尺寸，进行横向分割（horizontal split）
             # RAZ模式在这种情况下生效
             mid = height // 2
-            top = img.crop((0, 0, width, mid))
-            bottom = img.crop((0, mid, width, height))
             
             # RAZ模式：处理下半部分旋转
-            if rotate_bottom and not (is_first_page and special_first):
-                bottom = bottom.rotate(180)
+            rotate = rotate_bottom and not (is_first_page and special_first)
                 
-            return [top, bottom]
+            return [((0, 0, width, mid), False), ((0, mid, width, height), rotate)]
         else:
             # 不符合目标尺寸，进行纵向分割（vertical split）
             mid = width // 2
-            return [
-                img.crop((0, 0, mid, height)),
-                img.crop((mid, 0, width, height))
-            ]
+            return [((0, 0, mid, height), False), ((mid, 0, width, height), False)]
     
-    def _split_image_general(self, img: Image.Image, rotate_bottom: bool, 
-                            special_first: bool, is_first_page: bool) -> List[Image.Image]:
+    @staticmethod
+    def _plan_split_general(width: int, height: int, rotate_bottom: bool,
+                            special_first: bool,
+                            is_first_page: bool) -> List[Tuple[Tuple[int, int, int, int], bool]]:
         """
-        根据宽高比分割图片
+        根据宽高比规划分割
         
         Args:
-            img: 原始图片
+            width: 图片宽度
+            height: 图片高度
             rotate_bottom: 是否旋转下半部分（仅在横向分割时生效）
             special_first: 是否特殊处理第一张图片
             is_first_page: 是否为首页
             
         Returns:
-            分割后的图片列表
+            [(裁剪框, 是否旋转180度), ...]，不需要分割时只包含覆盖整图的一项
         """
-        width, height = img.size
-        
         # 通用模式：根据宽高比判断分割方向
         if width / height > 1.2:  
             # 纵向分割（vertical split）：从中间竖线分割
             mid = width // 2
-            return [
-                img.crop((0, 0, mid, height)),
-                img.crop((mid, 0, width, height))
-            ]
+            return [((0, 0, mid, height), False), ((mid, 0, width, height), False)]
         elif height / width > 1.2:  
             # 横向分割（horizontal split）：从中间横线分割
             # RAZ模式在这种情况下生效
             mid = height // 2
-            top = img.crop((0, 0, width, mid))
-            bottom = img.crop((0, mid, width, height))
             
             # RAZ模式：处理下半部分旋转
             # 只有在不是首页，或者是首页但special_first为False时才旋转
-            if rotate_bottom and not (is_first_page and special_first):
-                bottom = bottom.rotate(180)
+            rotate = rotate_bottom and not (is_first_page and special_first)
                 
-            return [top, bottom]
+            return [((0, 0, width, mid), False), ((0, mid, width, height), rotate)]
         else:
             # 接近正方形的图片不需要分割
-            return [img]
+            return [((0, 0, width, height), False)]
     
     def pause(self):
         """暂停处理"""
@@ -0,0 +1,135 @@
+import shutil
+import subprocess
+from functools import lru_cache
+from PIL import Image
+from typing import List, Optional, Tuple
+
+# 分割线吸附到MCU边界的默认容差（像素）
+DEFAULT_SNAP_TOLERANCE = 8
+
+# 调用jpegtran的超时时间（秒）
+JPEGTRAN_TIMEOUT = 60
+
+# 可以无损分割的颜色模式；CMYK等在像素分割时会改变模式，输出不一致
+_LOSSLESS_MODES = ("L", "RGB")
+
+Box = Tuple[int, int, int, int]
+
+
+@lru_cache(maxsize=1)
+def find_jpegtran() -> Optional[str]:
+    """查找libjpeg-turbo的jpegtran，没有安装时为None（此时只使用像素分割）"""
+    return shutil.which("jpegtran")
+
+
+def mcu_size(img: Image.Image) -> Optional[Tuple[int, int]]:
+    """
+    由Pillow读取的帧头得到MCU尺寸（像素），不解码像素
+
+    Returns:
+        (MCU宽, MCU高)；不是JPEG或颜色模式不支持时为None
+    """
+    layers = getattr(img, 'layer', None)
+    if img.format != 'JPEG' or not layers or img.mode not in _LOSSLESS_MODES:
+        return None
+    if len(layers) == 1:
+        return 8, 8  # 单分量图片按8x8块交错，与采样因子无关
+    return 8 * max(h for _, h, _, _ in layers), 8 * max(v for _, _, v, _ in layers)
+
+
+def plan_lossless(parts: List[Tuple[Box, bool]], size: Tuple[int, int], mcu: Optional[Tuple[int, int]],
+                  tolerance: int = DEFAULT_SNAP_TOLERANCE) -> Tuple[List[Tuple[Box, bool]], List[bool]]:
+    """
+    将分割线吸附到MCU边界，并确定哪些部分可以无损输出
+
+    两部分分割时，分割线距最近的MCU边界不超过tolerance像素则移到该边界。
+    不旋转的部分要求左上角位于MCU边界；旋转180度的部分要求四边都位于MCU边界
+    （否则原图右下角的不完整块会转到左上角，jpegtran -perfect拒绝变换）。
+
+    Args:
+        parts: [(裁剪框, 是否旋转180度), ...]
+        size: 原图尺寸
+        mcu: MCU尺寸，见mcu_size；为None或没有jpegtran时全部使用像素分割
+        tolerance: 吸附容差（像素）
+
+    Returns:
+        (调整后的parts, 每个部分是否可以无损输出)
+    """
+    if mcu is None or find_jpegtran() is None:
+        return parts, [False] * len(parts)
+    mcu_w, mcu_h = mcu
+    width, height = size
+
+    if len(parts) == 2:
+        (first, first_rotate), (second, second_rotate) = parts
+        if first[2] == second[0] and (first[1], first[3]) == (second[1], second[3]):  # 左右分割
+            snapped = round(first[2] / mcu_w) * mcu_w
+            if 0 < snapped < width and abs(snapped - first[2]) <= tolerance:
+                first = (first[0], first[1], snapped, first[3])
+                second = (snapped, second[1], second[2], second[3])
+        elif first[3] == second[1] and (first[0], first[2]) == (second[0], second[2]):  # 上下分割
+            snapped = round(first[3] / mcu_h) * mcu_h
+            if 0 < snapped < height and abs(snapped - first[3]) <= tolerance:
+                first = (first[0], first[1], first[2], snapped)
+                second = (second[0], snapped, second[2], second[3])
+        parts = [(first, first_rotate), (second, second_rotate)]
+
+    flags = []
+    for (left, upper, right, lower), rotate in parts:
+        aligned = left % mcu_w == 0 and upper % mcu_h == 0
+        if rotate:
+            aligned = aligned and (right - left) % mcu_w == 0 and (lower - upper) % mcu_h == 0
+        flags.append(aligned)
+    return parts, flags
+
+
+def _jpegtran(args: List[str], data: bytes) -> bytes:
+    result = subprocess.run(
+        [find_jpegtran(), "-copy", "icc", *args], input=data,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=JPEGTRAN_TIMEOUT
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise ValueError(f"jpegtran失败: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def transform_parts(data: bytes, parts: List[Tuple[Box, bool]], size: Tuple[int, int]) -> List[bytes]:
+    """
+    用jpegtran在压缩域中裁剪（和旋转180度）各部分，不解码像素、不重新量化
+
+    旋转的部分先尝试一次完成整图旋转和裁剪（-perfect要求整图尺寸是MCU的倍数，
+    上下分割的下半部分通常满足），不满足时先裁剪再对裁剪结果旋转。保留ICC配置，
+    不复制描述整张原图的EXIF等段。各部分须由plan_lossless判定为可以无损输出。
+
+    Args:
+        data: 原JPEG文件内容
+        parts: [(裁剪框, 是否旋转180度), ...]
+        size: 原图尺寸
+
+    Returns:
+        各部分的JPEG数据
+
+    Raises:
+        ValueError: 没有jpegtran、文件损坏或无法完美变换
+    """
+    if find_jpegtran() is None:
+        raise ValueError("未找到jpegtran")
+    width, height = size
+    results = []
+    for (left, upper, right, lower), rotate in parts:
+        crop = f"{right - left}x{lower - upper}"
+        try:
+            if not rotate:
+                results.append(_jpegtran(["-crop", f"{crop}+{left}+{upper}"], data))
+                continue
+            try:
+                # 裁剪框按旋转后的坐标指定
+                results.append(_jpegtran(
+                    ["-rotate", "180", "-perfect", "-crop", f"{crop}+{width - right}+{height - lower}"], data
+                ))
+            except ValueError:
+                part = _jpegtran(["-crop", f"{crop}+{left}+{upper}"], data)
+                results.append(_jpegtran(["-rotate", "180", "-perfect"], part))
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise ValueError(f"jpegtran失败: {e}") from e
+    return results
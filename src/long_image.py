@@ -0,0 +1,179 @@
+import io
+import os
+import re
+from PIL import Image
+from typing import Dict, List, Optional, Tuple
+from tiled_render import PNGStreamWriter
+from encoder_profiles import EncoderProfile, format_extension, normalize_format
+from render_pipeline import WrittenOutput
+
+# 长图模式：'stitch' 把连续页面拼接为长图（尽量在页面边界换图），'tile' 按固定高度切分
+STITCH_MODES = ('stitch', 'tile')
+
+
+class LongImageWriter:
+    """
+    长图拼接/切分
+
+    按顺序接收页面（或分割后的各部分），缩放到统一宽度后自上而下拼接。
+    PNG长图逐条流式压缩写入，内存中只保留当前页面，与拼接的页数无关；
+    JPG/WEBP无法流式编码，需要设置max_height，每张长图在内存中最多保留max_height行。
+
+    config:
+        mode: 'stitch'（默认）或 'tile'
+        width: 长图宽度，默认为第一张图片的宽度，宽度不同的图片等比缩放
+        max_height: 单张长图的最大高度（像素）；'stitch' 模式下放不下的页面从新的长图开始，
+                    超过该高度的单页被切开；'tile' 模式下为固定的切分高度
+        max_pages: 'stitch' 模式下单张长图最多包含的图片数
+        format: 输出格式，默认PNG
+        prefix: 输出文件名前缀，默认 "long"，输出为 "{prefix}_{序号}.{扩展名}"
+    """
+    def __init__(self, output_dir: str, config: Dict, profile: EncoderProfile = None,
+                 in_memory: bool = False):
+        """
+        Args:
+            output_dir: 输出目录
+            config: 长图配置
+            profile: 编码配置
+            in_memory: 是否返回编码后的数据而不写入磁盘（输出到压缩包时）
+        """
+        self.output_dir = output_dir
+        self.mode = config.get('mode', 'stitch')
+        if self.mode not in STITCH_MODES:
+            raise ValueError(f"未知的长图模式: {self.mode}")
+        self.width = config.get('width')
+        self.max_height = config.get('max_height')
+        self.max_pages = config.get('max_pages') if self.mode == 'stitch' else None
+        self.output_format = config.get('format', 'PNG')
+        self.stream = normalize_format(self.output_format) == 'png'
+        if self.mode == 'tile' and not self.max_height:
+            raise ValueError("按固定高度切分需要指定max_height")
+        if not self.stream and not self.max_height:
+            raise ValueError(f"{self.output_format}长图无法流式写入，需要指定max_height")
+        self.prefix = config.get('prefix', 'long')
+        self.profile = profile or EncoderProfile()
+        self.in_memory = in_memory
+        self.outputs: List[Tuple[str, object, str]] = []  # 已完成的长图
+        self.writer: Optional[PNGStreamWriter] = None
+        self.buffer = None  # in_memory时PNG写入的内存文件
+        self.bands: List[Image.Image] = []  # 非PNG格式时缓存的横条
+        self.height = 0  # 当前长图已写入的行数
+        self.pages = 0  # 当前长图包含的图片数
+
+    def _output_path(self) -> str:
+        ext = format_extension(self.output_format)
+        return os.path.join(self.output_dir, f"{self.prefix}_{len(self.outputs) + 1}.{ext}")
+
+    def _normalize(self, img: Image.Image) -> Image.Image:
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if self.width is None:
+            self.width = img.width
+        if img.width != self.width:
+            height = max(1, round(img.height * self.width / img.width))
+            img = img.resize((self.width, height), Image.Resampling.BICUBIC)
+        return img
+
+    def _append(self, band: Image.Image):
+        if not self.stream:
+            self.bands.append(band)
+        else:
+            if self.writer is None:
+                self.buffer = io.BytesIO() if self.in_memory else None
+                self.writer = PNGStreamWriter(
+                    self.buffer or self._output_path(), self.width, None, "RGB",
+                    self.profile.settings['png']['compress_level']
+                )
+            self.writer.write_rows(band)
+        self.height += band.height
+
+    def add(self, img: Image.Image):
+        """
+        追加一张图片
+
+        Args:
+            img: 页面或分割后的一部分，按输出顺序传入
+        """
+        img = self._normalize(img)
+        if self.mode == 'stitch' and self.height:
+            # 放不下整页时从新的长图开始，避免页面被切开
+            if ((self.max_height and self.height + img.height > self.max_height)
+                    or (self.max_pages and self.pages >= self.max_pages)):
+                self.finish_current()
+        y = 0
+        while y < img.height:
+            if self.max_height and self.height >= self.max_height:
+                self.finish_current()
+            rows = img.height - y
+            if self.max_height:
+                rows = min(rows, self.max_height - self.height)
+            self._append(img if rows == img.height else img.crop((0, y, self.width, y + rows)))
+            y += rows
+        self.pages += 1
+
+    def finish_current(self):
+        """结束当前长图"""
+        if not self.height:
+            return
+        path = self._output_path()
+        if self.stream:
+            self.writer.close()
+            payload = self.buffer.getvalue() if self.in_memory else WrittenOutput()
+            self.writer, self.buffer = None, None
+        else:
+            canvas = Image.new("RGB", (self.width, self.height))
+            y = 0
+            for band in self.bands:
+                canvas.paste(band, (0, y))
+                y += band.height
+            self.bands = []
+            if self.in_memory:
+                payload = self.profile.encode(canvas, self.output_format)
+            else:
+                self.profile.save(canvas, path, self.output_format)
+                payload = WrittenOutput()
+        self.outputs.append((path, payload, self.output_format))
+        self.height = 0
+        self.pages = 0
+
+    def close(self) -> List[Tuple[str, object, str]]:
+        """
+        结束所有长图
+
+        Returns:
+            [(输出文件路径, WrittenOutput或编码后的数据, 输出格式), ...]
+        """
+        self.finish_current()
+        return self.outputs
+
+    def abort(self):
+        """放弃未完成的长图（停止时），已写入一半的文件被删除"""
+        if self.writer is not None:
+            if self.writer.owns_file and self.writer.file is not None:
+                self.writer.file.close()
+                try:
+                    os.remove(self._output_path())
+                except OSError:
+                    pass
+            self.writer, self.buffer = None, None
+        self.bands = []
+        self.height = 0
+        self.pages = 0
+
+
+# 分块渲染时每块单独保存的输出文件名
+_TILE_NAME = re.compile(r"_tile_\d+_\d+\.\w+$")
+
+
+def stitch_source(output_path: str, payload) -> Optional[Image.Image]:
+    """
+    取得一个输出中参与长图拼接的图片
+
+    已编码的数据（如直接提取的原图）解码后拼接；分块渲染的超大页面
+    （已直接写入磁盘，或每块单独保存）不参与拼接，返回None。
+    """
+    if isinstance(payload, WrittenOutput) or _TILE_NAME.search(output_path):
+        return None
+    if isinstance(payload, bytes):
+        return Image.open(io.BytesIO(payload))
+    return payload
@@ -1,8 +1,11 @@
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMainWindow
 from gui import MainWindow
 
 def main():
+    # 打包为可执行文件后，进程池子进程需要此调用才能正常启动
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
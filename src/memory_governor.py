@@ -0,0 +1,177 @@
+import math
+import threading
+from collections import deque
+from typing import Optional
+
+# 默认内存预算：同时在途的解码图片最多占用的字节数
+DEFAULT_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024
+
+# 超过该像素数（约100M像素）的图片或页面独占运行，不与其他任务并行
+EXCLUSIVE_PIXELS = 100000000
+
+# 工作集系数：解码缓冲区之外还有格式转换/裁剪产生的副本
+WORKING_SET_FACTOR = 2
+
+
+def estimate_page_bytes(width_pt: float, height_pt: float, dpi: int, channels: int = 3) -> int:
+    """
+    由页面尺寸和DPI估算栅格化所需内存，无需渲染
+
+    Args:
+        width_pt: 页面宽度 (pt)
+        height_pt: 页面高度 (pt)
+        dpi: 渲染DPI
+        channels: 颜色通道数，颜色模式未知时按RGB估算
+
+    Returns:
+        估算的字节数
+    """
+    width = math.ceil(width_pt * dpi / 72)
+    height = math.ceil(height_pt * dpi / 72)
+    return width * height * channels * WORKING_SET_FACTOR
+
+
+def estimate_pixels(width_pt: float, height_pt: float, dpi: int) -> int:
+    """页面在指定DPI下的像素数"""
+    return math.ceil(width_pt * dpi / 72) * math.ceil(height_pt * dpi / 72)
+
+
+class MemoryReservation:
+    """一次内存预约，处理完成后调用release()归还（重复调用无副作用）"""
+    def __init__(self, governor: 'MemoryGovernor', nbytes: int):
+        self.governor = governor
+        self.nbytes = nbytes
+        self.released = False
+
+    def release(self):
+        """归还预约的内存"""
+        if not self.released:
+            self.released = True
+            self.governor._release(self.nbytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class MemoryGovernor:
+    """
+    按字节预算控制同时在途的渲染/分割任务
+
+    每个任务在分配像素内存之前按估算大小预约，在途总量不超过预算时才放行；
+    超过预算（或像素数超过EXCLUSIVE_PIXELS）的任务等到没有其他任务在途时单独运行。
+    等待的任务按先来后到放行，大任务不会被持续到来的小任务饿死。
+    PDFProcessor和ImageProcessor共用同一个实例（见shared_governor），
+    两个标签页同时处理时总内存同样受预算约束。任务自己的预算用override_budget
+    临时设置，任务结束后restore_budget恢复，不影响之后的其他任务。
+    """
+    def __init__(self, budget: int = DEFAULT_MEMORY_BUDGET):
+        """
+        Args:
+            budget: 内存预算（字节）
+        """
+        self.budget = budget
+        self.base_budget = budget  # 没有任务设置预算时使用
+        self.overrides = []  # 进行中的任务临时设置的预算 [(标记, 预算), ...]，最近设置的生效
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.waiters = deque()
+
+    def override_budget(self, budget: Optional[int]) -> Optional[object]:
+        """
+        在一个任务运行期间临时使用指定预算
+
+        Args:
+            budget: 内存预算（字节），为空时不修改
+
+        Returns:
+            传给restore_budget的标记；budget为空时为None
+        """
+        if not budget:
+            return None
+        token = object()
+        with self.condition:
+            self.overrides.append((token, max(1, int(budget))))
+            self._apply_budget()
+        return token
+
+    def restore_budget(self, token: Optional[object]):
+        """任务结束时撤销override_budget设置的预算；同时进行的其他任务的预算仍然有效"""
+        if token is None:
+            return
+        with self.condition:
+            self.overrides = [item for item in self.overrides if item[0] is not token]
+            self._apply_budget()
+
+    def _apply_budget(self):
+        self.budget = self.overrides[-1][1] if self.overrides else self.base_budget
+        self.condition.notify_all()
+
+    def is_oversize(self, nbytes: int, pixels: int = 0) -> bool:
+        """任务是否需要独占运行"""
+        return nbytes >= self.budget or pixels > EXCLUSIVE_PIXELS
+
+    def _reserve_size(self, nbytes: int, pixels: int) -> int:
+        # 独占任务预约整个预算，运行期间其他任务无法放行
+        return max(nbytes, self.budget) if self.is_oversize(nbytes, pixels) else nbytes
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.in_flight == 0 or self.in_flight + nbytes <= self.budget
+
+    def acquire(self, nbytes: int, pixels: int = 0,
+                stop_event: threading.Event = None) -> Optional[MemoryReservation]:
+        """
+        预约内存，预算不足时阻塞等待
+
+        Args:
+            nbytes: 估算的字节数
+            pixels: 像素数，超过EXCLUSIVE_PIXELS时独占运行
+            stop_event: 停止事件，设置后放弃等待
+
+        Returns:
+            内存预约，等待期间被停止时返回None
+        """
+        ticket = object()
+        with self.condition:
+            self.waiters.append(ticket)
+            try:
+                while True:
+                    size = self._reserve_size(nbytes, pixels)
+                    if self.waiters[0] is ticket and self._fits(size):
+                        self.in_flight += size
+                        return MemoryReservation(self, size)
+                    if stop_event is not None and stop_event.is_set():
+                        return None
+                    self.condition.wait(0.1)
+            finally:
+                self.waiters.remove(ticket)
+                self.condition.notify_all()
+
+    def try_acquire(self, nbytes: int, pixels: int = 0) -> Optional[MemoryReservation]:
+        """
+        不阻塞地预约内存
+
+        Returns:
+            内存预约，当前无法放行时返回None
+        """
+        with self.condition:
+            size = self._reserve_size(nbytes, pixels)
+            if self.waiters or not self._fits(size):
+                return None
+            self.in_flight += size
+            return MemoryReservation(self, size)
+
+    def _release(self, nbytes: int):
+        with self.condition:
+            self.in_flight -= nbytes
+            self.condition.notify_all()
+
+
+_shared_governor = MemoryGovernor()
+
+
+def shared_governor() -> MemoryGovernor:
+    """进程内共享的内存调度器"""
+    return _shared_governor
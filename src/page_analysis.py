@@ -0,0 +1,154 @@
+import hashlib
+import fitz
+from PIL import Image, ImageChops
+from typing import Optional, Tuple, Union
+
+# 判定图片覆盖整页时允许的误差（相对页面边长）
+PAGE_COVER_TOLERANCE = 0.01
+
+# 灰度检测时探测渲染的DPI
+GRAY_PROBE_DPI = 24
+
+# 判定为灰度页面时允许的最大通道差（容忍抗锯齿和扫描件的轻微色偏）
+GRAY_TOLERANCE = 8
+
+# 颜色模式：自动检测、强制彩色、强制灰度
+COLORSPACE_MODES = ('auto', 'rgb', 'gray')
+
+# 空白页/重复页检测时探测渲染的DPI
+DETECT_PROBE_DPI = 72
+
+# 任一颜色通道低于该值的像素视为墨迹（黄色等浅色内容按最暗通道判断，不会被忽略）
+BLANK_INK_LEVEL = 200
+
+# 墨迹像素占比低于该值的页面视为空白页（容忍扫描件的噪点）
+BLANK_INK_RATIO = 0.0005
+
+# 可以原样写出的图片颜色分量数（灰度、RGB；CMYK JPEG在多数查看器中显示异常）
+_PASSTHROUGH_COMPONENTS = (1, 3)
+
+
+def _xref_name(doc: fitz.Document, xref: int, key: str) -> str:
+    """读取对象字典中的名称值，数组形式的单个名称（如 [/DCTDecode]）同样返回该名称"""
+    value_type, value = doc.xref_get_key(xref, key)
+    if value_type == "array":
+        value = value.strip("[] ")
+    return value if value_type in ("name", "array") else ""
+
+
+def extract_full_page_image(page: fitz.Page) -> Optional[Tuple[bytes, str]]:
+    """
+    检测扫描页并提取原始图片数据
+
+    当页面只包含一个覆盖整页、未旋转的JPEG图片，且没有文字、矢量图形和批注时，
+    直接返回该图片的原始压缩数据，无需栅格化和重新编码。
+
+    Args:
+        page: PDF页面
+
+    Returns:
+        (图片数据, 扩展名)，页面不符合条件时返回None
+    """
+    if page.rotation or page.first_annot:
+        return None
+
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    xref, smask = images[0][0], images[0][1]
+    if smask:
+        return None
+
+    # 只处理可以逐字节写出的普通JPEG
+    doc = page.parent
+    if _xref_name(doc, xref, "Filter") != "/DCTDecode":
+        return None
+    if doc.xref_get_key(xref, "Decode")[0] != "null" or doc.xref_get_key(xref, "Mask")[0] != "null":
+        return None
+
+    # 图片只绘制一次，未旋转/翻转，并覆盖整个页面
+    infos = page.get_image_info(xrefs=True)
+    if len(infos) != 1 or infos[0]["colorspace"] not in _PASSTHROUGH_COMPONENTS:
+        return None
+    a, b, c, d, _, _ = infos[0]["transform"]
+    if abs(b) > 1e-6 or abs(c) > 1e-6 or a <= 0 or d <= 0:
+        return None
+    bbox = fitz.Rect(infos[0]["bbox"])
+    page_rect = page.rect
+    tolerance = max(page_rect.width, page_rect.height) * PAGE_COVER_TOLERANCE
+    if (abs(bbox.x0 - page_rect.x0) > tolerance or abs(bbox.y0 - page_rect.y0) > tolerance or
+            abs(bbox.x1 - page_rect.x1) > tolerance or abs(bbox.y1 - page_rect.y1) > tolerance):
+        return None
+
+    # 页面上不能有其他内容
+    if page.get_text("text").strip() or page.get_drawings():
+        return None
+
+    return doc.xref_stream_raw(xref), "jpg"
+
+
+def is_grayscale_page(source: Union[fitz.Page, fitz.DisplayList],
+                      probe_dpi: int = GRAY_PROBE_DPI, tolerance: int = GRAY_TOLERANCE) -> bool:
+    """
+    以低DPI探测渲染判断页面是否只包含灰度内容
+
+    Args:
+        source: PDF页面或其显示列表（传入显示列表时探测渲染不会重复解析页面内容）
+        probe_dpi: 探测渲染的DPI
+        tolerance: 允许的最大通道差
+
+    Returns:
+        页面渲染结果的R、G、B通道是否基本一致
+    """
+    zoom = probe_dpi / 72
+    pix = source.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    red, green, blue = Image.frombytes("RGB", (pix.width, pix.height), pix.samples).split()
+    for diff in (ImageChops.difference(red, green), ImageChops.difference(green, blue)):
+        if diff.getextrema()[1] > tolerance:
+            return False
+    return True
+
+
+def select_colorspace(source: Union[fitz.Page, fitz.DisplayList], mode: str = 'auto') -> fitz.Colorspace:
+    """
+    选择页面栅格化使用的颜色空间
+
+    Args:
+        source: PDF页面或其显示列表
+        mode: 'auto' 自动检测，'rgb' 强制彩色，'gray' 强制灰度
+
+    Returns:
+        fitz.csGRAY 或 fitz.csRGB
+    """
+    if mode not in COLORSPACE_MODES:
+        raise ValueError(f"未知的颜色模式: {mode}")
+    if mode == 'gray':
+        return fitz.csGRAY
+    if mode == 'rgb':
+        return fitz.csRGB
+    return fitz.csGRAY if is_grayscale_page(source) else fitz.csRGB
+
+
+def analyze_page(page: fitz.Page, probe_dpi: int = DETECT_PROBE_DPI,
+                 ink_ratio: float = BLANK_INK_RATIO) -> Tuple[bool, str]:
+    """
+    以低DPI探测渲染检测空白页并计算栅格摘要
+
+    Args:
+        page: PDF页面
+        probe_dpi: 探测渲染的DPI
+        ink_ratio: 墨迹像素占比阈值
+
+    Returns:
+        (是否空白页, 探测栅格的摘要)，摘要相同的页面视为重复页
+    """
+    zoom = probe_dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    red, green, blue = Image.frombytes("RGB", (pix.width, pix.height), pix.samples).split()
+    # 逐像素取最暗通道，再由直方图统计墨迹像素
+    darkest = ImageChops.darker(red, ImageChops.darker(green, blue))
+    histogram = darkest.histogram()
+    ink_pixels = sum(histogram[:BLANK_INK_LEVEL])
+    is_blank = ink_pixels < pix.width * pix.height * ink_ratio
+    digest = hashlib.sha1(f"{pix.width}x{pix.height}:".encode() + pix.samples).hexdigest()
+    return is_blank, digest
@@ -0,0 +1,217 @@
+import os
+import re
+import shutil
+import threading
+import fitz
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Callable, Optional, Tuple
+from page_analysis import analyze_page, BLANK_INK_RATIO
+
+# 检测到空白页/重复页后的处理方式：'skip' 不输出，'link' 链接到第一次出现的页面的输出
+DETECT_ACTIONS = ('skip', 'link')
+
+
+def analyze_document(file_path: str, page_numbers: List[int],
+                     ink_ratio: float = BLANK_INK_RATIO) -> List[Tuple[int, bool, str]]:
+    """
+    进程池工作函数：探测一个PDF中的页面
+
+    Args:
+        file_path: PDF文件路径
+        page_numbers: 需要探测的页码列表 (从0开始)
+        ink_ratio: 墨迹像素占比阈值
+
+    Returns:
+        [(页码, 是否空白页, 栅格摘要), ...]，无法探测的页面不包含在结果中
+    """
+    results = []
+    with fitz.open(file_path) as doc:
+        for page_num in page_numbers:
+            try:
+                is_blank, digest = analyze_page(doc.load_page(page_num), ink_ratio=ink_ratio)
+            except Exception:
+                continue
+            results.append((page_num, is_blank, digest))
+    return results
+
+
+def _link_file(source: str, destination: str):
+    """创建硬链接，不支持时（跨磁盘、文件系统限制）复制文件"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class PageDetector:
+    """
+    空白页和重复页检测
+
+    渲染之前以低DPI探测每个待渲染页面：墨迹占比极低的页面视为空白页，
+    探测栅格完全相同的页面视为重复页（同一批次内跨PDF比较，以第一次出现的页面为准）。
+    'skip'模式下这些页面不渲染也不输出；'link'模式下第一次出现的页面正常渲染，
+    之后的页面在渲染结束后链接（或复制）到其输出文件，不再重复渲染和编码。
+    """
+    def __init__(self, config: Dict):
+        """
+        Args:
+            config: {'blank': 检测空白页, 'duplicates': 检测重复页,
+                     'action': 'skip' 或 'link', 'ink_ratio': 空白页墨迹占比阈值}
+        """
+        self.detect_blank = bool(config.get('blank'))
+        self.detect_duplicates = bool(config.get('duplicates'))
+        self.action = config.get('action', 'skip')
+        if self.action not in DETECT_ACTIONS:
+            raise ValueError(f"未知的处理方式: {self.action}")
+        self.ink_ratio = config.get('ink_ratio', BLANK_INK_RATIO)
+
+    @property
+    def enabled(self) -> bool:
+        return self.detect_blank or self.detect_duplicates
+
+    def _analyze_parallel(self, jobs: List, workers: int,
+                          stop_event: threading.Event = None) -> Optional[List[List[Tuple[int, bool, str]]]]:
+        """
+        在进程池中探测各PDF，等待期间检查停止事件
+
+        Returns:
+            与jobs顺序一致的探测结果；被停止时为None（未开始的文档不再探测，进行中的在后台结束）
+        """
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(jobs)))
+        stopped = False
+        try:
+            futures = {
+                executor.submit(analyze_document, job.file_path, job.page_numbers, self.ink_ratio): index
+                for index, job in enumerate(jobs)
+            }
+            analyses = [None] * len(jobs)
+            pending = set(futures)
+            while pending:
+                if stop_event is not None and stop_event.is_set():
+                    stopped = True
+                    return None
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    analyses[futures[future]] = future.result()
+            return analyses
+        finally:
+            executor.shutdown(wait=not stopped, cancel_futures=True)
+
+    def detect(self, jobs: List, workers: int = 1, stop_event: threading.Event = None,
+               log_callback: Callable = None) -> int:
+        """
+        探测各导出任务的待渲染页面，从job.page_numbers中移除空白页和重复页，
+        'link'模式下把需要链接的页面记录到job.links
+
+        Args:
+            jobs: 导出任务列表 (DocumentJob)
+            workers: 并行探测的进程数
+            stop_event: 停止事件
+            log_callback: 日志回调函数
+
+        Returns:
+            移除的页面数
+        """
+        pending_jobs = [job for job in jobs if job.page_numbers]
+        if not self.enabled or not pending_jobs:
+            return 0
+        if log_callback:
+            log_callback(f"页面检测: {sum(len(job.page_numbers) for job in pending_jobs)} 页")
+
+        if workers > 1 and len(pending_jobs) > 1:
+            analyses = self._analyze_parallel(pending_jobs, workers, stop_event)
+            if analyses is None:
+                return 0
+        else:
+            analyses = []
+            for job in pending_jobs:
+                if stop_event is not None and stop_event.is_set():
+                    return 0
+                analyses.append(analyze_document(job.file_path, job.page_numbers, self.ink_ratio))
+
+        removed = 0
+        first_blank = None  # 第一个空白页 (导出任务, 页码)
+        first_seen = {}  # 栅格摘要 -> 第一次出现的 (导出任务, 页码)
+        for job, analysis in zip(pending_jobs, analyses):
+            blank_pages, duplicate_pages = [], []
+            dropped = set()
+            for page_num, is_blank, digest in analysis:
+                if self.detect_blank and is_blank:
+                    if self.action == 'link' and first_blank is None:
+                        first_blank = (job, page_num)
+                        continue
+                    blank_pages.append(page_num)
+                    dropped.add(page_num)
+                    if self.action == 'link':
+                        job.links.append((page_num, first_blank[0], first_blank[1]))
+                    continue
+                if not self.detect_duplicates:
+                    continue
+                source = first_seen.get(digest)
+                if source is None:
+                    first_seen[digest] = (job, page_num)
+                    continue
+                duplicate_pages.append((page_num, source))
+                dropped.add(page_num)
+                if self.action == 'link':
+                    job.links.append((page_num, source[0], source[1]))
+
+            job.page_numbers = [page_num for page_num in job.page_numbers if page_num not in dropped]
+            removed += len(dropped)
+            if log_callback:
+                self._report(job, blank_pages, duplicate_pages, log_callback)
+        if log_callback:
+            action = "跳过" if self.action == 'skip' else "链接"
+            log_callback(f"页面检测完成: 共{action} {removed} 页")
+        return removed
+
+    def _report(self, job, blank_pages: List[int], duplicate_pages: List[Tuple[int, Tuple]],
+                log_callback: Callable):
+        """输出单个PDF的检测结果"""
+        action = "已跳过" if self.action == 'skip' else "将链接到首次出现的页面"
+        if blank_pages:
+            pages = ", ".join(str(page_num + 1) for page_num in blank_pages)
+            log_callback(f"空白页: {job.pdf_name} 第 {pages} 页（{action}）")
+        for page_num, (source_job, source_page) in duplicate_pages:
+            log_callback(f"重复页: {job.pdf_name} 第 {page_num + 1} 页 与 "
+                         f"{source_job.pdf_name} 第 {source_page + 1} 页相同（{action}）")
+
+    def create_links(self, jobs: List, log_callback: Callable = None) -> int:
+        """
+        渲染结束后为'link'模式的页面创建输出文件链接，并登记到导出清单
+
+        Args:
+            jobs: 导出任务列表
+            log_callback: 日志回调函数
+
+        Returns:
+            成功链接的页面数
+        """
+        linked = 0
+        for job in jobs:
+            for page_num, source_job, source_page in job.links:
+                try:
+                    for target_index, manifest in enumerate(job.manifests):
+                        source_manifest = source_job.manifests[target_index]
+                        outputs = source_manifest.pages.get(str(source_page))
+                        if not outputs:
+                            raise ValueError(f"{source_job.pdf_name} 第 {source_page + 1} 页没有输出")
+                        # 输出文件名以 "page_{页码}" 开头，替换为当前页码
+                        prefix = re.compile(rf"^page_{source_page + 1}(?=[._])")
+                        output_files = []
+                        for name in outputs:
+                            destination = os.path.join(
+                                manifest.output_dir, prefix.sub(f"page_{page_num + 1}", name)
+                            )
+                            _link_file(os.path.join(source_manifest.output_dir, name), destination)
+                            output_files.append(destination)
+                        manifest.mark_done(page_num, output_files)
+                    linked += 1
+                except (OSError, ValueError) as e:
+                    if log_callback:
+                        log_callback(f"链接页面失败: {job.pdf_name} 第 {page_num + 1} 页 - {str(e)}")
+        if linked and log_callback:
+            log_callback(f"已链接 {linked} 个空白页/重复页")
+        return linked
@@ -0,0 +1,122 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 页码范围中的一项："5"、"-3"（倒数第3页）、"1-10"、"5-"（第5页到最后一页）、"-3--1"
+_RANGE_ITEM = re.compile(r"^(-?\d+)(\s*-\s*(-?\d+)?)?$")
+
+
+def parse_page_ranges(text: str) -> List[Tuple[int, Optional[int]]]:
+    """
+    解析页码范围文本
+
+    Args:
+        text: 如 "1-10,15,-3"，页码从1开始，负数从末尾倒数（-1为最后一页），
+              "N-" 表示第N页到最后一页；逗号分隔，中文逗号亦可
+
+    Returns:
+        [(起始页码, 结束页码), ...]，结束页码为None表示到最后一页
+
+    Raises:
+        ValueError: 格式错误或页码为0
+    """
+    ranges = []
+    for item in re.split(r"[,，]", text or ""):
+        item = item.strip()
+        if not item:
+            continue
+        match = _RANGE_ITEM.match(item)
+        if not match:
+            raise ValueError(f"无效的页码范围: {item}")
+        start = int(match.group(1))
+        if match.group(2) is None:
+            end = start
+        else:
+            end = int(match.group(3)) if match.group(3) else None
+        if start == 0 or end == 0:
+            raise ValueError(f"页码从1开始: {item}")
+        if end is not None and 0 < end < start:
+            raise ValueError(f"起始页码大于结束页码: {item}")
+        ranges.append((start, end))
+    return ranges
+
+
+class PageSelection:
+    """
+    页面选择
+
+    在预扫描得到页数后确定每个PDF需要渲染的页面，未选中的页面不会渲染、
+    不参与检测，也不计入进度总页数。
+
+    config:
+        ranges: 页码范围文本，见parse_page_ranges；为空时选择全部页面
+        every: 抽样间隔，在选中的页面中每N页取一页（从第一页开始）
+        first: 只保留抽样后的前N页
+        last: 只保留抽样后的后N页；与first同时设置时取两者的并集（首尾预览）
+    """
+    def __init__(self, config: Dict = None):
+        """
+        Args:
+            config: 页面选择配置，为None时选择全部页面
+
+        Raises:
+            ValueError: 页码范围格式错误或数值无效
+        """
+        config = config or {}
+        self.ranges = parse_page_ranges(config.get('ranges') or "")
+        self.every = int(config.get('every') or 1)
+        self.first = int(config.get('first') or 0)
+        self.last = int(config.get('last') or 0)
+        if self.every < 1 or self.first < 0 or self.last < 0:
+            raise ValueError("抽样间隔和首尾页数必须为正数")
+
+    @property
+    def enabled(self) -> bool:
+        """是否只选择部分页面"""
+        return bool(self.ranges) or self.every > 1 or bool(self.first) or bool(self.last)
+
+    def describe(self) -> str:
+        """选择条件的显示文本"""
+        parts = []
+        if self.ranges:
+            parts.append("页码 " + ",".join(
+                str(start) if start == end else f"{start}-{'' if end is None else end}"
+                for start, end in self.ranges
+            ))
+        if self.every > 1:
+            parts.append(f"每 {self.every} 页取一页")
+        if self.first:
+            parts.append(f"前 {self.first} 页")
+        if self.last:
+            parts.append(f"后 {self.last} 页")
+        return "，".join(parts) if parts else "全部页面"
+
+    def select(self, page_count: int) -> List[int]:
+        """
+        确定选中的页面
+
+        Args:
+            page_count: 文档页数
+
+        Returns:
+            选中的页码列表（从0开始，升序）；超出页数的页码被忽略
+        """
+        def resolve(number: int) -> int:
+            return number - 1 if number > 0 else page_count + number
+
+        if self.ranges:
+            selected = set()
+            for start, end in self.ranges:
+                first_index = max(0, resolve(start))
+                last_index = page_count - 1 if end is None else min(page_count - 1, resolve(end))
+                selected.update(range(first_index, last_index + 1))
+            pages = sorted(selected)
+        else:
+            pages = list(range(page_count))
+
+        pages = pages[::self.every]
+        if self.first or self.last:
+            kept = set(pages[:self.first])
+            if self.last:
+                kept.update(pages[-self.last:])
+            pages = sorted(kept)
+        return pages
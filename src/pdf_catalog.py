@@ -0,0 +1,182 @@
+import os
+import hashlib
+import threading
+import fitz
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Callable, Tuple
+from page_selection import PageSelection
+
+# 计算文件指纹时读取的头尾字节数
+FINGERPRINT_SAMPLE_SIZE = 64 * 1024
+
+
+def compute_fingerprint(file_path: str) -> str:
+    """
+    计算文件指纹
+
+    使用文件大小、修改时间以及文件头尾各64KB内容计算SHA1，
+    避免在网络共享上完整读取大文件。PDF的增量更新会追加到文件末尾，
+    因此头尾采样足以识别文件是否被修改。
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        十六进制指纹字符串
+    """
+    stat = os.stat(file_path)
+    sha1 = hashlib.sha1()
+    sha1.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(file_path, 'rb') as f:
+        sha1.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+        if stat.st_size > FINGERPRINT_SAMPLE_SIZE * 2:
+            f.seek(-FINGERPRINT_SAMPLE_SIZE, os.SEEK_END)
+            sha1.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+    return sha1.hexdigest()
+
+
+class DocumentInfo:
+    """PDF文档元数据，由预扫描阶段一次性收集"""
+    def __init__(self, path: str):
+        self.path = path
+        self.page_count = 0
+        self.page_sizes: List[Tuple[float, float]] = []  # 每页尺寸 (宽, 高)，单位pt，已考虑页面旋转
+        self.is_encrypted = False
+        self.needs_pass = False
+        self.fingerprint = ""
+        self.file_size = 0
+        self.mtime_ns = 0
+        self.error: Optional[str] = None
+
+    @property
+    def is_valid(self) -> bool:
+        """文档是否可以渲染"""
+        return self.error is None and not self.needs_pass
+
+    def is_stale(self) -> bool:
+        """文件在扫描后是否被修改或删除"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return stat.st_size != self.file_size or stat.st_mtime_ns != self.mtime_ns
+
+    def size_label(self) -> str:
+        """页面尺寸的显示文本"""
+        if not self.page_sizes:
+            return ""
+        sizes = set((round(w), round(h)) for w, h in self.page_sizes)
+        if len(sizes) > 1:
+            return "混合"
+        width, height = sizes.pop()
+        return f"{width}×{height}"
+
+
+def scan_document(file_path: str) -> DocumentInfo:
+    """
+    打开PDF一次，收集页数、页面尺寸、加密状态和文件指纹后立即关闭
+
+    作为进程池工作函数使用，因此定义在模块级别。
+
+    Args:
+        file_path: PDF文件路径
+
+    Returns:
+        文档元数据，出错时error字段记录错误信息
+    """
+    info = DocumentInfo(file_path)
+    try:
+        stat = os.stat(file_path)
+        info.file_size = stat.st_size
+        info.mtime_ns = stat.st_mtime_ns
+        info.fingerprint = compute_fingerprint(file_path)
+
+        with fitz.open(file_path) as doc:
+            info.is_encrypted = doc.is_encrypted
+            info.needs_pass = doc.needs_pass
+            if not info.needs_pass:
+                info.page_count = doc.page_count
+                for page in doc:
+                    rect = page.rect
+                    info.page_sizes.append((rect.width, rect.height))
+    except Exception as e:
+        info.error = str(e)
+    return info
+
+
+class DocumentCatalog:
+    """
+    PDF文档目录
+
+    缓存每个PDF的元数据，供进度统计、任务调度、文件列表显示和渲染循环复用。
+    文件被修改后会在下次扫描时自动重新读取。界面线程添加文件时在后台扫描，
+    同一时刻只进行一次扫描，开始处理时等待进行中的扫描结束并复用其结果。
+    """
+    def __init__(self):
+        self.documents: Dict[str, DocumentInfo] = {}
+        self.lock = threading.Lock()
+
+    def scan(self, files: List[str], workers: int = 1,
+             log_callback: Callable = None) -> List[Optional[DocumentInfo]]:
+        """
+        预扫描PDF文件，已扫描且未修改的文件直接复用
+
+        Args:
+            files: PDF文件路径列表
+            workers: 并行扫描的进程数
+            log_callback: 日志回调函数
+
+        Returns:
+            与files顺序一致的文档元数据列表（扫描期间被clear清空的为None）
+        """
+        with self.lock:
+            return self._scan(files, workers, log_callback)
+
+    def _scan(self, files: List[str], workers: int, log_callback: Callable) -> List[Optional[DocumentInfo]]:
+        to_scan = []
+        for file_path in files:
+            info = self.documents.get(file_path)
+            if (info is None or info.is_stale()) and file_path not in to_scan:
+                to_scan.append(file_path)
+
+        if to_scan:
+            if log_callback:
+                log_callback(f"预扫描PDF: {len(to_scan)} 个文件")
+
+            if workers > 1 and len(to_scan) > 1:
+                with ProcessPoolExecutor(max_workers=min(workers, len(to_scan))) as executor:
+                    results = list(executor.map(scan_document, to_scan))
+            else:
+                results = [scan_document(f) for f in to_scan]
+
+            for info in results:
+                self.documents[info.path] = info
+                if log_callback:
+                    if info.error:
+                        log_callback(f"读取PDF失败: {os.path.basename(info.path)} - {info.error}")
+                    elif info.needs_pass:
+                        log_callback(f"PDF已加密，需要密码: {os.path.basename(info.path)}")
+
+        # 扫描期间目录可能被界面线程清空
+        return [self.documents.get(f) for f in files]
+
+    def get(self, file_path: str) -> Optional[DocumentInfo]:
+        """获取文档元数据"""
+        return self.documents.get(file_path)
+
+    def total_pages(self, files: List[str], selection: PageSelection = None) -> int:
+        """统计可渲染文档的总页数，指定页面选择时只统计选中的页面"""
+        total = 0
+        for file_path in files:
+            info = self.documents.get(file_path)
+            if info and info.is_valid:
+                total += len(selection.select(info.page_count)) if selection else info.page_count
+        return total
+
+    def remove(self, file_path: str):
+        """移除文档元数据"""
+        self.documents.pop(file_path, None)
+
+    def clear(self):
+        """清空目录"""
+        self.documents.clear()
@@ -1,13 +1,660 @@
 import os
+import io
 import fitz
 from PIL import Image
 from datetime import datetime
 import threading
 import queue
-from typing import List, Dict, Optional, Callable
+import math
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Callable, Tuple
 from utils import natural_sort_key
+from pdf_catalog import DocumentCatalog, DocumentInfo
+from render_pipeline import ExportPipeline, ExportTask, WrittenOutput, encode_output, write_file
+from tiled_render import PNGStreamWriter, needs_tiling, tile_size, plan_bands, plan_tiles
+from render_cache import RenderCache, get_render_cache
+from page_analysis import extract_full_page_image, select_colorspace
+from encoder_profiles import EncoderProfile, format_extension, normalize_format
+from export_manifest import ExportManifest
+from page_detection import PageDetector
+from page_selection import PageSelection
+from archive_sink import ArchiveSink, ARCHIVE_LOCATION
+from long_image import LongImageWriter, stitch_source
+from split_plan import plan_files, format_plan_report, execute_plan, crop_parts
+from jpeg_lossless import DEFAULT_SNAP_TOLERANCE
+from gutter_detection import GutterFinder
+from memory_governor import (MemoryReservation, shared_governor, estimate_page_bytes, estimate_pixels,
+                             EXCLUSIVE_PIXELS)
+
+# 草稿模式默认DPI
+DRAFT_DPI = 72
+
+# 草稿模式的抗锯齿级别（0-8，MuPDF默认为8）
+DRAFT_AA_LEVEL = 2
+
+# 草稿后精修时最多保持打开的文档数，精修阶段直接复用
+KEEP_OPEN_DOCUMENTS = 64
+
+# 融合分割检测分割线时整页低分辨率栅格的DPI
+GUTTER_SAMPLE_DPI = 36
+
+
+def pixmap_to_image(pix: fitz.Pixmap) -> Image.Image:
+    """将fitz.Pixmap转换为PIL图片"""
+    mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[pix.n]
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+
+class RenderTarget:
+    """
+    一个输出目标：DPI、输出格式和输出目录
+    
+    多输出模式下同一页面的显示列表只构建一次，依次栅格化到各个目标。
+    只包含基本类型，可以传递给进程池子进程。
+    archive为True时输出写入压缩包（见ArchiveSink），渲染阶段不直接写磁盘。
+    """
+    def __init__(self, output_dir: str, dpi: int, output_format: str, archive: bool = False):
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.output_format = output_format
+        self.archive = archive
+
+
+def _rasterize(display_list: fitz.DisplayList, matrix: fitz.Matrix, colorspace: fitz.Colorspace,
+               clip: fitz.Rect = None) -> Image.Image:
+    """
+    从显示列表栅格化页面或页面的一部分
+    
+    渲染结果不带透明通道；灰度页面以单通道渲染，像素内存和编码工作量约为RGB的1/3。
+    """
+    return pixmap_to_image(display_list.get_pixmap(
+        matrix=matrix, colorspace=colorspace, alpha=False, clip=clip))
+
+
+class PageRasterizer:
+    """
+    单个页面的栅格化入口
+    
+    显示列表和颜色空间在第一次需要时才生成（渲染缓存全部命中时页面内容不需要解析）；
+    启用渲染缓存时，整页栅格先查缓存，未命中再渲染并写入缓存。
+    """
+    def __init__(self, page: fitz.Page, colorspace: str = 'auto', cache: RenderCache = None):
+        """
+        Args:
+            page: PDF页面
+            colorspace: 颜色模式 ('auto'、'rgb'、'gray')
+            cache: 渲染缓存，为None时不使用缓存
+        """
+        self.page = page
+        self.colorspace_mode = colorspace
+        self.cache = cache
+        self._display_list = None
+        self._colorspace = None
+        self._page_digest = None
+        
+    @property
+    def display_list(self) -> fitz.DisplayList:
+        """页面显示列表（只解析一次页面内容）"""
+        if self._display_list is None:
+            self._display_list = self.page.get_displaylist()
+        return self._display_list
+        
+    @property
+    def colorspace(self) -> fitz.Colorspace:
+        """栅格化使用的颜色空间"""
+        if self._colorspace is None:
+            self._colorspace = select_colorspace(self.display_list, self.colorspace_mode)
+        return self._colorspace
+        
+    def render(self, matrix: fitz.Matrix, clip: fitz.Rect = None) -> Image.Image:
+        """从显示列表栅格化页面或页面的一部分（不经过缓存）"""
+        return _rasterize(self.display_list, matrix, self.colorspace, clip)
+        
+    def full_page(self, dpi: int) -> Image.Image:
+        """
+        整页栅格，启用缓存时优先从缓存读取
+        
+        Args:
+            dpi: 输出图片DPI
+        """
+        if self.cache is None:
+            return self.render(fitz.Matrix(dpi/72, dpi/72))
+        if self._page_digest is None:
+            self._page_digest = self.cache.page_digest(self.page)
+        key = RenderCache.make_key(self._page_digest, dpi, self.colorspace_mode)
+        img = self.cache.get(key)
+        if img is None:
+            img = self.render(fitz.Matrix(dpi/72, dpi/72))
+            self.cache.put(key, img)
+        return img
+
+
+@contextmanager
+def _antialiasing(level: int):
+    """临时修改MuPDF的抗锯齿级别（进程内全局设置），退出时恢复"""
+    previous = fitz.TOOLS.show_aa_level()
+    fitz.TOOLS.set_aa_level(level)
+    try:
+        yield
+    finally:
+        fitz.TOOLS.set_aa_level(previous['graphics'])
+
+
+def _page_output_path(output_dir: str, page_num: int, output_format: str) -> str:
+    """页面输出文件路径"""
+    return os.path.join(output_dir, f"page_{page_num + 1}.{format_extension(output_format)}")
+
+
+def _split_outputs(parts: List[Image.Image], target: RenderTarget,
+                   page_num: int) -> List[Tuple[str, Image.Image, str]]:
+    """为分割后的各部分生成输出路径"""
+    ext = format_extension(target.output_format)
+    return [
+        (os.path.join(target.output_dir, f"page_{page_num + 1}_split_{i + 1}.{ext}"),
+         part, target.output_format)
+        for i, part in enumerate(parts)
+    ]
+
+
+def _render_tiled(display_list: fitz.DisplayList, matrix: fitz.Matrix, colorspace: fitz.Colorspace,
+                  box: Tuple[int, int, int, int], rotate: bool, output_path: str,
+                  output_format: str, render_config: Dict,
+                  in_memory: bool = False) -> List[Tuple[str, object, str]]:
+    """
+    分块渲染页面的一个区域，任何时候只持有一个横条或一个分块
+    
+    PNG输出 (tiling['output'] 为 'stream'，默认) 时逐条渲染并流式压缩写入一张图片；
+    其他格式无法流式编码，或指定 'tiles' 时，每个分块保存为单独的文件
+    "{输出文件名}_tile_{行}_{列}.{扩展名}"。文件在渲染阶段直接写入；
+    in_memory为True（输出写入压缩包）时改为返回编码后的数据，像素仍按块释放。
+    
+    Args:
+        display_list: 页面显示列表
+        matrix: 页面缩放矩阵（未旋转）
+        colorspace: 颜色空间
+        box: 区域在页面中的像素坐标
+        rotate: 区域是否旋转180度输出
+        output_path: 不分块时的输出文件路径
+        output_format: 输出格式
+        render_config: 渲染配置
+        in_memory: 是否返回编码后的数据而不写入磁盘
+        
+    Returns:
+        [(输出文件路径, WrittenOutput或编码后的数据, 输出格式), ...]
+    """
+    tiling = render_config.get('tiling') or {}
+    size = tile_size(tiling)
+    inverse = ~matrix
+    render_matrix = fitz.Matrix(matrix).prerotate(180) if rotate else matrix
+    profile = EncoderProfile.from_config(render_config.get('encoder'))
+    
+    def render_box(pixel_box):
+        left, top, right, bottom = pixel_box
+        img = _rasterize(display_list, render_matrix, colorspace, fitz.Rect(pixel_box) * inverse)
+        if img.size != (right - left, bottom - top):
+            img = img.crop((0, 0, right - left, bottom - top))
+        return img
+    
+    if tiling.get('output', 'stream') == 'stream' and normalize_format(output_format) == 'png':
+        width, height = box[2] - box[0], box[3] - box[1]
+        mode = "L" if colorspace.n == 1 else "RGB"
+        buffer = io.BytesIO() if in_memory else None
+        with PNGStreamWriter(buffer or output_path, width, height, mode,
+                             profile.settings['png']['compress_level']) as writer:
+            for _, band_box in plan_bands(box, rotate, size):
+                writer.write_rows(render_box(band_box))
+        return [(output_path, buffer.getvalue() if in_memory else WrittenOutput(), output_format)]
+        
+    stem, ext = os.path.splitext(output_path)
+    outputs = []
+    for row, col, tile_box in plan_tiles(box, rotate, size):
+        tile_path = f"{stem}_tile_{row}_{col}{ext}"
+        if in_memory:
+            outputs.append((tile_path, profile.encode(render_box(tile_box), output_format), output_format))
+            continue
+        profile.save(render_box(tile_box), tile_path, output_format)
+        outputs.append((tile_path, WrittenOutput(), output_format))
+    return outputs
+
+
+def _render_draft_outputs(page: fitz.Page, page_num: int, targets: List[RenderTarget],
+                          draft_config: Dict) -> List[Tuple[str, Image.Image, str]]:
+    """
+    草稿渲染：降低抗锯齿级别、跳过注释，直接按RGB整页渲染
+    
+    不探测颜色模式、不分割、不提取原图，也不经过渲染缓存，只求尽快得到预览。
+    
+    Args:
+        page: PDF页面
+        page_num: 页码 (从0开始)
+        targets: 输出目标列表（DPI为草稿DPI）
+        draft_config: 草稿配置
+        
+    Returns:
+        [(输出文件路径, 图片, 输出格式), ...]
+    """
+    outputs = []
+    with _antialiasing(draft_config.get('aa_level', DRAFT_AA_LEVEL)):
+        for target in targets:
+            pix = page.get_pixmap(matrix=fitz.Matrix(target.dpi/72, target.dpi/72),
+                                  colorspace=fitz.csRGB, alpha=False, annots=False)
+            outputs.append((_page_output_path(target.output_dir, page_num, target.output_format),
+                            pixmap_to_image(pix), target.output_format))
+    return outputs
+
+
+def _render_page_outputs(doc: fitz.Document, page_num: int, targets: List[RenderTarget],
+                         split_config: Dict = None,
+                         render_config: Dict = None) -> List[Tuple[str, object, str]]:
+    """
+    渲染单个页面并生成所有输出目标的待输出内容
+    
+    页面内容只解析一次生成显示列表，再按各目标的DPI分别栅格化；
+    对矢量内容较多的页面，解析和解释占渲染耗时的很大一部分。
+    
+    融合分割模式 (split_config['fused_split']) 下，先由页面矩形规划分割方案，
+    再按裁剪区域直接渲染各部分，只输出分割后的图片，不再写出整页图片。
+    
+    启用render_config['extract_images']时，只包含一张整页JPEG的扫描页不再栅格化：
+    普通模式下原图数据逐字节写出（扩展名为.jpg，分辨率为原图分辨率），
+    融合分割模式下原图解码后直接交给分割。
+    
+    render_config['colorspace']为颜色模式：'auto'（默认）以低DPI探测渲染检测灰度页面，
+    灰度页面以单通道渲染和编码；'rgb'/'gray' 强制彩色或灰度。
+    
+    超大页面（见render_config['tiling']和needs_tiling）分块渲染，不分配整页缓冲区，
+    分割时各部分分别由分块组成。
+    
+    render_config['draft']存在时按草稿方式渲染，见_render_draft_outputs。
+    
+    启用渲染缓存 (render_config['cache']) 时，整页栅格先查缓存；融合分割模式下
+    改为由缓存的整页栅格裁剪出各部分。分块渲染的超大页面不进入缓存。
+    
+    Args:
+        doc: 已打开的PDF文档
+        page_num: 页码 (从0开始)
+        targets: 输出目标列表
+        split_config: 图片分割配置
+        render_config: 渲染配置
+        
+    Returns:
+        [(输出文件路径, 图片或已编码的数据, 输出格式), ...]
+    """
+    render_config = render_config or {}
+    fused_split = bool(split_config and split_config.get('fused_split'))
+    colorspace = render_config.get('colorspace', 'auto')
+    page = doc.load_page(page_num)
+    
+    if render_config.get('draft'):
+        return _render_draft_outputs(page, page_num, targets, render_config['draft'])
+    
+    if render_config.get('extract_images'):
+        extracted = extract_full_page_image(page)
+        if extracted:
+            data, ext = extracted
+            if not fused_split:
+                return [(os.path.join(target.output_dir, f"page_{page_num + 1}.{ext}"), data, ext)
+                        for target in targets]
+            img = Image.open(io.BytesIO(data))
+            if colorspace == 'gray' and img.mode != "L":
+                img = img.convert("L")
+            parts = split_page_image(img, page_num == 0, split_config)
+            outputs = []
+            for target in targets:
+                outputs.extend(_split_outputs(parts, target, page_num))
+            return outputs
+    
+    # 显示列表只解析一次页面内容，供颜色探测、各输出目标和各分割部分重复栅格化
+    rasterizer = PageRasterizer(page, colorspace, get_render_cache(render_config.get('cache')))
+    gutter = GutterFinder.from_config(split_config.get('gutter')) if fused_split else None
+    gutter_sample = None
+    outputs = []
+    for target in targets:
+        matrix = fitz.Matrix(target.dpi/72, target.dpi/72)
+        page_irect = (page.rect * matrix).irect
+        tiled = needs_tiling(page_irect.width * page_irect.height, render_config.get('tiling'))
+        if not fused_split:
+            output_path = _page_output_path(target.output_dir, page_num, target.output_format)
+            if tiled:
+                outputs.extend(_render_tiled(
+                    rasterizer.display_list, matrix, rasterizer.colorspace,
+                    (0, 0, page_irect.width, page_irect.height),
+                    False, output_path, target.output_format, render_config, target.archive
+                ))
+                continue
+            img = rasterizer.full_page(target.dpi)
+            outputs.append((output_path, img, target.output_format))
+            continue
+            
+        # 栅格化之前由页面矩形得到像素尺寸并规划分割，再按裁剪区域分别渲染各部分，
+        # 避免分配整页缓冲区再裁剪复制
+        plan = plan_split(page_irect.width, page_irect.height, page_num == 0, split_config)
+        if gutter is not None and len(plan) == 2 and (tiled or rasterizer.cache is None):
+            # 分割线由低分辨率整页栅格检测，各输出目标共用；使用缓存的整页栅格时由split_page_image检测
+            if gutter_sample is None:
+                gutter_sample = rasterizer.render(fitz.Matrix(GUTTER_SAMPLE_DPI / 72, GUTTER_SAMPLE_DPI / 72))
+            plan = gutter.apply(plan, page_irect.width, page_irect.height, gutter_sample)
+        if tiled:
+            split_paths = _split_outputs([None] * len(plan), target, page_num)
+            for (box, rotate), (output_path, _, _) in zip(plan, split_paths):
+                outputs.extend(_render_tiled(
+                    rasterizer.display_list, matrix, rasterizer.colorspace, box, rotate,
+                    output_path, target.output_format, render_config, target.archive
+                ))
+            continue
+        if rasterizer.cache is not None:
+            img = rasterizer.full_page(target.dpi)
+            outputs.extend(_split_outputs(split_page_image(img, page_num == 0, split_config),
+                                          target, page_num))
+            continue
+        inverse = ~matrix
+        parts = []
+        for box, rotate in plan:
+            clip = fitz.Rect(box) * inverse
+            # 需要旋转的部分直接以旋转后的方向渲染
+            part_matrix = fitz.Matrix(matrix).prerotate(180) if rotate else matrix
+            parts.append(rasterizer.render(part_matrix, clip))
+        outputs.extend(_split_outputs(parts, target, page_num))
+    return outputs
+
+
+def _create_stitchers(targets: List[RenderTarget], render_config: Dict = None) -> Dict[str, LongImageWriter]:
+    """
+    按render_config['stitch']为每个输出目标创建长图拼接器，未启用时返回空字典
+    
+    Returns:
+        {输出目录: 长图拼接器}
+    """
+    stitch_config = (render_config or {}).get('stitch')
+    if not stitch_config:
+        return {}
+    profile = EncoderProfile.from_config(render_config.get('encoder'))
+    return {
+        target.output_dir: LongImageWriter(target.output_dir, stitch_config, profile, target.archive)
+        for target in targets
+    }
+
+
+def _stitch_outputs(stitchers: Dict[str, LongImageWriter], outputs: List[Tuple[str, object, str]]):
+    """把一个页面的输出按顺序追加到所属目标的长图，不需要重新读取已导出的文件"""
+    for output_file, payload, _ in outputs:
+        stitcher = stitchers.get(os.path.dirname(output_file))
+        if stitcher is None:
+            continue
+        img = stitch_source(output_file, payload)
+        if img is not None:
+            stitcher.add(img)
+
+
+def _render_shard(file_path: str, page_numbers: List[int], targets: List[RenderTarget],
+                  split_config: Dict = None,
+                  render_config: Dict = None
+                  ) -> List[Tuple[int, Optional[str], List[str], List[Tuple[str, bytes]]]]:
+    """
+    进程池工作函数：在子进程中独立打开PDF并渲染一段页面
+    
+    输出到磁盘的目标由子进程直接写入；写入压缩包的目标把编码后的数据
+    随结果返回，由主进程写入压缩包（压缩包不能被多个进程同时写入）。
+    启用长图拼接时分片包含整个PDF，长图在子进程中拼接，作为页码为None的一项返回。
+    
+    Args:
+        file_path: PDF文件路径
+        page_numbers: 需要渲染的页码列表 (从0开始)
+        targets: 输出目标列表
+        split_config: 图片分割配置
+        render_config: 渲染配置
+        
+    Returns:
+        [(页码, 错误信息或None, 输出文件列表, [(压缩包内的输出路径, 编码后的数据), ...]), ...]
+    """
+    results = []
+    profile = EncoderProfile.from_config((render_config or {}).get('encoder'))
+    archive_dirs = {target.output_dir for target in targets if target.archive}
+    stitchers = _create_stitchers(targets, render_config)
+    doc = fitz.open(file_path)
+    try:
+        for page_num in page_numbers:
+            try:
+                output_files, archived = [], []
+                outputs = _render_page_outputs(doc, page_num, targets, split_config, render_config)
+                for output_file, payload, output_format in outputs:
+                    data = encode_output(payload, output_format, profile)
+                    if os.path.dirname(output_file) in archive_dirs:
+                        archived.append((output_file, data))
+                    else:
+                        write_file(output_file, data)
+                    output_files.append(output_file)
+                _stitch_outputs(stitchers, outputs)
+                results.append((page_num, None, output_files, archived))
+            except Exception as e:
+                results.append((page_num, str(e), [], []))
+        if stitchers:
+            long_files, archived = [], []
+            for stitcher in stitchers.values():
+                for output_file, payload, _ in stitcher.close():
+                    long_files.append(output_file)
+                    if isinstance(payload, bytes):
+                        archived.append((output_file, payload))
+            results.append((None, None, long_files, archived))
+    finally:
+        for stitcher in stitchers.values():
+            stitcher.abort()
+        doc.close()
+    return results
+
+
+def plan_split(width: int, height: int, is_first_page: bool, config: Dict,
+               log_callback: Callable = None) -> List[Tuple[Tuple[int, int, int, int], bool]]:
+    """
+    仅根据图片尺寸规划分割方案，不接触像素数据
+    
+    PDF页面在栅格化之前即可由页面矩形和DPI得到像素尺寸，
+    因此可以先规划再按裁剪区域分别渲染。
+    
+    Args:
+        width: 图片宽度
+        height: 图片高度
+        is_first_page: 是否是PDF的第一页
+        config: 分割配置
+        log_callback: 日志回调函数
+        
+    Returns:
+        [(裁剪框(left, upper, right, lower), 是否旋转180度), ...]，
+        不需要分割时只包含覆盖整图的一项
+    """
+    def bottom_rotated() -> bool:
+        # 处理下半部分旋转
+        should_rotate = config.get('rotate_bottom', False)
+        is_first_no_rotate = is_first_page and config.get('first_page_no_rotate', True)
+        if should_rotate and not is_first_no_rotate:
+            if log_callback:
+                log_callback("旋转下半部分180度")
+            return True
+        return False
+        
+    def split_left_right():
+        mid = width // 2
+        if log_callback:
+            log_callback(f"分割完成：左侧 {mid}x{height}, 右侧 {width-mid}x{height}")
+        return [((0, 0, mid, height), False), ((mid, 0, width, height), False)]
+        
+    def split_top_bottom():
+        mid = height // 2
+        rotate = bottom_rotated()
+        if log_callback:
+            log_callback(f"分割完成：上部 {width}x{mid}, 下部 {width}x{height-mid}")
+        return [((0, 0, width, mid), False), ((0, mid, width, height), rotate)]
+    
+    # 通用模式：根据宽高比判断分割方向
+    if config['mode'] == "通用模式":
+        if log_callback:
+            log_callback(f"使用通用模式，分割比例: {config.get('split_ratio', 1.2)}")
+            
+        ratio = config.get('split_ratio', 1.2)  # 可配置的分割比例
+        if width / height > ratio:  # 左右分割
+            if log_callback:
+                log_callback("检测为横向图片，进行左右分割")
+            return split_left_right()
+        elif height / width > ratio:  # 上下分割
+            if log_callback:
+                log_callback("检测为纵向图片，进行上下分割")
+            return split_top_bottom()
+        else:  # 不需要分割
+            if log_callback:
+                log_callback("图片比例正常，无需分割")
+            return [((0, 0, width, height), False)]
+            
+    # 自定义模式：根据目标尺寸判断
+    if 'target_width' not in config or 'target_height' not in config:
+        if log_callback:
+            log_callback("错误：自定义模式需要指定目标尺寸")
+        raise ValueError("自定义模式需要指定目标尺寸")
+        
+    target_width = config['target_width']
+    target_height = config['target_height']
+    
+    if log_callback:
+        log_callback(f"使用自定义模式，目标尺寸: {target_width}x{target_height}")
+    
+    # 计算当前图片与目标尺寸的比例
+    width_ratio = width / target_width
+    height_ratio = height / target_height
+    
+    # 允许的误差范围
+    tolerance = config.get('size_tolerance', 0.1)  # 10%的误差
+    
+    if abs(1 - width_ratio) <= tolerance and abs(1 - height_ratio) <= tolerance:
+        if log_callback:
+            log_callback("图片符合目标尺寸，进行竖向分割")
+        # 符合目标尺寸，竖向分割
+        return split_top_bottom()
+    else:
+        if log_callback:
+            log_callback("图片不符合目标尺寸，进行横向分割")
+        # 不符合目标尺寸，横向分割
+        return split_left_right()
+
+
+def split_page_image(img: Image.Image, is_first_page: bool, config: Dict,
+                     log_callback: Callable = None) -> List[Image.Image]:
+    """
+    根据配置分割图片（PDFProcessor.split_image的实现）
+    
+    定义在模块级别，以便进程池子进程和渲染流水线直接调用。
+    
+    Args:
+        img: 原始图片
+        is_first_page: 是否是PDF的第一页
+        config: 分割配置
+        log_callback: 日志回调函数
+        
+    Returns:
+        分割后的图片列表
+    """
+    try:
+        # 验证图片
+        if not isinstance(img, Image.Image):
+            if log_callback:
+                log_callback("错误：无效的图片对象")
+            raise ValueError("无效的图片对象")
+            
+        # 检查图片大小
+        width, height = img.size
+        if log_callback:
+            log_callback(f"图片尺寸: {width}x{height}")
+            
+        # 超大图片不再拒绝，由内存调度器安排独占运行
+        if width * height > EXCLUSIVE_PIXELS and log_callback:
+            log_callback(f"超大图片: {width}x{height}，独占内存预算处理")
+            
+        plan = plan_split(width, height, is_first_page, config, log_callback)
+        if len(plan) == 1:
+            return [img.copy()]  # 返回副本避免原图被修改
+            
+        gutter = GutterFinder.from_config(config.get('gutter'))
+        if gutter is not None:
+            plan = gutter.apply(plan, width, height, img)
+            if log_callback:
+                (left, upper, _, _), _ = plan[1]
+                log_callback(f"分割线位置: {left or upper}")
+        return list(crop_parts(img, plan))
+                
+    except Exception as e:
+        if log_callback:
+            log_callback(f"错误：图片分割失败: {str(e)}")
+        raise ValueError(f"图片分割失败: {str(e)}")
+
+
+class DocumentJob:
+    """单个PDF的导出任务：各输出目标的输出目录、导出清单和待渲染页面"""
+    def __init__(self, file_path: str, info: DocumentInfo, outputs: List[Tuple[str, int, str]],
+                 archive: bool = False):
+        """
+        Args:
+            file_path: PDF文件路径
+            info: 文档元数据
+            outputs: [(主输出目录, DPI, 输出格式), ...]，第一项为主输出
+            archive: 是否输出到压缩包（每个目标一个 "{输出目录}.cbz"，不记录导出清单）
+        """
+        self.file_path = file_path
+        self.info = info
+        self.pdf_name = os.path.splitext(os.path.basename(file_path))[0]
+        self.targets = [
+            RenderTarget(os.path.join(output_base, self.pdf_name), dpi, output_format, archive)
+            for output_base, dpi, output_format in outputs
+        ]
+        self.manifests = [] if archive else [ExportManifest(target.output_dir) for target in self.targets]
+        self.output_dir = self.targets[0].output_dir
+        self.page_numbers: List[int] = []  # 需要渲染的页码
+        self.skipped_pages = 0  # 续传时跳过的已完成页数
+        self.links: List[Tuple[int, 'DocumentJob', int]] = []  # (页码, 源任务, 源页码)，渲染后链接到源页面的输出
+
+
+class PageProgress:
+    """汇总页面级进度，并在页面完成时更新导出清单"""
+    def __init__(self, total_pages: int, progress_callback: Callable = None, log_callback: Callable = None):
+        self.total_pages = total_pages
+        self.processed_pages = 0
+        self.progress_callback = progress_callback
+        self.log_callback = log_callback
+        self.log_prefix = ""  # 日志前缀，草稿阶段为 "[草稿] "
+        
+    def _report(self):
+        if self.progress_callback and self.total_pages:
+            progress = (self.processed_pages / self.total_pages) * 100
+            self.progress_callback(int(progress))
+        
+    def skip(self, count: int):
+        """计入无需渲染的页面"""
+        if count:
+            self.processed_pages += count
+            self._report()
+        
+    def page_done(self, job: DocumentJob, page_num: int, output_files: List[str]):
+        """页面所有输出均已写入"""
+        # 各输出目标的清单只记录自己目录中的文件
+        for manifest in job.manifests:
+            manifest.mark_done(page_num, [
+                f for f in output_files if os.path.dirname(f) == manifest.output_dir
+            ])
+        self.processed_pages += 1
+        self._report()
+        if self.log_callback:
+            self.log_callback(f"{self.log_prefix}已处理: {job.pdf_name} - 第 {page_num + 1} 页")
+        
+    def page_failed(self, job: DocumentJob, page_num: int):
+        """页面已结束但有输出失败：计入进度，不记入导出清单"""
+        self.processed_pages += 1
+        self._report()
+        if self.log_callback:
+            self.log_callback(f"{self.log_prefix}处理失败: {job.pdf_name} - 第 {page_num + 1} 页")
+
 
 class PDFProcessor:
+    # 并行模式下每个分片的最大页数（分片越小，暂停/停止响应越快）
+    MAX_SHARD_PAGES = 16
+    
     def __init__(self):
         self.processing = False
         self.paused = False
@@ -17,125 +664,187 @@ class PDFProcessor:
         self.stop_event = threading.Event()
         self.pause_event.set()  # 默认不暂停
         self.stop_event.clear()  # 默认不停止
+        # 文档目录，跨批次复用已扫描的PDF元数据
+        self.catalog = DocumentCatalog()
+        # 内存调度器，与ImageProcessor共用
+        self.governor = shared_governor()
+        # 草稿后精修：草稿阶段保持打开的文档，精修阶段复用
+        self.open_documents: Dict[str, fitz.Document] = {}
+        self.keep_documents = False
         
     def process_files(self, files: List[str], dpi: int, output_format: str,
                      interval: int, output_location: str, custom_output_path: str = None,
-                     split_config: Dict = None, progress_callback: Callable = None, log_callback: Callable = None):
+                     split_config: Dict = None, progress_callback: Callable = None, log_callback: Callable = None,
+                     workers: int = 1, resume: bool = False, render_config: Dict = None):
         """
         处理PDF文件列表
         
         Args:
             files: PDF文件路径列表
             dpi: 输出图片DPI
-            output_format: 输出格式 ('PNG' 或 'JPG')
+            output_format: 输出格式 ('PNG'、'JPG' 或 'WEBP')
             interval: 处理间隔 (0表示处理所有PDF，1表示隔一个处理一个，以此类推)
-            output_location: 输出位置 ('原位置' 或 '自定义位置')
+            output_location: 输出位置 ('原位置'、'自定义位置' 或 '压缩包')；'压缩包' 时每个PDF
+                             输出为一个压缩包，位于自定义输出路径（未指定时为原位置）下
             custom_output_path: 自定义输出路径
-            split_config: 图片分割配置
+            split_config: 图片分割配置，包含output_name；fused_split为True时
+                          渲染结果直接按split_image的规则分割后输出；gutter为分割线检测
+                          配置（见GutterFinder），在中线附近的空白处分割
             progress_callback: 进度回调函数
             log_callback: 日志回调函数
+            workers: 并行渲染进程数 (1表示在当前线程串行处理)
+            resume: 是否续传，为True时跳过导出清单中已完成且未过期的页面
+            render_config: 渲染配置，支持的键：
+                extract_images: 扫描页直接提取原图，不栅格化
+                colorspace: 颜色模式，'auto'（默认，自动检测灰度页面）、'rgb' 或 'gray'
+                memory_budget: 内存预算（字节），同时在途的页面估算内存不超过该值
+                detect: 空白页/重复页检测 {'blank': bool, 'duplicates': bool,
+                        'action': 'skip'/'link', 'ink_ratio': 空白页墨迹占比阈值}，见PageDetector
+                cache: 渲染缓存配置 {'dir': 缓存目录, 'max_bytes': 容量上限}，为None时不使用缓存
+                tiling: 分块渲染配置 {'mode': 'auto'/'always'/'off', 'tile_size': 分块边长,
+                        'output': 'stream'/'tiles', 'min_pixels': 自动分块的像素阈值}
+                extra_outputs: 附加输出目标列表 [{'dpi': 72, 'format': 'JPG'}, ...]，
+                               与主输出在同一次解析中渲染，各自输出到
+                               "{output_name}_{dpi}dpi_{扩展名}" 目录
+                encoder: 编码配置，见EncoderProfile.from_config
+                draft: 草稿模式 {'dpi': 草稿DPI, 'aa_level': 抗锯齿级别, 'refine': 是否精修}，
+                       先以低DPI快速渲染整批PDF到 "{output_name}_draft" 目录；
+                       refine为True时随后按最终设置渲染，复用草稿阶段打开的文档
+                archive: 压缩包配置 {'format': 'cbz'/'zip', 'compression': 'stored'/'deflated'}，
+                         仅在output_location为 '压缩包' 时使用，见ArchiveSink
+                stitch: 长图配置 {'mode': 'stitch'/'tile', 'width', 'max_height', 'max_pages',
+                        'format'}，每个PDF的输出按顺序拼接为 "long_N" 长图，见LongImageWriter
+                schedule: 并行调度 {'largest_first': 渲染量大的PDF先提交（默认True）,
+                          'first_pages': 每个PDF的首页先于其他所有页面渲染（默认False）}，
+                          只改变并行模式下的渲染顺序，不影响interval选择的文件和输出结果
+                pages: 页面选择 {'ranges': "1-10,15,-3", 'every': 抽样间隔, 'first': 前N页,
+                       'last': 后N页}，见PageSelection；未选中的页面不渲染，也不计入进度
         """
+        jobs = []
+        sink = None
+        budget_token = None
         try:
-            # 确保split_config存在
+            # 确保split_config和render_config存在
             split_config = split_config or {}
+            render_config = render_config or {}
             output_name = split_config.get('output_name', 'pdf_output')
+            archive = output_location == ARCHIVE_LOCATION
             
             # 创建主输出目录
-            if output_location == "原位置":
+            if output_location == "原位置" or (archive and not custom_output_path):
                 base_dir = os.path.dirname(files[0])
                 output_base = os.path.join(base_dir, output_name)
             else:
                 output_base = os.path.join(custom_output_path, output_name)
             
-            # 创建主输出目录
-            os.makedirs(output_base, exist_ok=True)
-            
-            if log_callback:
-                log_callback(f"创建输出目录: {output_base}")
-            
             # 根据间隔选择要处理的文件
             step = 1 if interval == 0 else interval + 1
             files_to_process = files[::step]
             total_files = len(files_to_process)
-            total_pages = sum(fitz.open(f).page_count for f in files_to_process)
-            processed_pages = 0
             
-            # 处理每个文件
-            for file_index, file_path in enumerate(files_to_process):
-                if self.stopped:
+            # 页面选择在扫描前解析，格式错误时直接报错
+            selection = PageSelection(render_config.get('pages'))
+            if selection.enabled and log_callback:
+                log_callback(f"页面选择: {selection.describe()}")
+            
+            # 预扫描：每个PDF只打开一次以收集元数据
+            self.catalog.scan(files_to_process, workers=workers, log_callback=log_callback)
+            total_pages = self.catalog.total_pages(files_to_process, selection)
+            
+            # 内存预算只在本次处理期间有效
+            budget_token = self.governor.override_budget(render_config.get('memory_budget'))
+            
+            if archive:
+                # 压缩包在页面完成时逐个写入条目，不记录导出清单，也无法链接已有条目
+                sink = ArchiveSink(render_config.get('archive'))
+                if log_callback:
+                    log_callback(f"输出到压缩包: 每个PDF一个 .{sink.format} 文件")
+                if resume:
+                    resume = False
                     if log_callback:
-                        log_callback("处理已停止")
-                    return
-                        
-                if not os.path.exists(file_path):
+                        log_callback("压缩包输出不支持断点续传，将重新导出所有页面")
+                detect_config = render_config.get('detect') or {}
+                if detect_config.get('action') == 'link':
+                    render_config = dict(render_config, detect=dict(detect_config, action='skip'))
                     if log_callback:
-                        log_callback(f"文件不存在: {file_path}")
-                    continue
-                    
-                try:
-                    # 打开PDF文件
-                    doc = fitz.open(file_path)
-                    doc_pages = doc.page_count
-                    
-                    # 为当前PDF创建输出子目录
-                    pdf_name = os.path.splitext(os.path.basename(file_path))[0]
-                    pdf_output_dir = os.path.join(output_base, pdf_name)
-                    os.makedirs(pdf_output_dir, exist_ok=True)
-                    
+                        log_callback("压缩包输出不支持链接，检测到的空白页/重复页将跳过")
+            
+            if render_config.get('stitch') and resume:
+                # 长图需要按顺序拼接所有页面，已完成的页面不会再次渲染
+                resume = False
+                if log_callback:
+                    log_callback("拼接长图需要渲染全部页面，已忽略断点续传")
+            
+            # 草稿模式：先快速渲染整批预览，精修时进度的前一半为草稿
+            draft_config = render_config.get('draft')
+            refine = bool(draft_config and draft_config.get('refine'))
+            progress = PageProgress(total_pages * (2 if refine else 1), progress_callback, log_callback)
+            if draft_config:
+                self._render_drafts(files_to_process, output_base, output_format, draft_config,
+                                    workers, refine, progress, log_callback, sink,
+                                    render_config.get('pages'))
+                if self._is_stopped():
                     if log_callback:
-                        log_callback(f"处理PDF: {pdf_name}")
-                        log_callback(f"输出目录: {pdf_output_dir}")
-                    
-                    # 处理每一页
-                    for page_num in range(doc_pages):
-                        if self.stopped:
-                            if log_callback:
-                                log_callback("处理已停止")
-                            return
-                            
-                        # 使用pause_event等待而不是循环检查
-                        self.pause_event.wait()
-                        if self.stopped:
-                            if log_callback:
-                                log_callback("处理已停止")
-                            return
-                            
-                        try:
-                            page = doc.load_page(page_num)
-                            pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
-                                
-                            # 设置输出文件名
-                            output_file = os.path.join(
-                                pdf_output_dir, 
-                                f"page_{page_num + 1}.{output_format.lower()}"
-                            )
-                                
-                            # 保存图片
-                            if output_format.lower() == "png":
-                                pix.save(output_file)
-                            else:  # jpg
-                                pix.pil_save(output_file, "JPEG")
-                                
-                            # 更新进度
-                            processed_pages += 1
-                            if progress_callback:
-                                progress = (processed_pages / total_pages) * 100
-                                progress_callback(int(progress))
-                                
-                            if log_callback:
-                                log_callback(f"已处理: {pdf_name} - 第 {page_num + 1} 页")
-                                    
-                        except Exception as e:
-                            if log_callback:
-                                log_callback(f"处理页面时发生错误: {str(e)}")
-                            continue
-                        
-                    doc.close()
-                        
-                except Exception as e:
+                        log_callback("处理已停止")
+                    return
+                if not refine:
+                    if progress_callback:
+                        progress_callback(100)
                     if log_callback:
-                        log_callback(f"处理文件时发生错误: {str(e)}")
+                        log_callback("草稿渲染完成")
+                    return
+                if log_callback:
+                    log_callback("草稿渲染完成，开始按最终设置渲染")
+                render_config = dict(render_config, draft=None)
+            
+            # 创建主输出目录
+            os.makedirs(output_base, exist_ok=True)
+            
+            if log_callback:
+                log_callback(f"创建输出目录: {output_base}")
+                
+            # 输出目标：主输出 + 附加输出，每个目标有独立的输出目录树
+            outputs = [(output_base, dpi, output_format)]
+            for extra in render_config.get('extra_outputs', []):
+                extra_dpi = extra['dpi']
+                extra_format = extra.get('format', output_format)
+                extra_base = f"{output_base}_{extra_dpi}dpi_{format_extension(extra_format)}"
+                if any(base == extra_base for base, _, _ in outputs):
                     continue
+                os.makedirs(extra_base, exist_ok=True)
+                outputs.append((extra_base, extra_dpi, extra_format))
+                if log_callback:
+                    log_callback(f"附加输出: {extra_dpi} DPI {extra_format} -> {extra_base}")
+            
+            if split_config.get('fused_split') and log_callback:
+                log_callback("融合分割模式：渲染结果直接分割，不保存整页图片")
+            
+            jobs = self._prepare_jobs(files_to_process, outputs, split_config, render_config,
+                                      resume, log_callback, archive)
+            
+            progress.skip(sum(job.skipped_pages for job in jobs))
+            
+            # 空白页/重复页检测：渲染前移除这些页面，计入进度
+            detector = PageDetector(render_config.get('detect') or {})
+            if detector.enabled:
+                progress.skip(detector.detect(jobs, workers, self.stop_event, log_callback))
+            
+            if workers > 1:
+                self._process_files_parallel(
+                    jobs, split_config, render_config, workers, progress, log_callback, sink
+                )
+            else:
+                self._process_files_serial(
+                    jobs, split_config, render_config, progress, log_callback, sink
+                )
+            
+            if self._is_stopped():
+                if log_callback:
+                    log_callback("处理已停止")
+                return
+                
+            if detector.enabled:
+                detector.create_links(jobs, log_callback)
                 
             if progress_callback:
                 progress_callback(100)
@@ -147,150 +856,594 @@ class PDFProcessor:
                 log_callback(f"处理过程发生错误: {str(e)}")
             raise
         finally:
+            # 停止或出错时也保存清单，便于之后续传
+            for job in jobs:
+                for manifest in job.manifests:
+                    try:
+                        manifest.save()
+                    except OSError:
+                        pass
+            # 停止时已写入的页面同样保留在压缩包中
+            if sink is not None:
+                sink.close()
+            self.keep_documents = False
+            for doc in self.open_documents.values():
+                doc.close()
+            self.open_documents.clear()
+            self.governor.restore_budget(budget_token)
             self.processing = False
 
-    def split_image(self, img: Image.Image, is_first_page: bool, config: Dict, log_callback: Callable = None) -> List[Image.Image]:
+    def _render_drafts(self, files_to_process: List[str], output_base: str, output_format: str,
+                       draft_config: Dict, workers: int, keep_documents: bool,
+                       progress: PageProgress, log_callback: Callable = None,
+                       sink: ArchiveSink = None, pages: Dict = None):
         """
-        根据配置分割图片
+        草稿阶段：以低DPI、降低抗锯齿并跳过注释，快速渲染整批PDF的整页预览
+        
+        草稿输出到 "{主输出目录}_draft"，使用最快的编码预设，不分割、不检测、不续传。
         
         Args:
-            img: 原始图片
-            is_first_page: 是否是PDF的第一页
-            config: 分割��置
+            files_to_process: 需要处理的PDF文件列表
+            output_base: 主输出目录
+            output_format: 输出格式
+            draft_config: 草稿配置
+            workers: 并行渲染进程数
+            keep_documents: 是否保持文档打开供精修阶段复用（仅串行模式）
+            progress: 进度汇总
             log_callback: 日志回调函数
+            sink: 压缩包写入端，为None时输出到目录
+            pages: 页面选择配置，与最终渲染选择相同的页面
+        """
+        draft_base = f"{output_base}_draft"
+        draft_dpi = draft_config.get('dpi', DRAFT_DPI)
+        os.makedirs(draft_base, exist_ok=True)
+        if log_callback:
+            log_callback(f"草稿模式: {draft_dpi} DPI -> {draft_base}")
             
-        Returns:
-            分割后的图片列表
+        draft_render_config = {
+            'draft': draft_config,
+            'colorspace': 'rgb',
+            'encoder': {'preset': 'fastest'},
+            'pages': pages
+        }
+        jobs = self._prepare_jobs(files_to_process, [(draft_base, draft_dpi, output_format)],
+                                  {}, draft_render_config, False, log_callback, sink is not None)
+        progress.log_prefix = "[草稿] "
+        self.keep_documents = keep_documents
+        try:
+            if workers > 1:
+                self._process_files_parallel(jobs, {}, draft_render_config, workers, progress,
+                                             log_callback, sink)
+            else:
+                self._process_files_serial(jobs, {}, draft_render_config, progress, log_callback, sink)
+        finally:
+            for job in jobs:
+                for manifest in job.manifests:
+                    try:
+                        manifest.save()
+                    except OSError:
+                        pass
+            progress.log_prefix = ""
+            self.keep_documents = False
+
+    @contextmanager
+    def _open_document(self, file_path: str):
+        """
+        打开PDF用于渲染
+        
+        草稿后精修时，草稿阶段打开的文档（最多KEEP_OPEN_DOCUMENTS个）保持打开，
+        精修阶段直接复用已解析的文档（交叉引用表、页面树以及MuPDF缓存的字体和图片），
+        用完后关闭。
         """
+        doc = self.open_documents.pop(file_path, None)
+        if doc is None:
+            doc = fitz.open(file_path)
         try:
-            # 验证图片
-            if not isinstance(img, Image.Image):
-                if log_callback:
-                    log_callback("错误：无效的图片对象")
-                raise ValueError("无效的图片对象")
-                
-            # 检查图片大小
-            width, height = img.size
-            if log_callback:
-                log_callback(f"图片尺寸: {width}x{height}")
-                
-            if width * height > 100000000:  # 限制图片大小约为100M像素
-                if log_callback:
-                    log_callback(f"错误：图片太大: {width}x{height}")
-                raise ValueError(f"图片太大: {width}x{height}")
-                
-            # 通用模式：根据宽高比判断分割方向
-            if config['mode'] == "通用模式":
-                if log_callback:
-                    log_callback(f"使用通用模式，分割比例: {config.get('split_ratio', 1.2)}")
-                    
-                ratio = config.get('split_ratio', 1.2)  # 可配置的分割比例
-                if width / height > ratio:  # 左右分割
-                    if log_callback:
-                        log_callback("检测为横向图片，进行左右分割")
-                    mid = width // 2
-                    left = img.crop((0, 0, mid, height))
-                    right = img.crop((mid, 0, width, height))
-                    if log_callback:
-                        log_callback(f"分割完成：左侧 {mid}x{height}, 右侧 {width-mid}x{height}")
-                    return [left, right]
-                elif height / width > ratio:  # 上下分割
-                    if log_callback:
-                        log_callback("检测为纵向图片，进行上下分割")
-                    mid = height // 2
-                    top = img.crop((0, 0, width, mid))
-                    bottom = img.crop((0, mid, width, height))
-                    
-                    # 处理下半部分旋转
-                    should_rotate = config.get('rotate_bottom', False)
-                    is_first_no_rotate = is_first_page and config.get('first_page_no_rotate', True)
-                    
-                    if should_rotate and not is_first_no_rotate:
-                        if log_callback:
-                            log_callback("旋转下半部分180度")
-                        bottom = bottom.rotate(180)
-                    
-                    if log_callback:
-                        log_callback(f"分割完成：上部 {width}x{mid}, 下部 {width}x{height-mid}")
-                    return [top, bottom]
-                else:  # 不需要分割
-                    if log_callback:
-                        log_callback("图片比例正常，无需分割")
-                    return [img.copy()]  # 返回副本避免原图被修改
-                    
-            # 自定义模式：根据目标尺寸判断
+            yield doc
+        finally:
+            if self.keep_documents and len(self.open_documents) < KEEP_OPEN_DOCUMENTS:
+                self.open_documents[file_path] = doc
             else:
-                if 'target_width' not in config or 'target_height' not in config:
-                    if log_callback:
-                        log_callback("错误：自定义模式需要指定目标尺寸")
-                    raise ValueError("自定义模式需要指定目标尺寸")
-                    
-                target_width = config['target_width']
-                target_height = config['target_height']
-                
+                doc.close()
+
+    def _manifest_settings(self, dpi: int, output_format: str, split_config: Dict,
+                           render_config: Dict) -> Dict:
+        """影响输出结果的渲染设置，任一项变化时已有输出视为过期"""
+        settings = {
+            'dpi': dpi,
+            'format': output_format.lower(),
+            'split': None,
+            'extract_images': bool(render_config.get('extract_images')),
+            'colorspace': render_config.get('colorspace', 'auto'),
+            'tiling': render_config.get('tiling'),
+            'encoder': EncoderProfile.from_config(render_config.get('encoder')).to_dict()
+        }
+        if split_config.get('fused_split'):
+            settings['split'] = {
+                key: split_config.get(key)
+                for key in ('mode', 'split_ratio', 'target_width', 'target_height',
+                            'size_tolerance', 'rotate_bottom', 'first_page_no_rotate', 'gutter')
+            }
+        return settings
+
+    def _prepare_jobs(self, files_to_process: List[str], outputs: List[Tuple[str, int, str]],
+                      split_config: Dict, render_config: Dict, resume: bool,
+                      log_callback: Callable = None, archive: bool = False) -> List[DocumentJob]:
+        """
+        为每个可渲染的PDF创建导出任务，只包含页面选择选中的页面，续传模式下过滤掉已完成的页面
+        
+        多个输出目标时，任一目标未完成的页面都会重新渲染（各目标在同一次解析中输出）。
+        
+        Args:
+            files_to_process: 需要处理的PDF文件列表
+            outputs: [(主输出目录, DPI, 输出格式), ...]
+            split_config: 图片分割配置
+            render_config: 渲染配置
+            resume: 是否续传
+            log_callback: 日志回调函数
+            archive: 是否输出到压缩包（不创建输出目录，所有页面都需要渲染）
+            
+        Returns:
+            导出任务列表
+        """
+        selection = PageSelection(render_config.get('pages'))
+        jobs = []
+        for file_path in files_to_process:
+            if not os.path.exists(file_path):
                 if log_callback:
-                    log_callback(f"使用自定义模式，目标尺寸: {target_width}x{target_height}")
+                    log_callback(f"文件不存在: {file_path}")
+                continue
                 
-                # 计算当前图片与目标尺寸的比例
-                width_ratio = width / target_width
-                height_ratio = height / target_height
+            info = self.catalog.get(file_path)
+            if not self._check_document(info, log_callback):
+                continue
                 
-                # 允许的误差范围
-                tolerance = config.get('size_tolerance', 0.1)  # 10%的误差
+            # 为当前PDF创建各输出目标的子目录
+            job = DocumentJob(file_path, info, outputs, archive)
+            all_pages = selection.select(info.page_count)
+            pending = set() if job.manifests else set(all_pages)
+            for target, manifest in zip(job.targets, job.manifests):
+                os.makedirs(target.output_dir, exist_ok=True)
+                settings = self._manifest_settings(
+                    target.dpi, target.output_format, split_config, render_config
+                )
+                if manifest.prepare(info.fingerprint, settings, resume):
+                    pending.update(manifest.pending_pages(all_pages))
+                else:
+                    pending.update(all_pages)
+            job.page_numbers = sorted(pending)
+            job.skipped_pages = len(all_pages) - len(job.page_numbers)
+            
+            if resume and job.skipped_pages and log_callback:
+                log_callback(f"续传: {job.pdf_name} 已完成 {job.skipped_pages} 页，"
+                             f"剩余 {len(job.page_numbers)} 页")
+            jobs.append(job)
+        return jobs
+
+    def _process_files_serial(self, jobs: List[DocumentJob], split_config: Dict, render_config: Dict,
+                              progress: PageProgress, log_callback: Callable = None,
+                              sink: ArchiveSink = None):
+        """
+        在当前线程渲染，编码和写入交给导出流水线
+        
+        Args:
+            jobs: 导出任务列表
+            split_config: 图片分割配置
+            render_config: 渲染配置
+            progress: 进度汇总
+            log_callback: 日志回调函数
+            sink: 压缩包写入端，为None时写入磁盘文件
+        """
+        # 一页可能对应多个输出（分割模式），所有部分都写入或失败后才计为完成：
+        # (文件路径, 页码) -> [已写入的文件, 已结束的部分数, 是否有部分失败]
+        page_parts = {}
+        # 编码线程报告失败、写线程报告完成，两者同时更新page_parts
+        parts_lock = threading.Lock()
+        # 本次处理的内存预约，停止时统一归还
+        reservations = []
+        
+        def finish_part(task: ExportTask, failed: bool):
+            job, page_num, part_count, reservation = task.tag
+            key = (job.file_path, page_num)
+            with parts_lock:
+                state = page_parts.setdefault(key, [[], 0, False])
+                if failed:
+                    state[2] = True
+                else:
+                    state[0].append(task.output_path)
+                state[1] += 1
+                if state[1] < part_count:
+                    return
+                del page_parts[key]
+            reservation.release()
+            if state[2]:
+                # 有部分失败的页面不记入清单，续传时重新渲染
+                progress.page_failed(job, page_num)
+            else:
+                progress.page_done(job, page_num, state[0])
+        
+        def on_written(task: ExportTask):
+            finish_part(task, failed=False)
                 
-                if abs(1 - width_ratio) <= tolerance and abs(1 - height_ratio) <= tolerance:
-                    if log_callback:
-                        log_callback("图片符合目标尺寸，进行竖向分割")
-                    # 符合目标尺寸，竖向分割
-                    mid = height // 2
-                    top = img.crop((0, 0, width, mid))
-                    bottom = img.crop((0, mid, width, height))
-                    
-                    # 处理下半部分旋转
-                    should_rotate = config.get('rotate_bottom', False)
-                    is_first_no_rotate = is_first_page and config.get('first_page_no_rotate', True)
-                    
-                    if should_rotate and not is_first_no_rotate:
+        def on_error(task: ExportTask, error: Exception):
+            if log_callback:
+                log_callback(f"处理页面时发生错误: {str(error)}")
+            finish_part(task, failed=True)
+        
+        profile = EncoderProfile.from_config(render_config.get('encoder'))
+        try:
+            with ExportPipeline(self.pause_event, self.stop_event, on_written=on_written,
+                                on_error=on_error, profile=profile, sink=sink) as pipeline:
+                for job in jobs:
+                    if self._is_stopped():
+                        break
+                        
+                    try:
+                        self._render_document(
+                            pipeline, job, split_config, render_config, reservations, log_callback, sink
+                        )
+                    except Exception as e:
                         if log_callback:
-                            log_callback("旋转下半部分180度")
-                        bottom = bottom.rotate(180)
-                    
-                    if log_callback:
-                        log_callback(f"分割完成：上部 {width}x{mid}, 下部 {width}x{height-mid}")
-                    return [top, bottom]
-                else:
-                    if log_callback:
-                        log_callback("图片不符合目标尺寸，进行横向分割")
-                    # 不符合目标尺寸，横向分割
-                    mid = width // 2
-                    left = img.crop((0, 0, mid, height))
-                    right = img.crop((mid, 0, width, height))
-                    if log_callback:
-                        log_callback(f"分割完成：左侧 {mid}x{height}, 右侧 {width-mid}x{height}")
-                    return [left, right]
-                    
-        except Exception as e:
+                            log_callback(f"处理文件时发生错误: {str(e)}")
+                        continue
+        finally:
+            for reservation in reservations:
+                reservation.release()
+
+    def _render_document(self, pipeline: ExportPipeline, job: DocumentJob,
+                         split_config: Dict = None, render_config: Dict = None, reservations: List[MemoryReservation] = None,
+                         log_callback: Callable = None, sink: ArchiveSink = None):
+        """
+        渲染一个PDF的待处理页面，并将结果提交到导出流水线
+        
+        每页渲染前按页面尺寸向内存调度器预约，页面的所有输出写入后归还。
+        启用长图拼接时，渲染结果在提交前按顺序追加到长图，PDF渲染完成后写出长图。
+        
+        Args:
+            pipeline: 导出流水线
+            job: 导出任务
+            split_config: 图片分割配置
+            render_config: 渲染配置
+            reservations: 收集内存预约，供调用方在停止时归还
+            log_callback: 日志回调函数
+            sink: 压缩包写入端（长图输出到压缩包时使用）
+        """
+        if reservations is None:
+            reservations = []
+        if not job.page_numbers:
+            return
+            
+        if log_callback:
+            log_callback(f"处理PDF: {job.pdf_name}")
+            for target in job.targets:
+                log_callback(f"输出目录: {target.output_dir}")
+        
+        stitchers = _create_stitchers(job.targets, render_config)
+        try:
+            with self._open_document(job.file_path) as doc:
+                for page_num in job.page_numbers:
+                    if self._is_stopped():
+                        return
+                        
+                    # 使用pause_event等待而不是循环检查
+                    self.pause_event.wait()
+                    if self._is_stopped():
+                        return
+                        
+                    reservation = self._reserve_pages(job, [page_num], render_config, log_callback)
+                    if reservation is None:
+                        return
+                    reservations.append(reservation)
+                        
+                    try:
+                        outputs = _render_page_outputs(
+                            doc, page_num, job.targets, split_config, render_config
+                        )
+                        _stitch_outputs(stitchers, outputs)
+                    except Exception as e:
+                        reservation.release()
+                        if log_callback:
+                            log_callback(f"处理页面时发生错误: {str(e)}")
+                        continue
+                        
+                    for output_file, payload, output_format in outputs:
+                        task = ExportTask(payload, output_file, output_format,
+                                          tag=(job, page_num, len(outputs), reservation))
+                        if not pipeline.submit(task):
+                            return
+                            
+            for stitcher in stitchers.values():
+                self._write_long_images(stitcher.close(), sink, log_callback)
+        finally:
+            # 停止或出错时放弃未完成的长图
+            for stitcher in stitchers.values():
+                stitcher.abort()
+
+    def _write_long_images(self, outputs: List[Tuple[str, object, str]], sink: ArchiveSink = None,
+                           log_callback: Callable = None):
+        """写出拼接完成的长图（PNG已流式写入磁盘，输出到压缩包时写入压缩包）"""
+        for output_file, payload, _ in outputs:
+            if isinstance(payload, bytes):
+                sink.write(output_file, payload)
+            if log_callback:
+                log_callback(f"长图: {os.path.basename(output_file)}")
+
+    def _estimate_pages(self, job: DocumentJob, page_numbers: List[int],
+                        render_config: Dict = None) -> Tuple[int, int]:
+        """
+        由预扫描得到的页面尺寸估算渲染一组页面的峰值内存
+        
+        同一进程中的页面逐页渲染，因此取其中最大的一页；
+        一页的各输出目标同时在途，因此按目标累加；
+        分块渲染的页面只按一个横条估算。
+        
+        Returns:
+            (估算字节数, 最大单张图片的像素数)
+        """
+        tiling = (render_config or {}).get('tiling')
+        nbytes, pixels = 0, 0
+        for page_num in page_numbers:
+            width_pt, height_pt = job.info.page_sizes[page_num]
+            page_bytes = 0
+            for target in job.targets:
+                target_height = height_pt
+                if needs_tiling(estimate_pixels(width_pt, height_pt, target.dpi), tiling):
+                    target_height = min(height_pt, tile_size(tiling) * 72 / target.dpi)
+                page_bytes += estimate_page_bytes(width_pt, target_height, target.dpi)
+                pixels = max(pixels, estimate_pixels(width_pt, target_height, target.dpi))
+            nbytes = max(nbytes, page_bytes)
+        return nbytes, pixels
+
+    def _reserve_pages(self, job: DocumentJob, page_numbers: List[int], render_config: Dict = None,
+                       log_callback: Callable = None, block: bool = True) -> Optional[MemoryReservation]:
+        """
+        向内存调度器预约一组页面的内存
+        
+        Args:
+            job: 导出任务
+            page_numbers: 页码列表
+            render_config: 渲染配置
+            log_callback: 日志回调函数
+            block: 预算不足时是否等待
+            
+        Returns:
+            内存预约；不等待且无法放行，或等待期间被停止时返回None
+        """
+        nbytes, pixels = self._estimate_pages(job, page_numbers, render_config)
+        if not block:
+            return self.governor.try_acquire(nbytes, pixels)
+        if self.governor.is_oversize(nbytes, pixels) and log_callback:
+            log_callback(f"页面过大（约 {nbytes // (1024 * 1024)} MB），等待其他任务完成后单独渲染")
+        return self.governor.acquire(nbytes, pixels, self.stop_event)
+
+    def _is_stopped(self) -> bool:
+        """是否已请求停止（兼容stop()和直接设置stop_event两种方式）"""
+        return self.stopped or self.stop_event.is_set()
+
+    def _check_document(self, info: Optional[DocumentInfo], log_callback: Callable = None) -> bool:
+        """检查预扫描结果，返回文档是否可以渲染"""
+        if info is None:
+            return False
+        if info.error:
             if log_callback:
-                log_callback(f"错误：图片分割失败: {str(e)}")
-            raise ValueError(f"图片分割失败: {str(e)}")
+                log_callback(f"处理文件时发生错误: {info.error}")
+            return False
+        if info.needs_pass:
+            if log_callback:
+                log_callback(f"PDF已加密，跳过: {os.path.basename(info.path)}")
+            return False
+        return True
+
+    def _process_files_parallel(self, jobs: List[DocumentJob], split_config: Dict, render_config: Dict,
+                                workers: int, progress: PageProgress, log_callback: Callable = None,
+                                sink: ArchiveSink = None):
+        """
+        使用进程池并行渲染PDF页面
+        
+        每个PDF按页码范围切分为若干分片，分片被分发到不同的子进程，
+        子进程各自打开fitz文档进行渲染。主线程负责按暂停/停止状态
+        控制分片的提交，并汇总进度。
+        
+        Args:
+            jobs: 导出任务列表
+            split_config: 图片分割配置
+            render_config: 渲染配置
+            workers: 进程数
+            progress: 进度汇总
+            log_callback: 日志回调函数
+            sink: 压缩包写入端，子进程返回的数据由主线程写入
+        """
+        shards = self._plan_shards(jobs, workers, render_config, log_callback)
+        
+        if log_callback:
+            log_callback(f"并行渲染: {workers} 个进程, {len(shards)} 个分片")
+        
+        # 限制同时在途的分片数量，保证暂停/停止能及时生效；
+        # 每个分片按其中最大页面的估算内存向调度器预约，预算不足时暂缓提交
+        max_in_flight = workers * 2
+        shard_iter = iter(shards)
+        next_shard = next(shard_iter, None)
+        pending = {}
+        
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    if self._is_stopped():
+                        for future in pending:
+                            future.cancel()
+                        return
+                        
+                    if self.pause_event.is_set():
+                        # 补充分片直到达到在途上限或内存预算
+                        while len(pending) < max_in_flight and next_shard is not None:
+                            job, page_numbers = next_shard
+                            # 没有在途分片时阻塞等待（预算被其他处理占用，或分片需要独占运行）
+                            reservation = self._reserve_pages(
+                                job, page_numbers, render_config, log_callback, block=not pending
+                            )
+                            if reservation is None:
+                                break
+                            future = executor.submit(
+                                _render_shard, job.file_path, page_numbers,
+                                job.targets, split_config, render_config
+                            )
+                            pending[future] = (job, reservation)
+                            next_shard = next(shard_iter, None)
+                    elif not pending:
+                        # 暂停状态下不再提交新分片，等待恢复
+                        self.pause_event.wait()
+                        continue
+                        
+                    if not pending:
+                        if next_shard is None:
+                            break
+                        continue
+                        
+                    done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job, reservation = pending.pop(future)
+                        reservation.release()
+                        try:
+                            results = future.result()
+                        except Exception as e:
+                            if log_callback:
+                                log_callback(f"处理文件时发生错误: {str(e)}")
+                            continue
+                        
+                        for page_num, error, output_files, archived in results:
+                            if error:
+                                if log_callback:
+                                    log_callback(f"处理页面时发生错误: {error}")
+                                continue
+                            try:
+                                for output_file, data in archived:
+                                    sink.write(output_file, data)
+                            except Exception as e:
+                                if log_callback:
+                                    log_callback(f"处理页面时发生错误: {str(e)}")
+                                continue
+                            if page_num is None:
+                                # 子进程拼接的长图
+                                if log_callback:
+                                    for output_file in output_files:
+                                        log_callback(f"长图: {os.path.basename(output_file)}")
+                                continue
+                            progress.page_done(job, page_num, output_files)
+        finally:
+            for job, reservation in pending.values():
+                reservation.release()
+
+    def _plan_shards(self, jobs: List[DocumentJob], workers: int, render_config: Dict,
+                     log_callback: Callable = None) -> List[Tuple[DocumentJob, List[int]]]:
+        """
+        根据待渲染页面生成分片，并排定提交顺序
+        
+        largest_first时按预扫描的页面尺寸估算每个PDF的渲染量（各输出目标的像素数之和），
+        渲染量大的PDF先提交，避免列表末尾的大文件在其他进程空闲时才开始渲染；
+        同一PDF的分片保持页码顺序。first_pages时每个PDF的首页单独作为一个分片，
+        按文件顺序排在最前面，便于尽早检查输出；拼接长图时每个PDF只有一个分片，不拆出首页。
+        
+        Returns:
+            [(导出任务, 页码列表), ...]，按提交顺序排列
+        """
+        schedule = render_config.get('schedule') or {}
+        stitch = bool(render_config.get('stitch'))
+        first_pages = schedule.get('first_pages', False) and not stitch
+        
+        first_shards = []
+        job_shards = []
+        for job in jobs:
+            if not job.page_numbers:
+                continue
+                
+            if log_callback:
+                log_callback(f"处理PDF: {job.pdf_name}")
+                for target in job.targets:
+                    log_callback(f"输出目录: {target.output_dir}")
+            
+            page_numbers = job.page_numbers
+            if first_pages:
+                first_shards.append((job, page_numbers[:1]))
+                page_numbers = page_numbers[1:]
+            shards = []
+            if page_numbers:
+                shard_size = max(1, min(self.MAX_SHARD_PAGES, math.ceil(len(page_numbers) / workers)))
+                if stitch:
+                    # 长图按顺序拼接整个PDF，每个PDF作为一个分片
+                    shard_size = len(page_numbers)
+                for start in range(0, len(page_numbers), shard_size):
+                    shards.append((job, page_numbers[start:start + shard_size]))
+            job_shards.append((self._render_cost(job), shards))
+        
+        if schedule.get('largest_first', True):
+            # 稳定排序，渲染量相同的PDF保持列表顺序
+            job_shards.sort(key=lambda item: item[0], reverse=True)
+            if log_callback and len(job_shards) > 1:
+                log_callback("调度: 渲染量大的PDF优先")
+        if first_shards and log_callback:
+            log_callback(f"调度: 优先渲染 {len(first_shards)} 个PDF的首页")
+        return first_shards + [shard for _, shards in job_shards for shard in shards]
+
+    def _render_cost(self, job: DocumentJob) -> int:
+        """估算一个PDF待渲染页面的渲染量（各输出目标的像素数之和）"""
+        cost = 0
+        for page_num in job.page_numbers:
+            width_pt, height_pt = job.info.page_sizes[page_num]
+            cost += sum(estimate_pixels(width_pt, height_pt, target.dpi) for target in job.targets)
+        return cost
+
+    def split_image(self, img: Image.Image, is_first_page: bool, config: Dict, log_callback: Callable = None) -> List[Image.Image]:
+        """
+        根据配置分割图片
+        
+        Args:
+            img: 原始图片
+            is_first_page: 是否是PDF的第一页
+            config: 分割��置
+            log_callback: 日志回调函数
+            
+        Returns:
+            分割后的图片列表
+        """
+        return split_page_image(img, is_first_page, config, log_callback)
 
     def split_images(self, files: List[str], split_config: Dict,
                     output_location: str, custom_output_path: str = None,
                     output_folder_name: str = None,
-                    progress_callback: Callable = None, log_callback: Callable = None):
+                    progress_callback: Callable = None, log_callback: Callable = None,
+                    output_format: str = 'PNG', encoder_config: Dict = None,
+                    archive_config: Dict = None, stitch_config: Dict = None,
+                    dry_run: bool = False):
         """
         批量分割图片
         
+        先只读取文件头规划所有文件的分割方案（方向、裁剪框、旋转和输出文件名），
+        再按方案解码和编码；不需要分割且已是输出格式的文件直接复制，不解码。
+        
         Args:
             files: 要处理的图片文件列表
             split_config: 分割配置
-            output_location: 输出位置
+            output_location: 输出位置 ('原位置'、'自定义位置' 或 '压缩包')；'压缩包' 时
+                             每个输出目录改为同名压缩包，位于自定义输出路径（未指定时为原位置）下
             custom_output_path: 自定义输出路径
             output_folder_name: 输出文件夹名称
             progress_callback: 进度回调
             log_callback: 日志回调
+            output_format: 输出格式 ('PNG'、'JPG' 或 'WEBP')
+            encoder_config: 编码配置，见EncoderProfile.from_config
+            archive_config: 压缩包配置，见ArchiveSink
+            stitch_config: 长图配置，每个输出目录的分割结果按顺序拼接为长图，见LongImageWriter
+            dry_run: 只输出分割方案的预览报告，不解码、不写入
         """
+        sink = None
+        stitchers: Dict[str, LongImageWriter] = {}  # 输出目录 -> 长图拼接器
         try:
+            profile = EncoderProfile.from_config(encoder_config)
+            if output_location == ARCHIVE_LOCATION:
+                sink = ArchiveSink(archive_config)
+                if not custom_output_path:
+                    output_location = "原位置"
+            
             # 首先显示输出目录信息
             if output_location == "原位置":
                 if log_callback:
@@ -315,82 +1468,112 @@ class PDFProcessor:
             total_files = len(files)
             processed_files = 0
             
+            # 规划：只读取文件头，确定每个文件的输出目录和分割方案
+            common_prefix = os.path.commonpath([os.path.dirname(f) for f in files])
+            entries = []
             for file_index, file_path in enumerate(files):
+                if not os.path.exists(file_path):
+                    if log_callback:
+                        log_callback(f"文件不存在: {file_path}")
+                    continue
+                if output_location == "原位置":
+                    output_dir = os.path.join(os.path.dirname(file_path), output_folder_name or "split_output")
+                else:
+                    # 获取相对路径
+                    rel_path = os.path.relpath(os.path.dirname(file_path), common_prefix)
+                    output_dir = os.path.join(custom_output_path, rel_path, output_folder_name or "split_output")
+                # 判断是否为首页
+                entries.append((file_path, output_dir, file_index == 0))
+            plans = plan_files(entries, lambda width, height, is_first_page: plan_split(
+                width, height, is_first_page, split_config), output_format,
+                lossless_jpeg=split_config.get('lossless_jpeg', False),
+                snap_tolerance=split_config.get('snap_tolerance', DEFAULT_SNAP_TOLERANCE),
+                gutter=GutterFinder.from_config(split_config.get('gutter')),
+                stop_event=self.stop_event, pause_event=self.pause_event)
+            if self.stop_event.is_set():
+                if log_callback:
+                    log_callback("处理已停止")
+                return
+            
+            if dry_run:
+                if log_callback:
+                    log_callback("预览分割方案（不写入文件）:")
+                    for line in format_plan_report(plans):
+                        log_callback(line)
+                return
+            
+            for plan in plans:
                 if self.stop_event.is_set():
                     if log_callback:
                         log_callback("处理已停止")
                     return
-                    
-                if not os.path.exists(file_path):
+                
+                if log_callback:
+                    log_callback(f"\n正在处理: {plan.name}")
+                if plan.error:
                     if log_callback:
-                        log_callback(f"文件不存在: {file_path}")
+                        log_callback(f"处理文件时发生错误: {plan.error}")
                     continue
+                
+                # 按文件头估算内存，预算不足时等待
+                reservation = self.governor.acquire(*plan.estimate_memory(), self.stop_event)
+                if reservation is None:
+                    if log_callback:
+                        log_callback("处理已停止")
+                    return
                     
                 try:
-                    # 使用with语句安全打开图片
-                    with Image.open(file_path) as img:
+                    with reservation:
                         if log_callback:
-                            log_callback(f"\n正在处理: {os.path.basename(file_path)}")
-                            log_callback(f"图片信息: 大小={img.size}, 格式={img.format}")
+                            log_callback(f"图片信息: 大小={plan.size}, 格式={plan.format}")
                             
-                        # 确定输出目录
-                        if output_location == "原位置":
-                            # ��取相对路径
-                            common_prefix = os.path.commonpath([os.path.dirname(f) for f in files])
-                            rel_path = os.path.relpath(os.path.dirname(file_path), common_prefix)
-                            output_dir = os.path.join(os.path.dirname(file_path), output_folder_name or "split_output")
-                        else:
-                            # 获取相对路径
-                            common_prefix = os.path.commonpath([os.path.dirname(f) for f in files])
-                            rel_path = os.path.relpath(os.path.dirname(file_path), common_prefix)
-                            output_dir = os.path.join(custom_output_path, rel_path, output_folder_name or "split_output")
-                        
-                        # 创建输出目录
-                        os.makedirs(output_dir, exist_ok=True)
+                        # 创建输出目录（输出到压缩包时不创建）
+                        if sink is None:
+                            os.makedirs(plan.output_dir, exist_ok=True)
                         
                         if log_callback:
-                            log_callback(f"输出目录: {output_dir}")
-                        
-                        # 判断是否为首页
-                        is_first_page = file_index == 0
-                        if log_callback and is_first_page:
-                            log_callback("这是首页，底部不会旋转")
+                            if sink is None:
+                                log_callback(f"输出目录: {plan.output_dir}")
+                            else:
+                                log_callback(f"输出压缩包: {sink.archive_path(plan.output_dir)}")
+                            if plan.is_first_page:
+                                log_callback("这是首页，底部不会旋转")
+                            log_callback(f"分割结果: {plan.direction}，将分割为 {len(plan.parts)} 个图片")
                         
-                        try:
-                            split_images = self.split_image(img, is_first_page, split_config, log_callback)
+                        # 按分割方案裁剪并保存
+                        outputs, parts = execute_plan(
+                            plan, output_format, profile, sink is not None, bool(stitch_config)
+                        )
+                        for output_path, data in outputs:
+                            if sink is not None:
+                                sink.write(output_path, data)
                             if log_callback:
-                                log_callback(f"分割结果: 将分割为 {len(split_images)} 个图片")
-                            
-                            # 保存分割后的图片
-                            base_name = os.path.splitext(os.path.basename(file_path))[0]
-                            for i, split_img in enumerate(split_images):
-                                output_path = os.path.join(
-                                    output_dir,
-                                    f"{base_name}_split_{i + 1}.{split_img.format or 'PNG'}"
+                                log_callback(f"已保存: {os.path.basename(output_path)}")
+                        if stitch_config:
+                            if plan.output_dir not in stitchers:
+                                stitchers[plan.output_dir] = LongImageWriter(
+                                    plan.output_dir, stitch_config, profile, sink is not None
                                 )
-                                split_img.save(output_path)
-                                if log_callback:
-                                    log_callback(f"已保存: {os.path.basename(output_path)}")
-                            
-                            processed_files += 1
-                            if progress_callback:
-                                progress = (processed_files / total_files) * 100
-                                progress_callback(int(progress))
-                                
-                        except Exception as e:
-                            if log_callback:
-                                log_callback(f"分割图片时发生错误: {str(e)}")
-                            continue
+                            for part in parts:
+                                stitchers[plan.output_dir].add(part)
+                        
+                        processed_files += 1
+                        if progress_callback:
+                            progress = (processed_files / total_files) * 100
+                            progress_callback(int(progress))
                         
                 except Exception as e:
                     if log_callback:
-                        log_callback(f"处理文件时发生错误: {str(e)}")
+                        log_callback(f"分割图片时发生错误: {str(e)}")
                     continue
                     
                 if log_callback:
                     log_callback(f"处理进度: {processed_files}/{total_files}")
                     log_callback("-" * 30)
             
+            for stitcher in stitchers.values():
+                self._write_long_images(stitcher.close(), sink, log_callback)
+            
             if progress_callback:
                 progress_callback(100)
             if log_callback:
@@ -402,6 +1585,10 @@ class PDFProcessor:
                 log_callback(f"处理过程发生错误: {str(e)}")
             
         finally:
+            for stitcher in stitchers.values():
+                stitcher.abort()
+            if sink is not None:
+                sink.close()
             self.processing = False
             self.pause_event.set()
             self.stop_event.clear()
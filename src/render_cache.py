@@ -0,0 +1,239 @@
+import os
+import re
+import zlib
+import hashlib
+import tempfile
+import threading
+import fitz
+from PIL import Image
+from typing import Dict, Optional, Tuple
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "caomei_render_cache")
+
+# 默认缓存容量上限
+DEFAULT_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+
+# 超出上限后淘汰到容量的多少比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+
+# 缓存文件扩展名
+CACHE_SUFFIX = ".raster"
+
+# 对象中的间接引用 "12 0 R"
+_REF_PATTERN = re.compile(r"(\d+) \d+ R")
+
+# 计算内容哈希时忽略的反向引用（指向页面树/所属页面，与页面内容无关）
+_BACKREF_PATTERN = re.compile(r"/(Parent|P)\s+\d+ \d+ R")
+
+
+class RenderCache:
+    """
+    基于内容寻址的磁盘渲染缓存
+
+    缓存键由页面内容流、引用的资源（字体、图片、XObject等）、页面尺寸/旋转、
+    渲染DPI和颜色模式计算，与文件名和页码无关；同一页面以不同的分割或编码设置
+    重新导出时可以跳过栅格化。栅格数据以zlib压缩后保存，超过容量上限时按最近
+    使用时间（文件修改时间，命中时刷新）淘汰。多个进程可以共用同一个目录。
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 容量上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # 共享资源（字体、图片等）的流摘要，避免每页重复读取：(文件, xref) -> 摘要
+        self.stream_digests: Dict[Tuple[str, int], bytes] = {}
+        self.file_stamps: Dict[str, Tuple[int, int]] = {}  # 文件 -> (大小, 修改时间)，文件变化时丢弃流摘要
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = self._scan_size()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_SUFFIX):
+                try:
+                    total += entry.stat().st_size
+                except OSError:
+                    pass
+        return total
+
+    def _check_file_stamp(self, file_path: str):
+        """源文件被修改后丢弃该文件的流摘要"""
+        try:
+            stat = os.stat(file_path)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            stamp = None
+        if stamp is None or self.file_stamps.get(file_path) != stamp:
+            self.stream_digests = {
+                key: digest for key, digest in self.stream_digests.items() if key[0] != file_path
+            }
+            if stamp is not None:
+                self.file_stamps[file_path] = stamp
+
+    def _stream_digest(self, doc: fitz.Document, xref: int) -> bytes:
+        key = (doc.name, xref)
+        digest = self.stream_digests.get(key)
+        if digest is None:
+            digest = hashlib.sha1(doc.xref_stream_raw(xref)).digest()
+            self.stream_digests[key] = digest
+        return digest
+
+    def page_digest(self, page: fitz.Page) -> str:
+        """
+        计算页面内容摘要
+
+        从页面对象出发遍历所有间接引用的对象（跳过/Parent等反向引用），
+        对象定义和流数据都计入摘要；从页面树继承的资源同样计入。
+
+        Args:
+            page: PDF页面
+
+        Returns:
+            十六进制摘要
+        """
+        doc = page.parent
+        self._check_file_stamp(doc.name)
+        sha1 = hashlib.sha1()
+        sha1.update(f"{tuple(page.rect)}:{tuple(page.cropbox)}:{page.rotation}".encode())
+
+        stack = [page.xref]
+        # 页面没有自己的/Resources时使用页面树上继承的资源
+        xref = page.xref
+        while True:
+            value_type, value = doc.xref_get_key(xref, "Parent")
+            if value_type != "xref":
+                break
+            xref = int(value.split()[0])
+            value_type, value = doc.xref_get_key(xref, "Resources")
+            if value_type != "null":
+                sha1.update(value.encode())
+                stack.extend(int(ref) for ref in _REF_PATTERN.findall(value))
+
+        seen = set()
+        while stack:
+            xref = stack.pop()
+            if xref in seen or xref <= 0:
+                continue
+            seen.add(xref)
+            obj = _BACKREF_PATTERN.sub("", doc.xref_object(xref, compressed=True))
+            sha1.update(obj.encode())
+            if doc.xref_is_stream(xref):
+                sha1.update(self._stream_digest(doc, xref))
+            stack.extend(int(ref) for ref in _REF_PATTERN.findall(obj))
+        return sha1.hexdigest()
+
+    @staticmethod
+    def make_key(page_digest: str, dpi: int, colorspace: str) -> str:
+        """由页面摘要和渲染设置生成缓存键"""
+        return hashlib.sha1(f"{page_digest}:{dpi}:{colorspace}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """
+        读取缓存的栅格
+
+        Returns:
+            缓存的图片，未命中或缓存文件损坏时返回None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = f.readline().decode().split()
+                data = zlib.decompress(f.read())
+            mode, width, height = header[0], int(header[1]), int(header[2])
+            img = Image.frombytes(mode, (width, height), data)
+        except (OSError, ValueError, IndexError, zlib.error):
+            return None
+        try:
+            os.utime(path)  # 刷新最近使用时间
+        except OSError:
+            pass
+        return img
+
+    def put(self, key: str, img: Image.Image):
+        """
+        写入栅格（先写临时文件再替换，其他进程不会读到写了一半的文件）
+
+        Args:
+            key: 缓存键
+            img: 渲染得到的图片
+        """
+        header = f"{img.mode} {img.width} {img.height}\n".encode()
+        data = header + zlib.compress(img.tobytes(), 1)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        with self.lock:
+            self.total_bytes += len(data)
+            over_limit = self.total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        """按最近使用时间淘汰缓存文件，直到低于容量上限的90%"""
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * EVICT_TARGET_RATIO
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+            self.total_bytes = total
+
+
+# 每个进程内按目录复用的缓存实例（进程池子进程各自创建）
+_caches: Dict[str, RenderCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_render_cache(cache_config: Dict = None) -> Optional[RenderCache]:
+    """
+    获取渲染缓存实例
+
+    Args:
+        cache_config: {'dir': 缓存目录, 'max_bytes': 容量上限}，为None时不使用缓存
+
+    Returns:
+        缓存实例，未启用时返回None
+    """
+    if not cache_config:
+        return None
+    cache_dir = cache_config.get('dir') or DEFAULT_CACHE_DIR
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = RenderCache(cache_dir, cache_config.get('max_bytes', DEFAULT_CACHE_SIZE))
+            _caches[cache_dir] = cache
+        else:
+            cache.max_bytes = cache_config.get('max_bytes', cache.max_bytes)
+        return cache
@@ -0,0 +1,176 @@
+import os
+import queue
+import threading
+from typing import Callable, Optional, Any
+from encoder_profiles import EncoderProfile
+
+
+class WrittenOutput:
+    """渲染阶段已直接写入磁盘的输出（如分块流式写出的超大页面），流水线只登记完成"""
+
+
+def encode_output(payload, output_format: str, profile: EncoderProfile = None) -> Optional[bytes]:
+    """
+    编码输出内容，已经是编码数据（如直接提取的原图）时原样返回
+
+    Args:
+        payload: 图片、已编码的数据或WrittenOutput
+        output_format: 输出格式
+        profile: 编码配置，为None时使用默认预设
+
+    Returns:
+        编码后的字节数据，已写入磁盘的输出返回None
+    """
+    if isinstance(payload, WrittenOutput):
+        return None
+    if isinstance(payload, bytes):
+        return payload
+    return (profile or EncoderProfile()).encode(payload, output_format)
+
+
+def write_file(output_path: str, data: Optional[bytes]):
+    """将编码后的数据写入磁盘，data为None（已写入）时跳过"""
+    if data is None:
+        return
+    with open(output_path, 'wb') as f:
+        f.write(data)
+
+
+class ExportTask:
+    """流水线中的单个输出任务"""
+    def __init__(self, image, output_path: str, output_format: str, tag: Any = None):
+        self.image = image  # 待编码的图片，或已编码的数据 (bytes)
+        self.output_path = output_path
+        self.output_format = output_format
+        self.tag = tag  # 调用方自定义标识，写入完成后原样传回回调
+        self.data: Optional[bytes] = None
+
+
+class ExportPipeline:
+    """
+    渲染 → 编码 → 写入 三段式流水线
+
+    渲染在调用线程中进行，通过submit()提交图片；编码在线程池中执行
+    （Pillow/zlib编码时会释放GIL）；写入由单独的写线程完成。
+    各阶段之间使用有界队列连接，下游变慢时submit()会阻塞，形成背压。
+    暂停/停止通过调用方传入的pause_event/stop_event控制。
+    """
+    def __init__(self, pause_event: threading.Event, stop_event: threading.Event,
+                 encode_workers: int = None, queue_size: int = None,
+                 on_written: Callable = None, on_error: Callable = None,
+                 profile: EncoderProfile = None, sink=None):
+        """
+        Args:
+            pause_event: 暂停事件（清除时暂停）
+            stop_event: 停止事件（设置时停止）
+            encode_workers: 编码线程数，默认为CPU核心数（最多4个）
+            queue_size: 每个队列的容量，默认为编码线程数的2倍
+            on_written: 写入完成回调 on_written(task)，在写线程中调用
+            on_error: 出错回调 on_error(task, exception)
+            profile: 编码配置
+            sink: 写入端，提供write(output_path, data)（如ArchiveSink），默认写入磁盘文件
+        """
+        self.pause_event = pause_event
+        self.stop_event = stop_event
+        self.encode_workers = encode_workers or min(4, os.cpu_count() or 1)
+        queue_size = queue_size or self.encode_workers * 2
+        self.encode_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+        self.on_written = on_written
+        self.on_error = on_error
+        self.profile = profile or EncoderProfile()
+        self.write = sink.write if sink is not None else write_file
+        self.encoder_threads = []
+        self.writer_thread = None
+
+    def start(self):
+        """启动编码线程和写线程"""
+        for _ in range(self.encode_workers):
+            thread = threading.Thread(target=self._encode_worker, daemon=True)
+            thread.start()
+            self.encoder_threads.append(thread)
+        self.writer_thread = threading.Thread(target=self._write_worker, daemon=True)
+        self.writer_thread.start()
+
+    def submit(self, task: ExportTask) -> bool:
+        """
+        提交一个待编码的任务，队列已满时阻塞
+
+        Returns:
+            是否提交成功（已停止时返回False）
+        """
+        return self._put(self.encode_queue, task)
+
+    def close(self):
+        """等待所有已提交的任务写入完成后关闭流水线"""
+        for _ in self.encoder_threads:
+            self._put(self.encode_queue, None)
+        for thread in self.encoder_threads:
+            thread.join()
+        self._put(self.write_queue, None)
+        if self.writer_thread:
+            self.writer_thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """带停止检查的阻塞入队"""
+        while not self.stop_event.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue):
+        """带停止检查的阻塞出队，停止时返回None"""
+        while not self.stop_event.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _encode_worker(self):
+        """编码线程"""
+        while True:
+            task = self._get(self.encode_queue)
+            if task is None:
+                return
+            self.pause_event.wait()
+            if self.stop_event.is_set():
+                return
+            try:
+                task.data = encode_output(task.image, task.output_format, self.profile)
+                task.image = None  # 尽早释放像素内存
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(task, e)
+                continue
+            if not self._put(self.write_queue, task):
+                return
+
+    def _write_worker(self):
+        """写线程"""
+        while True:
+            task = self._get(self.write_queue)
+            if task is None:
+                return
+            self.pause_event.wait()
+            if self.stop_event.is_set():
+                return
+            try:
+                self.write(task.output_path, task.data)
+                task.data = None
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(task, e)
+                continue
+            if self.on_written:
+                self.on_written(task)
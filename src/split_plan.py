@@ -0,0 +1,372 @@
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from encoder_profiles import EncoderProfile, format_extension, normalize_format
+from memory_governor import WORKING_SET_FACTOR
+from jpeg_lossless import DEFAULT_SNAP_TOLERANCE, mcu_size, plan_lossless, transform_parts
+from gutter_detection import GutterFinder
+
+# 读取文件头的线程数（只读取少量字节，不解码像素）
+HEADER_READ_THREADS = 8
+
+# EXIF方向标签；带旋转标记的文件重新编码后方向会改变，不能直接复制
+EXIF_ORIENTATION = 0x0112
+
+# EXIF位于文件头、读取方向不需要解码像素的格式；PNG的getexif()会解码整幅图片
+_EXIF_HEADER_FORMATS = ('JPEG', 'MPO', 'TIFF', 'WEBP')
+
+# 可以按1/8比例解码灰度图、在规划阶段检测分割线的格式；其他格式在执行时用已解码的原图检测
+_DRAFT_FORMATS = ('JPEG', 'MPO')
+
+# 直接复制源文件时编码器不会改变的颜色模式
+_COPY_MODES = {
+    'jpeg': ("RGB", "L"),
+    'png': None,  # PNG保存时保持原有模式
+    'webp': ("RGB", "RGBA", "L"),
+}
+
+Box = Tuple[int, int, int, int]
+
+# 分割规划函数：(宽, 高, 是否为首页) -> [(裁剪框, 是否旋转180度), ...]
+SplitPlanner = Callable[[int, int, bool], List[Tuple[Box, bool]]]
+
+
+class FileSplitPlan:
+    """
+    一个文件的分割方案
+
+    由文件头得到的尺寸、格式和各部分的裁剪框、旋转、输出路径组成，
+    只包含基本类型，可以传给进程池子进程执行。
+    """
+    def __init__(self, file_path: str, output_dir: str, is_first_page: bool):
+        self.file_path = file_path
+        self.output_dir = output_dir
+        self.is_first_page = is_first_page
+        self.size: Optional[Tuple[int, int]] = None
+        self.format: Optional[str] = None  # 源文件格式（Pillow格式名）
+        self.mode: Optional[str] = None
+        self.orientation = 1  # EXIF方向
+        self.file_size = 0
+        self.parts: List[Tuple[Box, bool, str]] = []  # (裁剪框, 是否旋转180度, 输出路径)
+        self.lossless: List[bool] = []  # 各部分是否在压缩域中无损输出（JPEG无损分割）
+        self.cut_offset = 0  # 分割线相对规划位置（中线）的偏移（像素），来自分割线检测和MCU吸附
+        self.gutter: Optional[GutterFinder] = None  # 需要在执行时解码后检测分割线（非JPEG）
+        self.error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.file_path)
+
+    @property
+    def needs_split(self) -> bool:
+        return len(self.parts) > 1
+
+    @property
+    def direction(self) -> str:
+        """分割方向的显示文本"""
+        if not self.needs_split:
+            return "不分割"
+        (_, _, right, _), _, _ = self.parts[0]
+        return "左右分割" if right < self.size[0] else "上下分割"
+
+    def estimate_memory(self) -> Tuple[int, int]:
+        """由文件头估算解码所需内存，返回 (估算字节数, 像素数)，按解码后各通道一字节计算"""
+        if self.size is None:
+            return 0, 0
+        width, height = self.size
+        channels = Image.getmodebands(self.mode)
+        return width * height * channels * WORKING_SET_FACTOR, width * height
+
+    def can_copy(self, output_format: str, profile: EncoderProfile = None) -> bool:
+        """
+        是否可以直接复制源文件而不解码
+
+        不需要分割、源文件已是输出格式、颜色模式和方向不会被编码改变，
+        且不超过编码配置的大小上限时，重新编码只会损失质量。
+        """
+        if self.needs_split or self.orientation != 1 or not self.format:
+            return False
+        if self.format.lower() not in ('jpeg', 'png', 'webp'):
+            return False
+        fmt = normalize_format(output_format)
+        if normalize_format(self.format) != fmt:
+            return False
+        modes = _COPY_MODES[fmt]
+        if modes is not None and self.mode not in modes:
+            return False
+        if profile is not None and profile.max_bytes and self.file_size > profile.max_bytes:
+            return False
+        return True
+
+    def describe(self) -> str:
+        """预览报告中的一行"""
+        if self.error:
+            return f"{self.name}: 无法读取 - {self.error}"
+        width, height = self.size
+        text = f"{self.name}: {width}x{height} {self.direction}"
+        if self.cut_offset:
+            text += f"，分割线偏移 {self.cut_offset:+d} 像素"
+        elif self.gutter is not None:
+            text += "，分割线在解码后检测"
+        if any(rotate for _, rotate, _ in self.parts):
+            text += "，下半部分旋转180度"
+        if any(self.lossless):
+            text += "，无损" if all(self.lossless) else "，部分无损"
+        outputs = "、".join(os.path.basename(path) for _, _, path in self.parts)
+        return f"{text} -> {outputs}"
+
+
+def _read_orientation(img: Image.Image) -> int:
+    """只从文件头读取EXIF方向，不解码像素；其他格式只看打开时已读到的EXIF块，没有时视为1"""
+    if img.format in _EXIF_HEADER_FORMATS:
+        return img.getexif().get(EXIF_ORIENTATION, 1)
+    data = img.info.get('exif')  # 如PNG中位于图像数据之前的eXIf块
+    if not data:
+        return 1
+    exif = Image.Exif()
+    exif.load(data)
+    return exif.get(EXIF_ORIENTATION, 1)
+
+
+def _read_plan(plan: FileSplitPlan, planner: SplitPlanner, output_format: str,
+               lossless_jpeg: bool, snap_tolerance: int, gutter: Optional[GutterFinder]) -> FileSplitPlan:
+    try:
+        plan.file_size = os.path.getsize(plan.file_path)
+        with Image.open(plan.file_path) as img:
+            plan.size = img.size
+            plan.format = img.format
+            plan.mode = img.mode
+            plan.orientation = _read_orientation(img)
+            mcu = mcu_size(img)
+            planned = planner(*plan.size, plan.is_first_page)
+            boxes = planned
+            if gutter is not None and len(boxes) == 2:
+                if plan.format in _DRAFT_FORMATS:
+                    # 只解码缩小的灰度图检测分割线
+                    boxes = gutter.apply(boxes, *plan.size, gutter.sample(img))
+                else:
+                    # 规划阶段不解码像素，留到execute_plan解码原图后检测
+                    plan.gutter = gutter
+        flags = [False] * len(boxes)
+        if lossless_jpeg and len(boxes) > 1 and normalize_format(output_format) == 'jpeg':
+            boxes, flags = plan_lossless(boxes, plan.size, mcu, snap_tolerance)
+        base_name = os.path.splitext(plan.name)[0]
+        ext = format_extension(output_format)
+        plan.parts = [
+            (box, rotate, os.path.join(plan.output_dir, f"{base_name}_split_{i + 1}.{ext}"))
+            for i, (box, rotate) in enumerate(boxes)
+        ]
+        plan.lossless = flags
+        plan.cut_offset = _cut_offset(planned, boxes)
+    except Exception as e:
+        plan.error = str(e)
+    return plan
+
+
+def _cut_offset(planned: List[Tuple[Box, bool]], boxes: List[Tuple[Box, bool]]) -> int:
+    """两部分分割时分割线相对规划位置的偏移，第二部分的左边（左右分割）或上边（上下分割）即分割线"""
+    if len(boxes) != 2:
+        return 0
+    (left, upper, _, _), _ = boxes[1]
+    (planned_left, planned_upper, _, _), _ = planned[1]
+    return (left - planned_left) + (upper - planned_upper)
+
+
+def _apply_gutter(plan: FileSplitPlan, img: Image.Image):
+    """在已解码的原图上检测分割线并更新分割方案的裁剪框（规划阶段未检测的非JPEG文件）"""
+    planned = [(box, rotate) for box, rotate, _ in plan.parts]
+    boxes = plan.gutter.apply(planned, *plan.size, img)
+    plan.parts = [(box, rotate, path) for (box, rotate), (_, _, path) in zip(boxes, plan.parts)]
+    plan.cut_offset = _cut_offset(planned, boxes)
+    plan.gutter = None
+
+
+def plan_files(entries: List[Tuple[str, str, bool]], planner: SplitPlanner, output_format: str,
+               threads: int = HEADER_READ_THREADS, lossless_jpeg: bool = False,
+               snap_tolerance: int = DEFAULT_SNAP_TOLERANCE,
+               gutter: Optional[GutterFinder] = None,
+               stop_event: threading.Event = None,
+               pause_event: threading.Event = None) -> List[FileSplitPlan]:
+    """
+    只读取文件头，为一批文件生成分割方案
+
+    Args:
+        entries: [(文件路径, 输出目录, 是否为首页), ...]
+        planner: 分割规划函数
+        output_format: 输出格式（决定输出文件扩展名）
+        threads: 并行读取文件头的线程数
+        lossless_jpeg: JPEG输出为JPEG时，分割线吸附到MCU边界并用jpegtran在压缩域中无损分割
+        snap_tolerance: 分割线吸附到MCU边界的最大距离（像素）
+        gutter: 分割线检测，为None时分割线保持在规划位置；JPEG按1/8比例解码灰度图检测，
+                其他格式不在规划阶段解码，由execute_plan在解码原图后检测
+        stop_event: 停止事件，设置后不再读取剩余的文件
+        pause_event: 暂停事件，未设置时读取下一个文件前等待
+
+    Returns:
+        与entries顺序一致的分割方案；无法读取的文件error字段记录错误信息。
+        中途停止时只包含停止前已读取的前若干个文件，调用方应检查stop_event
+    """
+    def read(plan: FileSplitPlan) -> Optional[FileSplitPlan]:
+        if pause_event is not None:
+            pause_event.wait()
+        if stop_event is not None and stop_event.is_set():
+            return None
+        return _read_plan(plan, planner, output_format, lossless_jpeg, snap_tolerance, gutter)
+
+    plans = [FileSplitPlan(*entry) for entry in entries]
+    results = []
+    if threads > 1 and len(plans) > 1:
+        with ThreadPoolExecutor(max_workers=min(threads, len(plans))) as executor:
+            futures = [executor.submit(read, plan) for plan in plans]
+            try:
+                for future in futures:
+                    plan = future.result()
+                    if plan is None:
+                        break
+                    results.append(plan)
+            finally:
+                # 停止或出错时取消尚未开始的读取
+                for future in futures:
+                    future.cancel()
+        return results
+    for plan in plans:
+        plan = read(plan)
+        if plan is None:
+            break
+        results.append(plan)
+    return results
+
+
+def format_plan_report(plans: List[FileSplitPlan]) -> List[str]:
+    """
+    生成分割方案的预览报告
+
+    Returns:
+        报告的各行：每个文件一行，最后为汇总
+    """
+    lines = [plan.describe() for plan in plans]
+    counts = {}
+    for plan in plans:
+        key = "无法读取" if plan.error else plan.direction
+        counts[key] = counts.get(key, 0) + 1
+    summary = "，".join(f"{key} {count} 个" for key, count in counts.items())
+    outputs = sum(len(plan.parts) for plan in plans)
+    lines.append(f"共 {len(plans)} 个文件：{summary}；将输出 {outputs} 张图片")
+    return lines
+
+
+def crop_parts(img: Image.Image, parts: List[Tuple[Box, bool]], release: bool = False) -> Iterator[Image.Image]:
+    """
+    按裁剪框逐个产生分割后的各部分
+
+    调用方编码并丢弃一个部分后再取下一个，同一时刻只持有原图和一个部分；
+    旋转180度直接用transpose翻转像素顺序。
+
+    Args:
+        img: 原图（只解码一次，各部分共用）
+        parts: [(裁剪框, 是否旋转180度), ...]
+        release: 裁剪出最后一个部分后立即关闭原图，在旋转和编码之前释放整幅像素缓冲区
+
+    Yields:
+        各部分的图片
+    """
+    last = len(parts) - 1
+    for i, (box, rotate) in enumerate(parts):
+        part = img.crop(box)
+        if release and i == last:
+            img.close()
+        if rotate:
+            part = part.transpose(Image.Transpose.ROTATE_180)
+        yield part
+        del part  # 调用方已处理完该部分，裁剪下一个部分之前释放
+
+
+def execute_plan(plan: FileSplitPlan, output_format: str, profile: EncoderProfile,
+                 in_memory: bool = False, keep_parts: bool = False
+                 ) -> Tuple[List[Tuple[str, Optional[bytes]]], List[Image.Image]]:
+    """
+    按分割方案解码、裁剪并编码一个文件
+
+    作为进程池工作函数使用，因此定义在模块级别。可以直接复制的文件不解码；
+    规划为无损的部分在压缩域中裁剪和旋转，失败或超过大小上限时改用像素分割；
+    规划阶段未检测分割线的文件在解码后先检测分割线再裁剪。
+
+    Args:
+        plan: 分割方案
+        output_format: 输出格式
+        profile: 编码配置
+        in_memory: 是否返回编码后的数据而不写入磁盘
+        keep_parts: 是否返回分割后的图片（拼接长图时，此时总是解码）
+
+    Returns:
+        ([(输出文件路径, 编码后的数据，已写入磁盘时为None), ...], 分割后的图片列表)
+        
+    Raises:
+        ValueError: 规划阶段无法读取该文件
+    """
+    if plan.error:
+        raise ValueError(plan.error)
+    if not keep_parts and plan.can_copy(output_format, profile):
+        _, _, output_path = plan.parts[0]
+        if in_memory:
+            with open(plan.file_path, 'rb') as f:
+                return [(output_path, f.read())], []
+        shutil.copyfile(plan.file_path, output_path)
+        return [(output_path, None)], []
+
+    lossless = _transform_lossless(plan, profile)
+    pixel_indexes = [i for i in range(len(plan.parts)) if i not in lossless or keep_parts]
+    outputs = []
+    parts = []
+    with Image.open(plan.file_path) as img:
+        if plan.gutter is not None:
+            _apply_gutter(plan, img)
+        if plan.needs_split:
+            images = crop_parts(img, [plan.parts[i][:2] for i in pixel_indexes], release=True)
+        else:
+            images = iter([img])
+        for i, (_, _, output_path) in enumerate(plan.parts):
+            part = next(images) if i in pixel_indexes else None
+            if i in lossless:
+                if in_memory:
+                    outputs.append((output_path, lossless[i]))
+                else:
+                    with open(output_path, 'wb') as f:
+                        f.write(lossless[i])
+                    outputs.append((output_path, None))
+            elif in_memory:
+                outputs.append((output_path, profile.encode(part, output_format)))
+            else:
+                profile.save(part, output_path, output_format)
+                outputs.append((output_path, None))
+            if keep_parts:
+                # 不需要分割的图片即原图，关闭文件前复制一份
+                parts.append(part.copy() if part is img else part)
+            # 裁剪下一个部分之前释放当前部分
+            part = None
+    return outputs, parts
+
+
+def _transform_lossless(plan: FileSplitPlan, profile: EncoderProfile) -> Dict[int, bytes]:
+    """
+    在压缩域中输出规划为无损的部分
+
+    Returns:
+        部分序号 -> JPEG数据；文件实际不支持（如数据损坏）时为空，由像素分割处理
+    """
+    indexes = [i for i, flag in enumerate(plan.lossless) if flag]
+    if not indexes:
+        return {}
+    with open(plan.file_path, 'rb') as f:
+        data = f.read()
+    try:
+        results = transform_parts(data, [plan.parts[i][:2] for i in indexes], plan.size)
+    except ValueError:
+        return {}
+    return {
+        i: result for i, result in zip(indexes, results)
+        if not (profile.max_bytes and len(result) > profile.max_bytes)
+    }
@@ -0,0 +1,208 @@
+import struct
+import zlib
+from PIL import Image, ImageChops
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+# 默认分块边长（像素）
+DEFAULT_TILE_SIZE = 2048
+
+# 自动模式下超过该像素数（约50M像素）的页面使用分块渲染
+TILED_RENDER_PIXELS = 50000000
+
+# 分块模式：'auto' 只对超大页面分块，'always' 总是分块，'off' 不分块
+TILING_MODES = ('auto', 'always', 'off')
+
+# 分块输出方式：'stream' 逐条流式写入一张PNG，'tiles' 每块保存为单独的文件
+TILE_OUTPUTS = ('stream', 'tiles')
+
+# 流式PNG每积累多少压缩数据写出一个IDAT块
+_IDAT_CHUNK_SIZE = 256 * 1024
+
+
+def needs_tiling(pixels: int, tiling_config: Dict = None) -> bool:
+    """
+    页面是否需要分块渲染
+
+    Args:
+        pixels: 页面在输出DPI下的像素数
+        tiling_config: 分块配置 {'mode', 'tile_size', 'output', 'min_pixels'}
+
+    Returns:
+        是否分块渲染
+    """
+    tiling_config = tiling_config or {}
+    mode = tiling_config.get('mode', 'auto')
+    if mode not in TILING_MODES:
+        raise ValueError(f"未知的分块模式: {mode}")
+    if mode == 'off':
+        return False
+    if mode == 'always':
+        return True
+    return pixels > tiling_config.get('min_pixels', TILED_RENDER_PIXELS)
+
+
+def tile_size(tiling_config: Dict = None) -> int:
+    """分块边长"""
+    return max(64, int((tiling_config or {}).get('tile_size', DEFAULT_TILE_SIZE)))
+
+
+def plan_bands(box: Tuple[int, int, int, int], rotate: bool,
+               band_height: int) -> List[Tuple[int, Tuple[int, int, int, int]]]:
+    """
+    将区域按输出方向自上而下切成横条
+
+    Args:
+        box: 区域在未旋转页面中的像素坐标 (left, upper, right, lower)
+        rotate: 输出是否旋转180度（旋转后输出的第一条对应原区域的最下方）
+        band_height: 横条高度
+
+    Returns:
+        [(输出中的起始行, 横条在页面中的像素坐标), ...]
+    """
+    left, top, right, bottom = box
+    height = bottom - top
+    bands = []
+    for y in range(0, height, band_height):
+        h = min(band_height, height - y)
+        if rotate:
+            bands.append((y, (left, bottom - y - h, right, bottom - y)))
+        else:
+            bands.append((y, (left, top + y, right, top + y + h)))
+    return bands
+
+
+def plan_tiles(box: Tuple[int, int, int, int], rotate: bool,
+               size: int) -> List[Tuple[int, int, Tuple[int, int, int, int]]]:
+    """
+    将区域切成固定大小的方块，行列号按输出方向编号
+
+    Args:
+        box: 区域在未旋转页面中的像素坐标
+        rotate: 输出是否旋转180度
+        size: 分块边长
+
+    Returns:
+        [(行号, 列号, 分块在页面中的像素坐标), ...]，行列号从1开始
+    """
+    left, top, right, bottom = box
+    width = right - left
+    tiles = []
+    for row, (_, (_, band_top, _, band_bottom)) in enumerate(plan_bands(box, rotate, size)):
+        for col, x in enumerate(range(0, width, size)):
+            w = min(size, width - x)
+            if rotate:
+                tile_box = (right - x - w, band_top, right - x, band_bottom)
+            else:
+                tile_box = (left + x, band_top, left + x + w, band_bottom)
+            tiles.append((row + 1, col + 1, tile_box))
+    return tiles
+
+
+class PNGStreamWriter:
+    """
+    流式PNG写入器
+
+    按行追加像素并边压缩边写入文件，整张图片不需要同时驻留内存。
+    每行使用Sub滤波器（与左侧像素做差），对线条和文字有较好的压缩效果。
+    高度事先未知时（如拼接长图）先写入占位的文件头，关闭时回写实际高度。
+    """
+    def __init__(self, output_path: Union[str, BinaryIO], width: int, height: Optional[int], mode: str,
+                 compress_level: int = 6):
+        """
+        Args:
+            output_path: 输出文件路径，或可写的二进制文件对象（如写入内存的io.BytesIO，不会被关闭）
+            width: 图片宽度
+            height: 图片高度，None表示由写入的行数决定（文件对象需支持seek）
+            mode: 'L' 或 'RGB'
+            compress_level: zlib压缩级别
+        """
+        if mode not in ("L", "RGB"):
+            raise ValueError(f"流式PNG不支持的颜色模式: {mode}")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.bytes_per_pixel = 1 if mode == "L" else 3
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(compress_level)
+        self.pending = []
+        self.pending_size = 0
+        self.owns_file = isinstance(output_path, str)
+        self.file = open(output_path, 'wb') if self.owns_file else output_path
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self.header_offset = self.file.tell()
+        self._write_chunk(b'IHDR', self._header(height or 0))
+        
+    def _header(self, height: int) -> bytes:
+        color_type = 0 if self.mode == "L" else 2
+        return struct.pack(">IIBBBBB", self.width, height, 8, color_type, 0, 0, 0)
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes):
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def _flush_idat(self):
+        if self.pending:
+            self._write_chunk(b'IDAT', b''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def write_rows(self, img: Image.Image):
+        """
+        追加若干行像素
+
+        Args:
+            img: 宽度与输出一致、颜色模式一致的横条
+        """
+        if img.mode != self.mode or img.width != self.width:
+            raise ValueError("横条尺寸或颜色模式与输出不一致")
+        if self.height is not None and self.rows_written + img.height > self.height:
+            raise ValueError("写入的行数超过图片高度")
+        # Sub滤波：每个字节减去左侧像素的对应字节（模256），由Pillow整块计算
+        shifted = Image.new(self.mode, img.size, 0)
+        shifted.paste(img.crop((0, 0, img.width - 1, img.height)), (1, 0))
+        data = ImageChops.subtract_modulo(img, shifted).tobytes()
+        stride = self.width * self.bytes_per_pixel
+        rows = [b'\x01' + data[y * stride:(y + 1) * stride] for y in range(img.height)]
+        compressed = self.compressor.compress(b''.join(rows))
+        self.rows_written += img.height
+        if compressed:
+            self.pending.append(compressed)
+            self.pending_size += len(compressed)
+            if self.pending_size >= _IDAT_CHUNK_SIZE:
+                self._flush_idat()
+
+    def close(self):
+        """写入剩余数据和文件尾"""
+        if self.file is None:
+            return
+        try:
+            if self.height is not None and self.rows_written != self.height:
+                raise ValueError(f"图片行数不完整: {self.rows_written}/{self.height}")
+            if not self.rows_written:
+                raise ValueError("图片没有写入任何行")
+            self.pending.append(self.compressor.flush())
+            self._flush_idat()
+            self._write_chunk(b'IEND', b'')
+            if self.height is None:
+                # 回写实际高度（IHDR数据和CRC位于长度和类型字段之后）
+                end = self.file.tell()
+                self.file.seek(self.header_offset)
+                self._write_chunk(b'IHDR', self._header(self.rows_written))
+                self.file.seek(end)
+        finally:
+            if self.owns_file:
+                self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        elif self.file is not None:
+            if self.owns_file:
+                self.file.close()
+            self.file = None
@@ -0,0 +1,154 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from PIL import Image, ImageChops, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from encoder_profiles import EncoderProfile  # noqa: E402
+from jpeg_lossless import find_jpegtran, mcu_size  # noqa: E402
+from split_plan import execute_plan, plan_files  # noqa: E402
+
+
+def make_jpeg(path: str, size, mode: str = "RGB", subsampling: int = 0, restart: str = None):
+    """生成带渐变和图形的测试JPEG；restart为jpegtran的-restart参数，如 "2B"（每2个MCU一个RST标记）"""
+    width, height = size
+    img = Image.new(mode, size)
+    draw = ImageDraw.Draw(img)
+    for x in range(0, width, 4):
+        color = (x * 255 // width, 128, 255 - x * 255 // width) if mode == "RGB" else x * 255 // width
+        draw.rectangle((x, 0, x + 3, height), fill=color)
+    for i in range(0, min(width, height), 37):
+        draw.ellipse((i, i // 2, i + 60, i // 2 + 40), outline="white" if mode == "RGB" else 255, width=3)
+    buf = io.BytesIO()
+    options = {'subsampling': subsampling} if mode == "RGB" else {}
+    img.save(buf, "JPEG", quality=90, **options)
+    data = buf.getvalue()
+    if restart:
+        data = subprocess.run([find_jpegtran(), "-restart", restart], input=data,
+                              stdout=subprocess.PIPE, check=True).stdout
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def split_top_bottom(width, height, is_first_page):
+    """上下分割，下半部分旋转180度"""
+    return [((0, 0, width, height // 2), False), ((0, height // 2, width, height), True)]
+
+
+def split_left_right(width, height, is_first_page):
+    return [((0, 0, width // 2, height), False), ((width // 2, 0, width, height), False)]
+
+
+@unittest.skipUnless(find_jpegtran(), "未安装jpegtran")
+class LosslessSplitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def split(self, name: str, planner):
+        """按planner规划并执行无损分割，返回 (分割方案, 各部分解码结果, 原图按像素裁剪的参考结果)"""
+        path = os.path.join(self.dir, name)
+        plan, = plan_files([(path, self.dir, False)], planner, 'JPG', threads=1, lossless_jpeg=True)
+        self.assertIsNone(plan.error)
+        execute_plan(plan, 'JPG', EncoderProfile.from_config(None))
+        with Image.open(path) as src:
+            src.load()
+            expected = []
+            for box, rotate, _ in plan.parts:
+                part = src.crop(box)
+                expected.append(part.transpose(Image.Transpose.ROTATE_180) if rotate else part)
+        outputs = []
+        for _, _, output_path in plan.parts:
+            with Image.open(output_path) as img:
+                img.load()
+                outputs.append(img)
+        return plan, outputs, expected
+
+    def assertIdentical(self, actual: Image.Image, expected: Image.Image):
+        self.assertEqual(actual.size, expected.size)
+        self.assertEqual(actual.mode, expected.mode)
+        self.assertIsNone(ImageChops.difference(actual, expected).getbbox())
+
+    def assertSubsampledMatch(self, actual: Image.Image, expected: Image.Image, rotate: bool):
+        """
+        4:2:0的色度上采样在裁剪边缘取不到原图相邻的色度样本，旋转后插值方向也相反，
+        解码结果与原图裁剪相差不超过2；不旋转时只有边缘1像素不同
+        """
+        self.assertEqual(actual.size, expected.size)
+        difference = ImageChops.difference(actual, expected)
+        self.assertLessEqual(max(high for _, high in difference.getextrema()), 2)
+        if not rotate:
+            width, height = difference.size
+            self.assertIsNone(difference.crop((1, 1, width - 1, height - 1)).getbbox())
+
+    def assertLossless(self, name: str, planner, subsampled: bool = False):
+        plan, outputs, expected = self.split(name, planner)
+        self.assertEqual(plan.lossless, [True] * len(plan.parts))
+        for actual, reference, (_, rotate, _) in zip(outputs, expected, plan.parts):
+            if subsampled:
+                self.assertSubsampledMatch(actual, reference, rotate)
+            else:
+                self.assertIdentical(actual, reference)
+        return plan
+
+    def test_mcu_size(self):
+        for mode, subsampling, mcu in (("RGB", 0, (8, 8)), ("RGB", 2, (16, 16)), ("L", 0, (8, 8))):
+            path = os.path.join(self.dir, f"mcu_{mode}_{subsampling}.jpg")
+            make_jpeg(path, (64, 64), mode, subsampling)
+            with Image.open(path) as img:
+                self.assertEqual(mcu_size(img), mcu)
+
+    def test_444_rotated(self):
+        make_jpeg(os.path.join(self.dir, "a.jpg"), (640, 960), subsampling=0)
+        self.assertLossless("a.jpg", split_top_bottom)
+
+    def test_420_rotated(self):
+        make_jpeg(os.path.join(self.dir, "a.jpg"), (640, 960), subsampling=2)
+        self.assertLossless("a.jpg", split_top_bottom, subsampled=True)
+
+    def test_gray_rotated(self):
+        make_jpeg(os.path.join(self.dir, "a.jpg"), (640, 960), mode="L")
+        self.assertLossless("a.jpg", split_top_bottom)
+
+    def test_restart_interval(self):
+        make_jpeg(os.path.join(self.dir, "a.jpg"), (640, 960), subsampling=2, restart="3B")
+        self.assertLossless("a.jpg", split_top_bottom, subsampled=True)
+        make_jpeg(os.path.join(self.dir, "b.jpg"), (1000, 600), subsampling=0, restart="1")
+        self.assertLossless("b.jpg", split_left_right)
+
+    def test_snap_to_mcu(self):
+        # 1000/2=500不在16像素边界上，吸附到496；右半部分宽度不是MCU的倍数，但不旋转时仍可无损
+        make_jpeg(os.path.join(self.dir, "a.jpg"), (1000, 600), subsampling=2)
+        plan = self.assertLossless("a.jpg", split_left_right, subsampled=True)
+        self.assertEqual(plan.cut_offset, -4)
+        self.assertEqual(plan.parts[1][0], (496, 0, 1000, 600))
+
+    def test_rotated_part_not_aligned(self):
+        # 高度1000：分割线吸附到496，下半部分高504不是16的倍数，旋转后无法无损，改用像素分割
+        make_jpeg(os.path.join(self.dir, "a.jpg"), (640, 1000), subsampling=2)
+        plan, outputs, expected = self.split("a.jpg", split_top_bottom)
+        self.assertEqual(plan.lossless, [True, False])
+        self.assertSubsampledMatch(outputs[0], expected[0], rotate=False)
+        self.assertEqual(outputs[1].size, expected[1].size)
+        # 像素分割重新编码，只比较大致内容
+        difference = ImageChops.difference(outputs[1], expected[1]).convert("L")
+        self.assertLess(sum(i * n for i, n in enumerate(difference.histogram())) / (640 * 504), 4)
+
+    def test_rotated_part_in_unaligned_image(self):
+        # 整图高1000不是16的倍数，不能整图旋转后裁剪；旋转的上半部分对齐，先裁剪再旋转
+        make_jpeg(os.path.join(self.dir, "a.jpg"), (640, 1000), subsampling=2)
+        def planner(width, height, is_first_page):
+            return [((0, 0, width, 496), True), ((0, 496, width, height), False)]
+        self.assertLossless("a.jpg", planner, subsampled=True)
+
+
+if __name__ == '__main__':
+    unittest.main()